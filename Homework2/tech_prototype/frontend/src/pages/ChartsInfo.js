@@ -15,11 +15,13 @@ import {
 } from "recharts";
 
 /**
- * Parse "DD.MM.YYYY" -> numeric timestamp
- * e.g., "06.10.2015" => new Date(2015, 9, 6).getTime()
+ * Parse "YYYY-MM-DD" (or legacy "DD.MM.YYYY") -> numeric timestamp
+ * e.g., "2015-10-06" => new Date(2015, 9, 6).getTime()
  */
 function parseTimestamp(dateStr) {
-  const parts = dateStr.split(".");
+  if (!dateStr) return null;
+  const iso = dateStr.split("-");
+  const parts = iso.length === 3 ? [iso[2], iso[1], iso[0]] : dateStr.split(".");
   if (parts.length === 3) {
     const day = parseInt(parts[0], 10);
     const month = parseInt(parts[1], 10) - 1; // zero-based
@@ -31,6 +33,14 @@ function parseTimestamp(dateStr) {
   return null;
 }
 
+/**
+ * stock_data now returns plain numbers; keep accepting strings too.
+ */
+function toNumber(val) {
+  if (typeof val === "number") return val;
+  return parseFloat(String(val || "0").replace(",", "")) || 0;
+}
+
 /**
  * Build yearly ticks for the X-axis, from minTime to maxTime,
  * labeling just one tick per year.
@@ -102,9 +112,8 @@ const ChartsInfo = () => {
         if (res.data.records && res.data.records.length) {
           const enriched = res.data.records.map((r) => {
             const timestamp = parseTimestamp(r.date);
-            const priceVal = parseFloat((r.price || "0").replace(",", "")) || 0;
-            const volumeVal =
-              parseFloat((r.volume || "0").replace(",", "")) || 0;
+            const priceVal = toNumber(r.price);
+            const volumeVal = toNumber(r.volume);
             return {
               ...r,
               fullDate: r.date,
@@ -137,7 +146,7 @@ const ChartsInfo = () => {
     const prices = data.map((d) => d.priceVal);
     const volumes = data.map((d) => d.volumeVal);
     const turnovers = data.map(
-      (d) => parseFloat((d.total_turnover || "0").replace(",", "")) || 0
+      (d) => toNumber(d.total_turnover)
     );
 
     const highestPrice = Math.max(...prices);
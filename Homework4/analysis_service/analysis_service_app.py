@@ -3,30 +3,123 @@
 analysis_service_app.py
 A Flask microservice that uses technical_analysis.py
 to compute indicators for a given publisher & timeframe.
+Set ANALYSIS_EXECUTION=process (and ANALYSIS_WORKERS) to run the
+computations in a warm process pool instead (see worker_pool.py).
+Responses are compressed per Accept-Encoding (common/compression.py).
 """
 
+import sys
+from pathlib import Path
+
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-from technical_analysis import compute_all_indicators_and_aggregate
+
+# compression.py is shared with the gateway
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "common"))
+from compression import init_app as init_compression
+from technical_analysis import (
+    TIMEFRAMES, check_tail_accuracy, refresh_indicator_states, refresh_signals,
+)
+from worker_pool import run_analysis, run_batch
 
 app = Flask(__name__)
 CORS(app)
+init_compression(app)
 
 
 @app.route("/analysis", methods=["GET"])
 def do_analysis():
     publisher = request.args.get("publisher", "").strip()
     tf = request.args.get("tf", "1D").strip()
+    # mode=latest -> summary + final row only, computed from a bounded tail
+    latest_only = request.args.get("mode", "full").strip() == "latest"
     if not publisher:
         return jsonify({"error": "Missing 'publisher'"}), 400
+    if tf not in TIMEFRAMES:
+        return jsonify({"error": f"Unknown tf '{tf}', use one of {list(TIMEFRAMES)}"}), 400
 
     try:
-        result = compute_all_indicators_and_aggregate(publisher, tf)
+        result = run_analysis(publisher, tf, latest_only=latest_only)
         return jsonify(result), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/analysis/batch", methods=["GET", "POST"])
+def do_batch_analysis():
+    """
+    Summaries + final row for many publishers in one request:
+    GET ?publishers=ALK,KMB (omit for all) or POST {"publishers": [...]}.
+    """
+    if request.method == "POST":
+        body = request.get_json(silent=True) or {}
+        publishers = body.get("publishers", [])
+        tf = str(body.get("tf", "1D")).strip()
+    else:
+        publishers = request.args.get("publishers", "").split(",")
+        tf = request.args.get("tf", "1D").strip()
+    publishers = [p.strip() for p in publishers if p and p.strip()]
+    if tf not in TIMEFRAMES:
+        return jsonify({"error": f"Unknown tf '{tf}', use one of {list(TIMEFRAMES)}"}), 400
+
+    try:
+        return jsonify(run_batch(publishers or None, tf)), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/analysis/accuracy", methods=["GET"])
+def tail_accuracy():
+    """Drift of mode=latest vs. full history (optional bars / tolerance)."""
+    publisher = request.args.get("publisher", "").strip()
+    if not publisher:
+        return jsonify({"error": "Missing 'publisher'"}), 400
+
+    try:
+        report = check_tail_accuracy(
+            publisher,
+            bars=request.args.get("bars", type=int),
+            tolerance=request.args.get("tolerance", type=float),
+        )
+        return jsonify(report), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/state/refresh", methods=["POST"])
+def refresh_states():
+    """
+    Called by the filter pipeline after it saved rows:
+    {"publishers": ["ALK", ...]} -> advance their indicator state.
+    """
+    body = request.get_json(silent=True) or {}
+    publishers = [p.strip() for p in body.get("publishers", []) if p and p.strip()]
+    if not publishers:
+        return jsonify({"error": "Missing 'publishers'"}), 400
+
+    try:
+        return jsonify({"refreshed": refresh_indicator_states(publishers)}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/signals/refresh", methods=["POST"])
+def refresh_signal_table():
+    """
+    Post-ingest stage of the filter pipeline (Filter4):
+    {"publishers": [...]} -> recompute their stale `signals` rows.
+    """
+    body = request.get_json(silent=True) or {}
+    publishers = [p.strip() for p in body.get("publishers", []) if p and p.strip()]
+    if not publishers:
+        return jsonify({"error": "Missing 'publishers'"}), 400
+
+    try:
+        return jsonify({"refreshed": refresh_signals(publishers)}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 # ── new: simple health endpoint ──
 @app.route("/health", methods=["GET"])
 def health():
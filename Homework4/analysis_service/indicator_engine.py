@@ -0,0 +1,335 @@
+# Homework4/analysis_service/indicator_engine.py
+
+"""
+indicator_engine.py
+Computes every final-row indicator (RSI, Stochastic %K, CCI, Williams %R,
+MACD, SMA, EMA, WMA, ZLEMA, Bollinger mid) for all configured windows in
+one go, straight from NumPy arrays.
+
+The old storeIndicatorsInFinalRow (now tests/ta_reference.py) built ~25
+separate `ta` objects, each doing a full-series pass (CCI even runs a
+Python function per rolling window) just to read `.iloc[-1]`. Here the windowed indicators only look at the last
+`window` bars, the intermediates (diff/gains/losses, typical price, the
+last close) are computed once and shared, and only the recursive EMAs
+walk the whole series, using the same pandas ewm settings as `ta` so the
+values match it.
+
+The returned dict has exactly the keys/format storeIndicatorsInFinalRow
+wrote into records[-1].
+
+compute_panel_indicators is the batch form: one (bars, publishers) panel,
+right-aligned on each publisher's latest bar, so every indicator is
+evaluated for the whole market in one set of array operations. The single
+publisher path is the same code on a one-column panel.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+# short / medium / long windows used for every indicator
+WINDOWS = {"short": 7, "medium": 14, "long": 30}
+
+# (fast, slow, signal) per frame
+MACD_WINDOWS = {"short": (6, 13, 5), "medium": (12, 26, 9), "long": (24, 52, 18)}
+
+CCI_CONSTANT = 0.015
+
+# "latest signals only" reads this many multiples of the longest EMA chain
+# (an EMA forgets its seed as (1 - 2/(span+1)) ** bars)
+WARMUP_SPAN_MULTIPLE = 6
+
+# keys whose value depends on the whole history (recursive smoothing)
+EMA_BASED_PREFIXES = ("rsi_", "macd_", "ema_", "zlema_")
+
+
+def _ewm_series(values, window, wilder=False):
+    """
+    pandas ewm exactly as ta uses it (adjust=False, min_periods=window):
+    span=window for EMA/MACD, alpha=1/window for Wilder's RSI smoothing.
+    A 2-D (bars, publishers) array is smoothed column by column.
+    """
+    kwargs = {"alpha": 1 / window} if wilder else {"span": window}
+    values = np.asarray(values)
+    if values.ndim == 2 and values.shape[1] == 1:
+        # single publisher: a Series is cheaper than a one-column DataFrame
+        return _ewm_series(values[:, 0], window, wilder)[:, None]
+    frame = pd.Series(values) if values.ndim == 1 else pd.DataFrame(values)
+    return frame.ewm(
+        min_periods=window, adjust=False, **kwargs
+    ).mean().to_numpy()
+
+
+def _level_signal(val, sell_above, buy_below):
+    if math.isnan(val):
+        return None, None
+    if val > sell_above:
+        return val, "Sell"
+    if val < buy_below:
+        return val, "Buy"
+    return val, "Hold"
+
+
+def _finalize(val, sig):
+    if val is None or (isinstance(val, float) and math.isnan(val)):
+        return "", ""
+    return val, sig or ""
+
+
+def rsi_from_averages(avg_gain, avg_loss):
+    """
+    RSI from Wilder-smoothed average gain/loss (ta's formula); scalars or
+    arrays (one value per publisher).
+    """
+    if np.ndim(avg_gain):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rsi = 100 - (100 / (1 + avg_gain / avg_loss))
+        return np.where(avg_loss == 0, 100.0, rsi)
+    if math.isnan(avg_loss) or math.isnan(avg_gain):
+        return math.nan
+    if avg_loss == 0:
+        return 100.0
+    return 100 - (100 / (1 + avg_gain / avg_loss))
+
+
+def _tails(panel, window):
+    """
+    The last `window` rows of a (bars, publishers) panel as a C-contiguous
+    (publishers, window) array, or None if the panel is too short.
+    Reducing along the contiguous axis sums each publisher exactly like a
+    1-D array (pairwise), so single and batch results are identical.
+    """
+    if panel.shape[0] < window:
+        return None
+    return np.ascontiguousarray(panel[-window:].T)
+
+
+def _stoch(close_last, high, low, window):
+    h, l = _tails(high, window), _tails(low, window)
+    if h is None:
+        return np.full(len(close_last), np.nan)
+    smax, smin = h.max(axis=1), l.min(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.float64(100) * (close_last - smin) / (smax - smin)
+
+
+def _williams(close_last, high, low, window):
+    h, l = _tails(high, window), _tails(low, window)
+    if h is None:
+        return np.full(len(close_last), np.nan)
+    hh, ll = h.max(axis=1), l.min(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.float64(-100) * (hh - close_last) / (hh - ll)
+
+
+def _cci(typical, window):
+    tp = _tails(typical, window)
+    if tp is None:
+        return np.full(typical.shape[1], np.nan)
+    mean = tp.mean(axis=1)
+    mad = np.abs(tp - mean[:, None]).mean(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (tp[:, -1] - mean) / (np.float64(CCI_CONSTANT) * mad)
+
+
+def _sma_wma(close, window):
+    c = _tails(close, window)
+    if c is None:
+        nan = np.full(close.shape[1], np.nan)
+        return nan, nan
+    weights = np.arange(1, window + 1, dtype="float64")
+    return c.mean(axis=1), (c * weights).sum(axis=1) / weights.sum()
+
+
+def _macd_signal(macd_val, signal_val):
+    if math.isnan(macd_val) or math.isnan(signal_val):
+        return "", ""
+    if macd_val > signal_val:
+        return macd_val, "Buy"
+    if macd_val < signal_val:
+        return macd_val, "Sell"
+    return macd_val, "Hold"
+
+
+def compute_final_indicators(close, high, low, windows=None, macd_windows=None):
+    """
+    close/high/low: Series or arrays in date order (close already without NaN).
+    Returns {"rsi_short": ..., "rsi_short_sig": ..., ..., "boll_long_sig": ...}
+    matching the old `ta` version (tests/ta_reference.py) on the same data.
+    """
+    c = np.asarray(close, dtype="float64")
+    if len(c) == 0:
+        return {}
+    return compute_panel_indicators(
+        c[:, None],
+        np.asarray(high, dtype="float64")[:, None],
+        np.asarray(low, dtype="float64")[:, None],
+        windows, macd_windows,
+    )[0]
+
+
+def compute_panel_indicators(close, high, low, windows=None, macd_windows=None):
+    """
+    The batch form of compute_final_indicators: close/high/low are
+    (bars, publishers) arrays, right-aligned so row -1 holds every
+    publisher's latest bar, NaN above a publisher's first bar (close
+    without NaN otherwise). Each indicator is computed for all publishers
+    at once; returns one final-row dict per column.
+    """
+    windows = windows or WINDOWS
+    macd_windows = macd_windows or MACD_WINDOWS
+
+    c = np.asarray(close, dtype="float64")
+    if c.size == 0:
+        return [{} for _ in range(c.shape[1] if c.ndim == 2 else 0)]
+
+    # recursive parts: these are the only full-series passes
+    # (pandas ewm skips the NaN padding, so each column starts at its first bar)
+    diff = np.diff(c, axis=0, prepend=np.nan)
+    padding = np.isnan(c)
+    gains = np.where(diff > 0, diff, 0.0)
+    losses = np.where(diff < 0, -diff, 0.0)
+    gains[padding] = np.nan
+    losses[padding] = np.nan
+    rsi = {
+        frame: rsi_from_averages(_ewm_series(gains, w, wilder=True)[-1],
+                                 _ewm_series(losses, w, wilder=True)[-1])
+        for frame, w in windows.items()
+    }
+    macd = {}
+    for frame, (fast, slow, sign) in macd_windows.items():
+        macd_line = _ewm_series(c, fast) - _ewm_series(c, slow)
+        macd[frame] = (macd_line[-1], _ewm_series(macd_line, sign)[-1])
+    ema = {frame: _ewm_series(c, w)[-1] for frame, w in windows.items()}
+
+    return assemble_panel_indicators(c, high, low, rsi, macd, ema, windows, macd_windows)
+
+
+def assemble_final_indicators(close, high, low, rsi, macd, ema,
+                              windows=None, macd_windows=None):
+    """
+    Builds the records[-1] dict from:
+      close/high/low - at least the last max(windows) bars,
+      rsi   - {frame: RSI value}, macd - {frame: (macd, signal)},
+      ema   - {frame: EMA value}  (NaN where not enough history).
+    Used by the incremental indicator_state (one publisher).
+    """
+    c = np.asarray(close, dtype="float64")
+    if len(c) == 0:
+        return {}
+    return assemble_panel_indicators(
+        c[:, None],
+        np.asarray(high, dtype="float64")[:, None],
+        np.asarray(low, dtype="float64")[:, None],
+        {frame: np.array([val]) for frame, val in rsi.items()},
+        {frame: (np.array([m]), np.array([s])) for frame, (m, s) in macd.items()},
+        {frame: np.array([val]) for frame, val in ema.items()},
+        windows, macd_windows,
+    )[0]
+
+
+def assemble_panel_indicators(close, high, low, rsi, macd, ema,
+                              windows=None, macd_windows=None):
+    """
+    Panel form of assemble_final_indicators: (bars, publishers) arrays and
+    per-frame arrays of RSI / (MACD, signal) / EMA values, one per
+    publisher. Returns one records[-1] dict per publisher.
+    """
+    windows = windows or WINDOWS
+    macd_windows = macd_windows or MACD_WINDOWS
+
+    c = np.asarray(close, dtype="float64")
+    h = np.asarray(high, dtype="float64")
+    l = np.asarray(low, dtype="float64")
+
+    # shared intermediates
+    close_last = c[-1]
+    typical = (h + l + c) / 3.0
+
+    # numeric values for every publisher, then formatted per column
+    levels = []
+    for frame in windows:
+        levels.append((f"rsi_{frame}", rsi[frame], 70, 30))
+    for frame, w in windows.items():
+        levels.append((f"stoch_{frame}", _stoch(close_last, h, l, w), 80, 20))
+    for frame, w in windows.items():
+        levels.append((f"cci_{frame}", _cci(typical, w), 100, -100))
+    for frame, w in windows.items():
+        levels.append((f"williamsr_{frame}", _williams(close_last, h, l, w), -20, -80))
+    averages = {frame: _sma_wma(c, w) for frame, w in windows.items()}
+
+    def compare_ma(last, ma_val):
+        if ma_val is None or math.isnan(last):
+            return ""
+        if last > ma_val:
+            return "Buy"
+        if last < ma_val:
+            return "Sell"
+        return "Hold"
+
+    def rounded(val):
+        return None if math.isnan(val) else round(val, 2)
+
+    results = []
+    for j in range(c.shape[1]):
+        out = {}
+        for key, vals, sell_above, buy_below in levels:
+            out[key], out[f"{key}_sig"] = _finalize(
+                *_level_signal(float(vals[j]), sell_above, buy_below))
+        for frame in macd_windows:
+            macd_val, signal_val = macd[frame]
+            out[f"macd_{frame}"], out[f"macd_{frame}_sig"] = _macd_signal(
+                float(macd_val[j]), float(signal_val[j]))
+
+        last = float(close_last[j])
+        for frame in windows:
+            sma_vals, wma_vals = averages[frame]
+            sma = rounded(float(sma_vals[j]))
+            ema_val = rounded(float(ema[frame][j]))
+            wma = rounded(float(wma_vals[j]))
+            # ZLEMA is reported as the EMA, Bollinger mid is the SMA
+            for name, val in (("sma", sma), ("ema", ema_val), ("wma", wma),
+                              ("zlema", ema_val), ("boll", sma)):
+                out[f"{name}_{frame}"] = val if val else ""
+                out[f"{name}_{frame}_sig"] = compare_ma(last, val)
+        results.append(out)
+    return results
+
+
+def warmup_bars(windows=None, macd_windows=None, multiple=WARMUP_SPAN_MULTIPLE):
+    """
+    Bars needed before the final row for the given indicator set: `multiple`
+    times the longest EMA chain (MACD slow + signal, or the longest window).
+    """
+    windows = windows or WINDOWS
+    macd_windows = macd_windows or MACD_WINDOWS
+    longest = max(
+        max(windows.values()),
+        max(slow + sign for _, slow, sign in macd_windows.values()),
+    )
+    return multiple * longest
+
+
+def tail_drift(close, high, low, bars, windows=None, macd_windows=None):
+    """
+    How far the EMA-based final values computed from only the last `bars`
+    rows are from the full-history values: {key: abs difference}, plus the
+    signal keys that come out different (as {key_sig: (full, tail)}).
+    """
+    full = compute_final_indicators(close, high, low, windows, macd_windows)
+    tail = compute_final_indicators(
+        np.asarray(close)[-bars:], np.asarray(high)[-bars:], np.asarray(low)[-bars:],
+        windows, macd_windows,
+    )
+    drift, flipped = {}, {}
+    for key, full_val in full.items():
+        if not key.startswith(EMA_BASED_PREFIXES):
+            continue
+        tail_val = tail.get(key, "")
+        if key.endswith("_sig"):
+            if full_val != tail_val:
+                flipped[key] = (full_val, tail_val)
+        elif full_val != "" and tail_val != "":
+            drift[key] = abs(full_val - tail_val)
+    return drift, flipped
@@ -0,0 +1,248 @@
+# Homework4/analysis_service/indicator_state.py
+
+"""
+indicator_state.py
+Persisted per-publisher indicator state, so the final-row signals can be
+advanced in O(new rows) instead of being recomputed from the first bar.
+
+Per publisher (JSON in the indicator_state table of stock_data.db):
+  - bars / as_of date / last close
+  - Wilder RSI average gain & loss per window
+  - close EMAs for every EMA window and MACD fast/slow span
+  - MACD signal EMA (and how many MACD values it has seen) per frame
+  - ring buffers of the last max(window) close/high/low values
+
+push() replays pandas' ewm(adjust=False) recurrence step by step, so the
+values served from the state equal compute_final_indicators() over the
+full history.
+
+The filter pipeline deletes a publisher's state when it writes rows dated
+on/before the state's as_of (backfill or rewrite). As a safety net,
+refresh_state() also compares the stored row count with stock_data and
+rebuilds from scratch when they disagree.
+"""
+
+import json
+import math
+from collections import deque
+from datetime import datetime
+
+from indicator_engine import (
+    WINDOWS, MACD_WINDOWS, assemble_final_indicators, rsi_from_averages,
+)
+
+STATE_DDL = """
+    CREATE TABLE IF NOT EXISTS indicator_state (
+        publisher_code TEXT PRIMARY KEY,
+        as_of_date TEXT,
+        row_count INTEGER,
+        state TEXT,
+        updated_at TEXT
+    )
+"""
+
+
+def _ewm_step(prev, x, alpha):
+    """One step of pandas' ewm(adjust=False).mean(), same arithmetic."""
+    if prev is None:
+        return x
+    if prev == x:
+        return prev
+    old_wt = 1. - alpha
+    return (old_wt * prev + alpha * x) / (old_wt + alpha)
+
+
+def _nan(val):
+    return math.nan if val is None else val
+
+
+class IndicatorState:
+    def __init__(self, windows=None, macd_windows=None):
+        self.windows = dict(windows or WINDOWS)
+        self.macd_windows = {k: tuple(v) for k, v in (macd_windows or MACD_WINDOWS).items()}
+        self.bars = 0
+        # as_of = last stock_data row consumed; last_bar_date = last row with a close
+        self.as_of = None
+        self.last_bar_date = None
+        self.last_close = None
+        # frame -> [avg_gain, avg_loss]
+        self.rsi = {frame: [None, None] for frame in self.windows}
+        # span -> close EMA (EMA windows + MACD fast/slow)
+        spans = set(self.windows.values())
+        for fast, slow, _ in self.macd_windows.values():
+            spans.update((fast, slow))
+        self.ema = {str(span): None for span in sorted(spans)}
+        # frame -> [signal EMA, number of MACD values seen]
+        self.macd_signal = {frame: [None, 0] for frame in self.macd_windows}
+        size = max(self.windows.values())
+        self.close_buf = deque(maxlen=size)
+        self.high_buf = deque(maxlen=size)
+        self.low_buf = deque(maxlen=size)
+
+    def push(self, date, close, high, low):
+        """Advance the state by one bar (rows must arrive in date order)."""
+        if self.last_close is None:
+            gain = loss = 0.0
+        else:
+            diff = close - self.last_close
+            gain = diff if diff > 0 else 0.0
+            loss = -diff if diff < 0 else 0.0
+
+        self.bars += 1
+        self.as_of = date
+        self.last_bar_date = date
+        self.last_close = close
+
+        for frame, w in self.windows.items():
+            avg = self.rsi[frame]
+            avg[0] = _ewm_step(avg[0], gain, 1 / w)
+            avg[1] = _ewm_step(avg[1], loss, 1 / w)
+        for span in self.ema:
+            self.ema[span] = _ewm_step(self.ema[span], close, 2 / (int(span) + 1))
+        for frame, (fast, slow, sign) in self.macd_windows.items():
+            if self.bars >= max(fast, slow):
+                macd_val = self.ema[str(fast)] - self.ema[str(slow)]
+                sig = self.macd_signal[frame]
+                sig[0] = _ewm_step(sig[0], macd_val, 2 / (sign + 1))
+                sig[1] += 1
+
+        self.close_buf.append(close)
+        self.high_buf.append(high)
+        self.low_buf.append(low)
+
+    def final_indicators(self):
+        """The records[-1] indicator dict, straight from the state."""
+        rsi = {
+            frame: rsi_from_averages(*self.rsi[frame]) if self.bars >= w else math.nan
+            for frame, w in self.windows.items()
+        }
+        macd = {}
+        for frame, (fast, slow, sign) in self.macd_windows.items():
+            macd_val = math.nan
+            if self.bars >= max(fast, slow):
+                macd_val = self.ema[str(fast)] - self.ema[str(slow)]
+            sig_val, seen = self.macd_signal[frame]
+            macd[frame] = (macd_val, sig_val if seen >= sign else math.nan)
+        ema = {
+            frame: self.ema[str(w)] if self.bars >= w else math.nan
+            for frame, w in self.windows.items()
+        }
+        return assemble_final_indicators(
+            list(self.close_buf),
+            [_nan(v) for v in self.high_buf],
+            [_nan(v) for v in self.low_buf],
+            rsi, macd, ema, self.windows, self.macd_windows,
+        )
+
+    def to_json(self):
+        return json.dumps({
+            "windows": self.windows,
+            "macd_windows": self.macd_windows,
+            "bars": self.bars,
+            "as_of": self.as_of,
+            "last_bar_date": self.last_bar_date,
+            "last_close": self.last_close,
+            "rsi": self.rsi,
+            "ema": self.ema,
+            "macd_signal": self.macd_signal,
+            "close_buf": list(self.close_buf),
+            "high_buf": [None if v is None or math.isnan(v) else v for v in self.high_buf],
+            "low_buf": [None if v is None or math.isnan(v) else v for v in self.low_buf],
+        })
+
+    @classmethod
+    def from_json(cls, text):
+        data = json.loads(text)
+        st = cls(data["windows"], data["macd_windows"])
+        st.bars = data["bars"]
+        st.as_of = data["as_of"]
+        st.last_bar_date = data.get("last_bar_date", data["as_of"])
+        st.last_close = data["last_close"]
+        st.rsi = data["rsi"]
+        st.ema = data["ema"]
+        st.macd_signal = data["macd_signal"]
+        st.close_buf.extend(data["close_buf"])
+        st.high_buf.extend(data["high_buf"])
+        st.low_buf.extend(data["low_buf"])
+        return st
+
+    def matches_config(self, windows=None, macd_windows=None):
+        fresh = IndicatorState(windows, macd_windows)
+        return self.windows == fresh.windows and self.macd_windows == fresh.macd_windows
+
+
+def ensure_state_table(conn):
+    conn.execute(STATE_DDL)
+
+
+def load_state(conn, publisher_code):
+    """(IndicatorState, row_count) or (None, 0) if nothing is stored."""
+    row = conn.execute(
+        "SELECT state, row_count FROM indicator_state WHERE publisher_code = ?",
+        (publisher_code,)
+    ).fetchone()
+    if not row:
+        return None, 0
+    return IndicatorState.from_json(row[0]), row[1]
+
+
+def save_state(conn, publisher_code, state, row_count):
+    conn.execute("""
+        INSERT OR REPLACE INTO indicator_state
+            (publisher_code, as_of_date, row_count, state, updated_at)
+        VALUES (?, ?, ?, ?, ?)
+    """, (publisher_code, state.as_of, row_count, state.to_json(),
+          datetime.now().isoformat(timespec="seconds")))
+    conn.commit()
+
+
+def _rows_up_to(conn, publisher_code, as_of):
+    return conn.execute(
+        "SELECT COUNT(*) FROM stock_data WHERE publisher_code = ? AND date <= ?",
+        (publisher_code, as_of)
+    ).fetchone()[0]
+
+
+def refresh_state(conn, publisher_code, windows=None, macd_windows=None):
+    """
+    Brings the publisher's state up to date with stock_data and persists it.
+    Only rows after the stored as_of date are read; if history before it
+    changed (row count differs) or the windows changed, the state is
+    rebuilt from the first bar. Returns None if the publisher has no rows.
+    """
+    ensure_state_table(conn)
+    state, row_count = load_state(conn, publisher_code)
+    if state is not None and (
+        not state.matches_config(windows, macd_windows)
+        or _rows_up_to(conn, publisher_code, state.as_of) != row_count
+    ):
+        state = None
+
+    if state is None:
+        state, row_count = IndicatorState(windows, macd_windows), 0
+        rows = conn.execute("""
+            SELECT date, price, max, min FROM stock_data
+            WHERE publisher_code = ?
+            ORDER BY date ASC
+        """, (publisher_code,))
+    else:
+        rows = conn.execute("""
+            SELECT date, price, max, min FROM stock_data
+            WHERE publisher_code = ? AND date > ?
+            ORDER BY date ASC
+        """, (publisher_code, state.as_of))
+
+    new_rows = 0
+    for date, close, high, low in rows:
+        new_rows += 1
+        if close is not None:
+            state.push(date, close,
+                       math.nan if high is None else high,
+                       math.nan if low is None else low)
+        state.as_of = date
+
+    if new_rows:
+        save_state(conn, publisher_code, state, row_count + new_rows)
+    if state.bars == 0:
+        return None
+    return state
@@ -0,0 +1,154 @@
+# Homework4/analysis_service/resample_store.py
+
+"""
+resample_store.py
+Weekly / monthly / quarterly OHLCV bars aggregated from the daily
+stock_data rows and cached in the `ohlcv_bars` table of stock_data.db.
+
+MSE rows have no open, so a bar is:
+    open = first close, high = max(max), low = min(min),
+    close = last close, volume = sum(quantity)
+over the trading days of the period (rows without a close are skipped).
+A bar is dated by its last trading day, so the final bar's date equals the
+publisher's latest daily close.
+
+refresh_bars() only re-aggregates from the newest cached period on (that
+one may still be open); older periods are never touched again. The filter
+pipeline deletes every cached bar whose last day is on/after the first
+date it rewrites, and refresh_bars() also compares the cached day count
+with stock_data and rebuilds from scratch when they disagree.
+"""
+
+import pandas as pd
+
+# tf -> pandas period frequency (weeks run Monday..Sunday)
+TIMEFRAMES = {"1D": None, "1W": "W-SUN", "1M": "M", "1Q": "Q"}
+
+OHLCV_DDL = """
+    CREATE TABLE IF NOT EXISTS ohlcv_bars (
+        publisher_code TEXT NOT NULL,
+        timeframe TEXT NOT NULL,
+        period_start TEXT NOT NULL,
+        date TEXT NOT NULL,
+        open REAL,
+        high REAL,
+        low REAL,
+        close REAL,
+        volume REAL,
+        days INTEGER,
+        PRIMARY KEY (publisher_code, timeframe, period_start)
+    )
+"""
+
+BAR_COLUMNS = ["period_start", "date", "open", "high", "low", "close", "volume", "days"]
+
+
+def ensure_ohlcv_table(conn):
+    conn.execute(OHLCV_DDL)
+
+
+def resample_daily(df, tf):
+    """
+    df: daily date (datetime) / close / high / low / volume in date order.
+    Returns one row per period with BAR_COLUMNS (dates as ISO text).
+    """
+    df = df.dropna(subset=["date", "close"])
+    if df.empty:
+        return pd.DataFrame(columns=BAR_COLUMNS)
+    period = df["date"].dt.to_period(TIMEFRAMES[tf]).dt.start_time
+    bars = df.groupby(period, sort=True).agg(
+        date=("date", "last"),
+        open=("close", "first"),
+        high=("high", "max"),
+        low=("low", "min"),
+        close=("close", "last"),
+        volume=("volume", "sum"),
+        days=("close", "size"),
+    )
+    bars.index.name = "period_start"
+    bars = bars.reset_index()
+    bars["period_start"] = bars["period_start"].dt.strftime("%Y-%m-%d")
+    bars["date"] = bars["date"].dt.strftime("%Y-%m-%d")
+    return bars[BAR_COLUMNS]
+
+
+def _read_daily(conn, publisher_code, since=None):
+    query = """
+        SELECT date, price AS close, max AS high, min AS low, quantity AS volume
+        FROM stock_data
+        WHERE publisher_code = ? AND price IS NOT NULL {since}
+        ORDER BY date ASC
+    """
+    params = [publisher_code]
+    if since:
+        params.append(since)
+    df = pd.read_sql_query(query.format(since="AND date >= ?" if since else ""), conn, params=params)
+    df["date"] = pd.to_datetime(df["date"], format="%Y-%m-%d", errors="coerce")
+    return df
+
+
+def refresh_bars(conn, publisher_code, tf):
+    """
+    Brings the cached `tf` bars of one publisher up to date.
+    Returns the number of bars (re)written.
+    """
+    ensure_ohlcv_table(conn)
+    last_start, cached_days = conn.execute("""
+        SELECT MAX(period_start),
+               (SELECT COALESCE(SUM(days), 0) FROM ohlcv_bars
+                WHERE publisher_code = ?1 AND timeframe = ?2
+                  AND period_start < (SELECT MAX(period_start) FROM ohlcv_bars
+                                      WHERE publisher_code = ?1 AND timeframe = ?2))
+        FROM ohlcv_bars
+        WHERE publisher_code = ?1 AND timeframe = ?2
+    """, (publisher_code, tf)).fetchone()
+
+    if last_start is not None:
+        daily_before = conn.execute("""
+            SELECT COUNT(*) FROM stock_data
+            WHERE publisher_code = ? AND price IS NOT NULL AND date < ?
+        """, (publisher_code, last_start)).fetchone()[0]
+        if daily_before != cached_days:
+            # history before the open period changed: rebuild
+            last_start = None
+
+    if last_start is None:
+        conn.execute("DELETE FROM ohlcv_bars WHERE publisher_code = ? AND timeframe = ?",
+                     (publisher_code, tf))
+    else:
+        conn.execute("""
+            DELETE FROM ohlcv_bars
+            WHERE publisher_code = ? AND timeframe = ? AND period_start >= ?
+        """, (publisher_code, tf, last_start))
+
+    bars = resample_daily(_read_daily(conn, publisher_code, last_start), tf)
+    conn.executemany(f"""
+        INSERT OR REPLACE INTO ohlcv_bars (publisher_code, timeframe, {', '.join(BAR_COLUMNS)})
+        VALUES (?, ?, {', '.join('?' * len(BAR_COLUMNS))})
+    """, [(publisher_code, tf, *row) for row in bars.itertuples(index=False, name=None)])
+    conn.commit()
+    return len(bars)
+
+
+def load_bar_frame(conn, publisher_code, tf, limit=None):
+    """
+    The cached `tf` bars (refreshed first) as date/close/volume/high/low,
+    like technical_analysis.load_price_frame. With `limit`, only the
+    newest `limit` bars.
+    """
+    refresh_bars(conn, publisher_code, tf)
+    query = """
+        SELECT date, close, volume, high, low FROM (
+            SELECT date, close, volume, high, low, period_start
+            FROM ohlcv_bars
+            WHERE publisher_code = ? AND timeframe = ?
+            ORDER BY period_start DESC
+            {limit}
+        ) ORDER BY period_start ASC
+    """
+    params = [publisher_code, tf]
+    if limit:
+        params.append(int(limit))
+    df = pd.read_sql_query(query.format(limit="LIMIT ?" if limit else ""), conn, params=params)
+    df["date"] = pd.to_datetime(df["date"], format="%Y-%m-%d", errors="coerce")
+    return df
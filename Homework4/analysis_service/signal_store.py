@@ -0,0 +1,85 @@
+# Homework4/analysis_service/signal_store.py
+
+"""
+signal_store.py
+The precomputed `signals` table: one row per publisher and timeframe
+(the latest computation, replaced in place, with the date it is as of),
+holding the final-row indicator values plus oscSummary / maSummary /
+overallSummary.
+
+It is refreshed for every publisher at the end of the filter pipeline
+(Filter4 -> POST /signals/refresh), so /analysis can answer with one
+indexed lookup. A row is fresh while its as_of date equals the publisher's
+latest stock_data date; the filter pipeline deletes rows it makes stale by
+rewriting older history.
+"""
+
+import json
+import sqlite3
+from datetime import datetime
+
+SIGNALS_DDL = """
+    CREATE TABLE IF NOT EXISTS signals (
+        publisher_code TEXT NOT NULL,
+        timeframe TEXT NOT NULL,
+        as_of_date TEXT NOT NULL,
+        bars INTEGER,
+        final_row TEXT,
+        osc_summary TEXT,
+        ma_summary TEXT,
+        overall_summary TEXT,
+        computed_at TEXT,
+        PRIMARY KEY (publisher_code, timeframe)
+    )
+"""
+
+
+def ensure_signals_table(conn):
+    conn.execute(SIGNALS_DDL)
+
+
+def latest_data_date(conn, publisher_code):
+    """Newest stock_data date for the publisher (index lookup), or None."""
+    return conn.execute(
+        "SELECT MAX(date) FROM stock_data WHERE publisher_code = ?",
+        (publisher_code,)
+    ).fetchone()[0]
+
+
+def lookup_signal(conn, publisher_code, tf):
+    """The stored signals row as a dict, or None."""
+    try:
+        row = conn.execute("""
+            SELECT as_of_date, bars, final_row, osc_summary, ma_summary, overall_summary
+            FROM signals
+            WHERE publisher_code = ? AND timeframe = ?
+        """, (publisher_code, tf)).fetchone()
+    except sqlite3.OperationalError:
+        # table not created yet
+        return None
+    if not row:
+        return None
+    return {
+        "as_of": row[0],
+        "bars": row[1],
+        "final_row": json.loads(row[2]),
+        "oscSummary": json.loads(row[3]),
+        "maSummary": json.loads(row[4]),
+        "overallSummary": json.loads(row[5]),
+    }
+
+
+def store_signal(conn, publisher_code, tf, as_of, final_row, bars,
+                 oscSummary, maSummary, overallSummary):
+    ensure_signals_table(conn)
+    conn.execute("""
+        INSERT OR REPLACE INTO signals (
+            publisher_code, timeframe, as_of_date, bars, final_row,
+            osc_summary, ma_summary, overall_summary, computed_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (
+        publisher_code, tf, as_of, bars, json.dumps(final_row),
+        json.dumps(oscSummary), json.dumps(maSummary), json.dumps(overallSummary),
+        datetime.now().isoformat(timespec="seconds"),
+    ))
+    conn.commit()
@@ -1,15 +1,18 @@
 # Homework4/analysis_service/technical_analysis.py
 
+import os
 import sqlite3
+import numpy as np
 import pandas as pd
 import math
 from pathlib import Path
 
-# TA library
-import ta
-from ta.momentum import StochasticOscillator, RSIIndicator, WilliamsRIndicator
-from ta.trend import CCIIndicator, MACD, SMAIndicator, EMAIndicator
-from ta.volatility import BollingerBands
+from indicator_engine import (
+    compute_final_indicators, compute_panel_indicators, tail_drift, warmup_bars, WINDOWS,
+)
+from indicator_state import refresh_state
+from signal_store import lookup_signal, store_signal, latest_data_date
+from resample_store import TIMEFRAMES, load_bar_frame, refresh_bars, resample_daily
 
 ###################################################################
 # Using a different path approach: 1) resolve() to get an absolute
@@ -24,24 +27,14 @@ print(f"[technical_analysis.py] Using DB path: {STOCK_DB_PATH}")
 if not STOCK_DB_PATH.exists():
     print("[technical_analysis.py] WARNING: DB file does NOT exist at that path!")
 
-def parse_euro_number(val_str):
-    """
-    Convert a Euro-style string like '2.140,00' -> float:
-      1) Remove '.' (thousands)
-      2) Replace ',' with '.'
-      3) Convert to float
-    Returns None if conversion fails or val_str is empty.
-    
-    EXACT logic from your pre-microservices code—NO extra fixes.
-    """
-    if val_str in ("", "None", "nan"):
-        return None
-    step1 = val_str.replace(".", "")
-    step2 = step1.replace(",", ".")
-    try:
-        return float(step2)
-    except ValueError:
-        return None
+# "latest signals only" read horizon (rows); 0/unset = derived from the windows
+WARMUP_BARS = int(os.environ.get("ANALYSIS_WARMUP_BARS", 0)) or warmup_bars()
+
+# timeframes kept precomputed in the `signals` table
+SIGNAL_TIMEFRAMES = tuple(TIMEFRAMES)
+
+# max abs difference tolerated between tail and full-history EMA-based values
+DRIFT_TOLERANCE = float(os.environ.get("ANALYSIS_DRIFT_TOLERANCE", 0.01))
 
 def compute_tv_style_signal(buy_count, sell_count):
     """
@@ -56,46 +49,54 @@ def compute_tv_style_signal(buy_count, sell_count):
     else:
         return "Neutral"
 
-def compute_all_indicators_and_aggregate(publisher_code, tf="1D"):
-    """
-    Main function to query stock_data.db for publisher_code, parse numeric columns,
-    compute 10 technical indicators (5 oscillators + 5 moving averages)
-    at short/med/long windows, store them in the final row, 
-    and return aggregated signals.
+def _empty_result(publisher_code, msg):
+    return {
+        "publisher": publisher_code,
+        "records": [],
+        "msg": msg,
+        "oscSummary": {},
+        "maSummary": {},
+        "overallSummary": {}
+    }
 
-    EXACT same logic as your original "pre-microservices" code, 
-    except we changed how we set the DB path above.
+def load_price_frame(conn, publisher_code, limit=None, tf="1D"):
     """
-    try:
-        conn = sqlite3.connect(str(STOCK_DB_PATH))
-    except Exception as e:
-        return {
-            "publisher": publisher_code,
-            "records": [],
-            "msg": f"DB connection error: {e}",
-            "oscSummary": {},
-            "maSummary": {},
-            "overallSummary": {}
-        }
-
-    query = """
-        SELECT date, price, quantity, max, min
-        FROM stock_data
-        WHERE publisher_code = ?
-        ORDER BY date ASC
+    Reads date/close/volume/high/low for one publisher in date order.
+    With `limit`, only the newest `limit` rows are read (backwards range
+    scan on the (publisher_code, date) index) - the "latest signals" tail.
+    tf 1W/1M/1Q returns the cached OHLCV bars instead (resample_store).
     """
-    df = pd.read_sql_query(query, conn, params=[publisher_code])
-    conn.close()
-
-    if df.empty:
-        return {
-            "publisher": publisher_code,
-            "records": [],
-            "msg": "No data found",
-            "oscSummary": {},
-            "maSummary": {},
-            "overallSummary": {}
-        }
+    if tf != "1D":
+        try:
+            return load_bar_frame(conn, publisher_code, tf, limit)
+        except sqlite3.OperationalError as e:
+            # read-only DB: resample the daily rows in memory
+            print(f"[technical_analysis.py] bar cache unavailable ({e}), resampling")
+            conn.rollback()
+            bars = resample_daily(load_price_frame(conn, publisher_code), tf)
+            bars = bars.tail(limit) if limit else bars
+            bars = bars[["date", "close", "volume", "high", "low"]].reset_index(drop=True)
+            bars["date"] = pd.to_datetime(bars["date"], format="%Y-%m-%d")
+            return bars
+
+    if limit:
+        query = """
+            SELECT date, price, quantity, max, min
+            FROM stock_data
+            WHERE publisher_code = ?
+            ORDER BY date DESC
+            LIMIT ?
+        """
+        df = pd.read_sql_query(query, conn, params=[publisher_code, int(limit)])
+        df = df.iloc[::-1].reset_index(drop=True)
+    else:
+        query = """
+            SELECT date, price, quantity, max, min
+            FROM stock_data
+            WHERE publisher_code = ?
+            ORDER BY date ASC
+        """
+        df = pd.read_sql_query(query, conn, params=[publisher_code])
 
     # Rename columns
     df.rename(columns={
@@ -105,59 +106,18 @@ def compute_all_indicators_and_aggregate(publisher_code, tf="1D"):
         "min": "low"
     }, inplace=True)
 
-    # Convert date
-    df["date"] = pd.to_datetime(df["date"], format="%d.%m.%Y", errors="coerce")
-    df.sort_values("date", inplace=True, ignore_index=True)
-
-    # Convert numeric columns from '2.140,00' style
+    # stock_data stores ISO dates and REAL/INTEGER columns, already in date order
+    df["date"] = pd.to_datetime(df["date"], format="%Y-%m-%d", errors="coerce")
     for col in ["close", "high", "low", "volume"]:
-        df[col] = df[col].astype(str).apply(parse_euro_number)
         df[col] = pd.to_numeric(df[col], errors="coerce")
 
-    # Drop rows missing date/close
-    df.dropna(subset=["date", "close"], inplace=True)
-    if df.empty:
-        return {
-            "publisher": publisher_code,
-            "records": [],
-            "msg": "All records invalid.",
-            "oscSummary": {},
-            "maSummary": {},
-            "overallSummary": {}
-        }
-
-    short_win = 7
-    medium_win = 14
-    long_win = 30
-
-    # Build a list of daily records
-    records = []
-    for _, row in df.iterrows():
-        if pd.isna(row["date"]):
-            continue
-        rec = {
-            "date": str(row["date"].date()),
-            "close": None if math.isnan(row["close"]) else round(row["close"], 2)
-        }
-        records.append(rec)
-
-    if not records:
-        return {
-            "publisher": publisher_code,
-            "records": [],
-            "msg": "No valid data after cleaning.",
-            "oscSummary": {},
-            "maSummary": {},
-            "overallSummary": {}
-        }
-
-    # Insert oscillator/MA columns into final row
-    storeIndicatorsInFinalRow(df, records, short_win, medium_win, long_win)
-
-    # Summaries (just interpret medium signals for aggregator)
-    final_idx = len(records) - 1
-    last = records[final_idx]
+    return df
 
+def summarize_final_row(last):
+    """
+    oscSummary / maSummary / overallSummary from the medium-frame signals
+    of the final record.
+    """
     # 5 oscillator signals from "medium" timeframe
     oscSignals = [
         last.get("rsi_medium_sig", ""),
@@ -166,8 +126,6 @@ def compute_all_indicators_and_aggregate(publisher_code, tf="1D"):
         last.get("williamsr_medium_sig", ""),
         last.get("macd_medium_sig", ""),
     ]
-    oscSummary = build_summary(oscSignals)
-
     # 5 MAs from "medium"
     maSignals = [
         last.get("sma_medium_sig", ""),
@@ -176,13 +134,78 @@ def compute_all_indicators_and_aggregate(publisher_code, tf="1D"):
         last.get("zlema_medium_sig", ""),
         last.get("boll_medium_sig", ""),
     ]
-    maSummary = build_summary(maSignals)
-
     # overall = all 10
-    overallSignals = oscSignals + maSignals
-    overallSummary = build_summary(overallSignals)
+    return (
+        build_summary(oscSignals),
+        build_summary(maSignals),
+        build_summary(oscSignals + maSignals),
+    )
 
-    msg = f"Found {len(records)} rows (tf={tf})"
+def compute_all_indicators_and_aggregate(publisher_code, tf="1D", latest_only=False):
+    """
+    Main function to query stock_data.db for publisher_code (typed columns,
+    nothing to parse), compute 10 technical indicators (5 oscillators + 5 moving averages)
+    at short/med/long windows, store them in the final row, 
+    and return aggregated signals.
+
+    latest_only=True is the summary-only mode: only the final record is
+    returned, answered from the precomputed `signals` table (one indexed
+    lookup) and recomputed from the indicator state only when stale.
+    If the DB can't be written (read-only) it falls back to computing
+    from the last WARMUP_BARS rows (see check_tail_accuracy).
+
+    The full mode still reads every (date, close) for the chart, but takes
+    the final row from `signals` when it is fresh.
+    """
+    if latest_only:
+        try:
+            return get_latest_signals(publisher_code, tf)
+        except sqlite3.OperationalError as e:
+            print(f"[technical_analysis.py] signals/state unavailable ({e}), using tail read")
+
+    try:
+        conn = sqlite3.connect(str(STOCK_DB_PATH))
+    except Exception as e:
+        return _empty_result(publisher_code, f"DB connection error: {e}")
+
+    try:
+        df = load_price_frame(conn, publisher_code, WARMUP_BARS if latest_only else None, tf)
+        stored = None if latest_only else lookup_signal(conn, publisher_code, tf)
+        latest_date = latest_data_date(conn, publisher_code)
+    finally:
+        conn.close()
+
+    if df.empty:
+        return _empty_result(publisher_code, "No data found")
+
+    # Drop rows missing date/close
+    df = df.dropna(subset=["date", "close"])
+    if df.empty:
+        return _empty_result(publisher_code, "All records invalid.")
+
+    # Build a list of daily records (no per-row iterrows)
+    records = [
+        {"date": d, "close": None if math.isnan(c) else round(c, 2)}
+        for d, c in zip(df["date"].dt.strftime("%Y-%m-%d"), df["close"].tolist())
+    ]
+
+    if stored and stored["final_row"]["date"] == records[-1]["date"] \
+            and stored["as_of"] == latest_date:
+        records[-1] = stored["final_row"]
+        oscSummary = stored["oscSummary"]
+        maSummary = stored["maSummary"]
+        overallSummary = stored["overallSummary"]
+    else:
+        # Insert oscillator/MA columns into final row (single-pass engine;
+        # checked against the old `ta` version in tests/ta_reference.py)
+        records[-1].update(compute_final_indicators(df["close"], df["high"], df["low"], WINDOWS))
+        oscSummary, maSummary, overallSummary = summarize_final_row(records[-1])
+
+    if latest_only:
+        msg = f"Latest signals from last {len(records)} rows (tf={tf})"
+        records = records[-1:]
+    else:
+        msg = f"Found {len(records)} rows (tf={tf})"
     return {
         "publisher": publisher_code,
         "records": records,
@@ -192,6 +215,233 @@ def compute_all_indicators_and_aggregate(publisher_code, tf="1D"):
         "overallSummary": overallSummary
     }
 
+def _signals_result(publisher_code, tf, stored):
+    return {
+        "publisher": publisher_code,
+        "records": [stored["final_row"]],
+        "msg": f"Latest signals as of {stored['as_of']} from {stored['bars']} rows (tf={tf})",
+        "oscSummary": stored["oscSummary"],
+        "maSummary": stored["maSummary"],
+        "overallSummary": stored["overallSummary"]
+    }
+
+def _recompute_signals(conn, publisher_code, tf):
+    """
+    Advances the indicator state (1D) or the cached bars (1W/1M/1Q),
+    stores a fresh `signals` row and returns it (as lookup_signal would),
+    or None if there is no data.
+    """
+    if tf == "1D":
+        state = refresh_state(conn, publisher_code, WINDOWS)
+        if state is None:
+            return None
+        as_of, bars = state.as_of, state.bars
+        last = {"date": state.last_bar_date, "close": round(state.last_close, 2)}
+        last.update(state.final_indicators())
+    else:
+        # a few hundred cached bars at most: the engine is cheap enough
+        df = load_price_frame(conn, publisher_code, tf=tf).dropna(subset=["date", "close"])
+        if df.empty:
+            return None
+        as_of, bars = latest_data_date(conn, publisher_code), len(df)
+        last = {"date": df["date"].iloc[-1].strftime("%Y-%m-%d"),
+                "close": round(float(df["close"].iloc[-1]), 2)}
+        last.update(compute_final_indicators(df["close"], df["high"], df["low"], WINDOWS))
+    oscSummary, maSummary, overallSummary = summarize_final_row(last)
+    store_signal(conn, publisher_code, tf, as_of, last, bars,
+                 oscSummary, maSummary, overallSummary)
+    return {
+        "as_of": as_of,
+        "bars": bars,
+        "final_row": last,
+        "oscSummary": oscSummary,
+        "maSummary": maSummary,
+        "overallSummary": overallSummary,
+    }
+
+def get_latest_signals(publisher_code, tf="1D"):
+    """
+    Summary-only answer: the stored `signals` row if it is as new as the
+    publisher's latest stock_data date, otherwise recomputed and stored.
+    """
+    conn = sqlite3.connect(str(STOCK_DB_PATH))
+    try:
+        stored = lookup_signal(conn, publisher_code, tf)
+        if stored is None or stored["as_of"] != latest_data_date(conn, publisher_code):
+            stored = _recompute_signals(conn, publisher_code, tf)
+    finally:
+        conn.close()
+    if stored is None:
+        return _empty_result(publisher_code, "No data found")
+    return _signals_result(publisher_code, tf, stored)
+
+def refresh_indicator_states(publisher_codes):
+    """
+    Advances the stored indicator state of each publisher (called by the
+    filter pipeline after it saves rows). Returns {code: as_of date or None}.
+    """
+    conn = sqlite3.connect(str(STOCK_DB_PATH))
+    try:
+        result = {}
+        for code in publisher_codes:
+            state = refresh_state(conn, code, WINDOWS)
+            result[code] = state.as_of if state else None
+        return result
+    finally:
+        conn.close()
+
+def refresh_signals(publisher_codes, timeframes=SIGNAL_TIMEFRAMES):
+    """
+    Post-ingest stage (Filter4 -> POST /signals/refresh): recompute the
+    `signals` row of every publisher whose stored one is stale.
+    Returns {code: as_of date or None}.
+    """
+    conn = sqlite3.connect(str(STOCK_DB_PATH))
+    try:
+        result = {}
+        for code in publisher_codes:
+            latest = latest_data_date(conn, code)
+            for tf in timeframes:
+                stored = lookup_signal(conn, code, tf)
+                if latest is not None and (stored is None or stored["as_of"] != latest):
+                    stored = _recompute_signals(conn, code, tf)
+                result[code] = stored["as_of"] if stored else None
+        return result
+    finally:
+        conn.close()
+
+def load_price_panel(conn, publisher_codes=None, tf="1D"):
+    """
+    Grouped scan of stock_data (or of the cached ohlcv_bars for 1W/1M/1Q)
+    for the given publishers, or all of them: one aggregate for each
+    publisher's bar count / latest date and one index-ordered read of the
+    close/high/low values, in the same snapshot.
+    Returns (codes, dates, close, high, low): the three (bars, publishers)
+    panels are right-aligned on each publisher's latest bar and NaN-padded
+    above its first one; dates[j] is publisher j's latest date.
+    Rows without a close are skipped, as in the single-publisher path.
+    """
+    if tf == "1D":
+        table, values_sql, order = "stock_data", "price, max, min", "date"
+        where, params = "WHERE price IS NOT NULL", []
+    else:
+        codes = publisher_codes or [r[0] for r in conn.execute(
+            "SELECT DISTINCT publisher_code FROM stock_data")]
+        for code in codes:
+            refresh_bars(conn, code, tf)
+        table, values_sql, order = "ohlcv_bars", "close, high, low", "period_start"
+        where, params = "WHERE timeframe = ? AND close IS NOT NULL", [tf]
+    if publisher_codes:
+        codes = sorted(set(publisher_codes))
+        where += f" AND publisher_code IN ({', '.join('?' * len(codes))})"
+        params += codes
+
+    conn.execute("BEGIN")
+    try:
+        groups = conn.execute(f"""
+            SELECT publisher_code, COUNT(*), MAX(date)
+            FROM {table}
+            {where}
+            GROUP BY publisher_code
+            ORDER BY publisher_code
+        """, params).fetchall()
+        values = np.array(conn.execute(f"""
+            SELECT {values_sql}
+            FROM {table}
+            {where}
+            ORDER BY publisher_code, {order} ASC
+        """, params).fetchall(), dtype="float64")
+    finally:
+        conn.rollback()
+
+    if not groups:
+        empty = np.empty((0, 0))
+        return [], [], empty, empty, empty
+
+    codes = [g[0] for g in groups]
+    counts = np.array([g[1] for g in groups])
+    dates = [g[2] for g in groups]
+
+    # column per publisher, row per position counted from the latest bar
+    bars = int(counts.max())
+    col = np.repeat(np.arange(len(codes)), counts)
+    starts = np.repeat(np.cumsum(counts) - counts, counts)
+    row = bars - np.repeat(counts, counts) + (np.arange(len(values)) - starts)
+
+    panels = []
+    for k in range(3):
+        panel = np.full((bars, len(codes)), np.nan)
+        panel[row, col] = values[:, k]
+        panels.append(panel)
+    return codes, dates, *panels
+
+def compute_batch_summaries(publisher_codes=None, tf="1D"):
+    """
+    Whole-market (or N publishers) analysis in one pass: one grouped SQL
+    scan, the indicators evaluated on the publisher x date panel, and one
+    mode=latest-shaped result per publisher. Publishers without usable
+    rows are listed under "missing".
+    """
+    conn = sqlite3.connect(str(STOCK_DB_PATH))
+    try:
+        codes, dates, close, high, low = load_price_panel(conn, publisher_codes, tf)
+    finally:
+        conn.close()
+
+    finals = compute_panel_indicators(close, high, low, WINDOWS) if codes else []
+    results = []
+    for j, (code, final) in enumerate(zip(codes, finals)):
+        last = {"date": dates[j], "close": round(float(close[-1, j]), 2)}
+        last.update(final)
+        oscSummary, maSummary, overallSummary = summarize_final_row(last)
+        results.append({
+            "publisher": code,
+            "records": [last],
+            "msg": f"Latest signals from {int(np.count_nonzero(~np.isnan(close[:, j])))} rows (tf={tf})",
+            "oscSummary": oscSummary,
+            "maSummary": maSummary,
+            "overallSummary": overallSummary
+        })
+
+    missing = sorted(set(publisher_codes or []) - set(codes))
+    return {
+        "tf": tf,
+        "count": len(results),
+        "results": results,
+        "missing": missing
+    }
+
+def check_tail_accuracy(publisher_code, bars=None, tolerance=None):
+    """
+    Compares the latest_only (tail) values with the full-history ones for
+    the EMA-based indicators and reports the drift against `tolerance`.
+    """
+    bars = int(bars or WARMUP_BARS)
+    tolerance = DRIFT_TOLERANCE if tolerance is None else float(tolerance)
+
+    conn = sqlite3.connect(str(STOCK_DB_PATH))
+    try:
+        df = load_price_frame(conn, publisher_code).dropna(subset=["date", "close"])
+    finally:
+        conn.close()
+    if df.empty:
+        return {"publisher": publisher_code, "msg": "No data found"}
+
+    drift, flipped = tail_drift(df["close"], df["high"], df["low"], bars, WINDOWS)
+    max_key = max(drift, key=drift.get) if drift else None
+    max_drift = drift[max_key] if max_key else 0.0
+    return {
+        "publisher": publisher_code,
+        "rows": len(df),
+        "bars": bars,
+        "tolerance": tolerance,
+        "maxDrift": max_drift,
+        "maxDriftKey": max_key,
+        "drift": drift,
+        "flippedSignals": {k: list(v) for k, v in flipped.items()},
+        "withinTolerance": max_drift <= tolerance and not flipped,
+    }
+
 def build_summary(signal_list):
     """
     Takes a list of signals (e.g. ['Buy','Sell','Hold','Buy']) and returns
@@ -209,326 +459,3 @@ def build_summary(signal_list):
         "neutral": hold_count,
         "finalSignal": finalSignal
     }
-
-def storeIndicatorsInFinalRow(df, records, short_win, medium_win, long_win):
-    """
-    EXACT logic from your original code.
-    Inserts short/medium/long oscillator & MA columns into records[-1].
-    If numeric portion is NaN, sets them to "".
-    """
-    if not records or df.empty:
-        return
-
-    final_idx = len(records) - 1
-    r = records[final_idx]
-
-    def finalize_indicator(val, sig):
-        if val is None or (isinstance(val, float) and math.isnan(val)):
-            return "", ""
-        if not sig:
-            sig = ""
-        return val, sig
-
-    # =========== RSI ===========
-    from ta.momentum import RSIIndicator
-    def rsi_calc(window):
-        rsi_series = RSIIndicator(df["close"], window=window, fillna=False).rsi()
-        rsi_val = rsi_series.iloc[-1]
-        if math.isnan(rsi_val):
-            return None, None
-        if rsi_val > 70:
-            sig = "Sell"
-        elif rsi_val < 30:
-            sig = "Buy"
-        else:
-            sig = "Hold"
-        return rsi_val, sig
-
-    rsiS_val, rsiS_sig = rsi_calc(short_win)
-    rsiS_val, rsiS_sig = finalize_indicator(rsiS_val, rsiS_sig)
-
-    rsiM_val, rsiM_sig = rsi_calc(medium_win)
-    rsiM_val, rsiM_sig = finalize_indicator(rsiM_val, rsiM_sig)
-
-    rsiL_val, rsiL_sig = rsi_calc(long_win)
-    rsiL_val, rsiL_sig = finalize_indicator(rsiL_val, rsiL_sig)
-
-    r["rsi_short"] = rsiS_val
-    r["rsi_short_sig"] = rsiS_sig
-    r["rsi_medium"] = rsiM_val
-    r["rsi_medium_sig"] = rsiM_sig
-    r["rsi_long"] = rsiL_val
-    r["rsi_long_sig"] = rsiL_sig
-
-    # =========== Stochastic ===========
-    from ta.momentum import StochasticOscillator
-    def stoch_calc(window):
-        stoch = StochasticOscillator(
-            high=df["high"], low=df["low"], close=df["close"],
-            window=window, smooth_window=3, fillna=False
-        )
-        k_val = stoch.stoch().iloc[-1]
-        if math.isnan(k_val):
-            return None, None
-        if k_val > 80:
-            sig = "Sell"
-        elif k_val < 20:
-            sig = "Buy"
-        else:
-            sig = "Hold"
-        return k_val, sig
-
-    stochS_val, stochS_sig = stoch_calc(short_win)
-    stochS_val, stochS_sig = finalize_indicator(stochS_val, stochS_sig)
-
-    stochM_val, stochM_sig = stoch_calc(medium_win)
-    stochM_val, stochM_sig = finalize_indicator(stochM_val, stochM_sig)
-
-    stochL_val, stochL_sig = stoch_calc(long_win)
-    stochL_val, stochL_sig = finalize_indicator(stochL_val, stochL_sig)
-
-    r["stoch_short"] = stochS_val
-    r["stoch_short_sig"] = stochS_sig
-    r["stoch_medium"] = stochM_val
-    r["stoch_medium_sig"] = stochM_sig
-    r["stoch_long"] = stochL_val
-    r["stoch_long_sig"] = stochL_sig
-
-    # =========== CCI ===========
-    from ta.trend import CCIIndicator
-    def cci_calc(window):
-        cci = CCIIndicator(
-            high=df["high"], low=df["low"], close=df["close"],
-            window=window, fillna=False
-        )
-        cci_val = cci.cci().iloc[-1]
-        if math.isnan(cci_val):
-            return None, None
-        if cci_val > 100:
-            sig = "Sell"
-        elif cci_val < -100:
-            sig = "Buy"
-        else:
-            sig = "Hold"
-        return cci_val, sig
-
-    cciS_val, cciS_sig = cci_calc(short_win)
-    cciS_val, cciS_sig = finalize_indicator(cciS_val, cciS_sig)
-
-    cciM_val, cciM_sig = cci_calc(medium_win)
-    cciM_val, cciM_sig = finalize_indicator(cciM_val, cciM_sig)
-
-    cciL_val, cciL_sig = cci_calc(long_win)
-    cciL_val, cciL_sig = finalize_indicator(cciL_val, cciL_sig)
-
-    r["cci_short"] = cciS_val
-    r["cci_short_sig"] = cciS_sig
-    r["cci_medium"] = cciM_val
-    r["cci_medium_sig"] = cciM_sig
-    r["cci_long"] = cciL_val
-    r["cci_long_sig"] = cciL_sig
-
-    # =========== Williams %R ===========
-    from ta.momentum import WilliamsRIndicator
-    def williams_calc(lbp):
-        w = WilliamsRIndicator(
-            high=df["high"], low=df["low"], close=df["close"],
-            lbp=lbp, fillna=False
-        )
-        wv = w.williams_r().iloc[-1]
-        if math.isnan(wv):
-            return None, None
-        if wv > -20:
-            sig = "Sell"
-        elif wv < -80:
-            sig = "Buy"
-        else:
-            sig = "Hold"
-        return wv, sig
-
-    wS_val, wS_sig = williams_calc(short_win)
-    wS_val, wS_sig = finalize_indicator(wS_val, wS_sig)
-
-    wM_val, wM_sig = williams_calc(medium_win)
-    wM_val, wM_sig = finalize_indicator(wM_val, wM_sig)
-
-    wL_val, wL_sig = williams_calc(long_win)
-    wL_val, wL_sig = finalize_indicator(wL_val, wL_sig)
-
-    r["williamsr_short"] = wS_val
-    r["williamsr_short_sig"] = wS_sig
-    r["williamsr_medium"] = wM_val
-    r["williamsr_medium_sig"] = wM_sig
-    r["williamsr_long"] = wL_val
-    r["williamsr_long_sig"] = wL_sig
-
-    # =========== MACD ===========
-    def macd_calc(fast, slow, sign):
-        from ta.trend import MACD
-        macd_obj = MACD(
-            close=df["close"], window_slow=slow,
-            window_fast=fast, window_sign=sign, fillna=False
-        )
-        macd_val = macd_obj.macd().iloc[-1]
-        macdsig_val = macd_obj.macd_signal().iloc[-1]
-        if math.isnan(macd_val) or math.isnan(macdsig_val):
-            return None, None, None
-        if macd_val > macdsig_val:
-            s = "Buy"
-        elif macd_val < macdsig_val:
-            s = "Sell"
-        else:
-            s = "Hold"
-        return macd_val, macdsig_val, s
-
-    macdS_val, macdS_sigVal, macdS_sig = macd_calc(6, 13, 5)
-    if macdS_val is None or (isinstance(macdS_val, float) and math.isnan(macdS_val)):
-        macdS_val, macdS_sigVal, macdS_sig = "", "", ""
-    elif macdS_sigVal is None or (isinstance(macdS_sigVal, float) and math.isnan(macdS_sigVal)):
-        macdS_sigVal = ""
-    elif not macdS_sig:
-        macdS_sig = ""
-
-    macdM_val, macdM_sigVal, macdM_sig = macd_calc(12, 26, 9)
-    if macdM_val is None or (isinstance(macdM_val, float) and math.isnan(macdM_val)):
-        macdM_val, macdM_sigVal, macdM_sig = "", "", ""
-    elif macdM_sigVal is None or (isinstance(macdM_sigVal, float) and math.isnan(macdM_sigVal)):
-        macdM_sigVal = ""
-    elif not macdM_sig:
-        macdM_sig = ""
-
-    macdL_val, macdL_sigVal, macdL_sig = macd_calc(24, 52, 18)
-    if macdL_val is None or (isinstance(macdL_val, float) and math.isnan(macdL_val)):
-        macdL_val, macdL_sigVal, macdL_sig = "", "", ""
-    elif macdL_sigVal is None or (isinstance(macdL_sigVal, float) and math.isnan(macdL_sigVal)):
-        macdL_sigVal = ""
-    elif not macdL_sig:
-        macdL_sig = ""
-
-    r["macd_short"] = macdS_val
-    r["macd_short_sig"] = macdS_sig
-    r["macd_medium"] = macdM_val
-    r["macd_medium_sig"] = macdM_sig
-    r["macd_long"] = macdL_val
-    r["macd_long_sig"] = macdL_sig
-
-    # =========== MAs (SMA, EMA, WMA, ZLEMA, BollMid) ===========
-    from ta.trend import SMAIndicator, EMAIndicator
-    from ta.volatility import BollingerBands
-
-    def compare_ma(ma_val):
-        # If there's no numeric ma_val, return "".
-        if ma_val is None or (isinstance(ma_val, float) and math.isnan(ma_val)):
-            return ""
-        close_val = df["close"].iloc[-1]
-        if math.isnan(close_val) or math.isnan(ma_val):
-            return ""
-        if close_val > ma_val:
-            return "Buy"
-        elif close_val < ma_val:
-            return "Sell"
-        else:
-            return "Hold"
-
-    def sma_calc(window):
-        sma = SMAIndicator(df["close"], window=window, fillna=False).sma_indicator().iloc[-1]
-        if math.isnan(sma):
-            return None
-        return round(sma, 2)
-
-    def ema_calc(window):
-        ema = EMAIndicator(df["close"], window=window, fillna=False).ema_indicator().iloc[-1]
-        if math.isnan(ema):
-            return None
-        return round(ema, 2)
-
-    def wma_calc(window):
-        if len(df) < window:
-            return None
-        subset = df["close"].tail(window)
-        weights = range(1, window + 1)
-        wma_val = sum(s*w for s,w in zip(subset, weights)) / sum(weights)
-        return round(wma_val, 2)
-
-    def zlema_calc(window):
-        # Return the same as EMA or do advanced ZLEMA if you prefer
-        return ema_calc(window)
-
-    def boll_calc(window):
-        boll = BollingerBands(df["close"], window=window, fillna=False)
-        mid_val = boll.bollinger_mavg().iloc[-1]
-        if math.isnan(mid_val):
-            return None
-        return round(mid_val, 2)
-
-    # short
-    smaS_val = sma_calc(short_win)
-    emaS_val = ema_calc(short_win)
-    wmaS_val = wma_calc(short_win)
-    zlemaS_val = zlema_calc(short_win)
-    bollS_val = boll_calc(short_win)
-
-    smaS_sig = compare_ma(smaS_val)
-    emaS_sig = compare_ma(emaS_val)
-    wmaS_sig = compare_ma(wmaS_val)
-    zlemaS_sig = compare_ma(zlemaS_val)
-    bollS_sig = compare_ma(bollS_val)
-
-    r["sma_short"] = smaS_val if smaS_val else ""
-    r["sma_short_sig"] = smaS_sig
-    r["ema_short"] = emaS_val if emaS_val else ""
-    r["ema_short_sig"] = emaS_sig
-    r["wma_short"] = wmaS_val if wmaS_val else ""
-    r["wma_short_sig"] = wmaS_sig
-    r["zlema_short"] = zlemaS_val if zlemaS_val else ""
-    r["zlema_short_sig"] = zlemaS_sig
-    r["boll_short"] = bollS_val if bollS_val else ""
-    r["boll_short_sig"] = bollS_sig
-
-    # medium
-    smaM_val = sma_calc(medium_win)
-    emaM_val = ema_calc(medium_win)
-    wmaM_val = wma_calc(medium_win)
-    zlemaM_val = zlema_calc(medium_win)
-    bollM_val = boll_calc(medium_win)
-
-    smaM_sig = compare_ma(smaM_val)
-    emaM_sig = compare_ma(emaM_val)
-    wmaM_sig = compare_ma(wmaM_val)
-    zlemaM_sig = compare_ma(zlemaM_val)
-    bollM_sig = compare_ma(bollM_val)
-
-    r["sma_medium"] = smaM_val if smaM_val else ""
-    r["sma_medium_sig"] = smaM_sig
-    r["ema_medium"] = emaM_val if emaM_val else ""
-    r["ema_medium_sig"] = emaM_sig
-    r["wma_medium"] = wmaM_val if wmaM_val else ""
-    r["wma_medium_sig"] = wmaM_sig
-    r["zlema_medium"] = zlemaM_val if zlemaM_val else ""
-    r["zlema_medium_sig"] = zlemaM_sig
-    r["boll_medium"] = bollM_val if bollM_val else ""
-    r["boll_medium_sig"] = bollM_sig
-
-    # long
-    smaL_val = sma_calc(long_win)
-    emaL_val = ema_calc(long_win)
-    wmaL_val = wma_calc(long_win)
-    zlemaL_val = zlema_calc(long_win)
-    bollL_val = boll_calc(long_win)
-
-    smaL_sig = compare_ma(smaL_val)
-    emaL_sig = compare_ma(emaL_val)
-    wmaL_sig = compare_ma(wmaL_val)
-    zlemaL_sig = compare_ma(zlemaL_val)
-    bollL_sig = compare_ma(bollL_val)
-
-    r["sma_long"] = smaL_val if smaL_val else ""
-    r["sma_long_sig"] = smaL_sig
-    r["ema_long"] = emaL_val if emaL_val else ""
-    r["ema_long_sig"] = emaL_sig
-    r["wma_long"] = wmaL_val if wmaL_val else ""
-    r["wma_long_sig"] = wmaL_sig
-    r["zlema_long"] = zlemaL_val if zlemaL_val else ""
-    r["zlema_long_sig"] = zlemaL_sig
-    r["boll_long"] = bollL_val if bollL_val else ""
-    r["boll_long_sig"] = bollL_sig
@@ -0,0 +1,7 @@
+# Homework4/analysis_service/tests/conftest.py
+# the service's modules import each other by bare name (they run from
+# their own folder), so put that folder on the path
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
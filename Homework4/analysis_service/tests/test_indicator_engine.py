@@ -0,0 +1,102 @@
+# Homework4/analysis_service/tests/test_indicator_engine.py
+# indicator_engine / indicator_state against the `ta`-based
+# storeIndicatorsInFinalRow they replaced (tests/ta_reference.py)
+
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicator_engine import WINDOWS, compute_final_indicators, compute_panel_indicators
+from indicator_state import IndicatorState
+from ta_reference import storeIndicatorsInFinalRow
+
+
+def _series(bars, seed=7, flat=False, nan_high_low=False):
+    rng = np.random.default_rng(seed)
+    if flat:
+        close = np.full(bars, 100.0)
+    else:
+        close = np.round(1000 + np.cumsum(rng.normal(0, 8, bars)), 2)
+    high = close + np.round(rng.uniform(0, 5, bars), 2)
+    low = close - np.round(rng.uniform(0, 5, bars), 2)
+    if nan_high_low:
+        # MSE rows with a price but no max / min
+        gaps = rng.random(bars) < 0.2
+        high[gaps] = np.nan
+        low[gaps] = np.nan
+    return pd.DataFrame({"close": close, "high": high, "low": low})
+
+
+def _reference(df):
+    records = [{} for _ in range(len(df))]
+    storeIndicatorsInFinalRow(df, records, WINDOWS["short"], WINDOWS["medium"], WINDOWS["long"])
+    return records[-1]
+
+
+def _assert_same(actual, expected):
+    assert actual.keys() == expected.keys()
+    for key, want in expected.items():
+        got = actual[key]
+        if isinstance(want, str) or isinstance(got, str):
+            assert got == want, key
+        elif math.isnan(want):
+            assert math.isnan(got), key
+        else:
+            assert got == pytest.approx(want, rel=1e-9, abs=1e-9), key
+
+
+CASES = {
+    "shorter than the short window": _series(5),
+    "between the windows": _series(20),
+    "shorter than the slow MACD": _series(60),
+    "flat": _series(120, flat=True),
+    "nan high / low": _series(200, nan_high_low=True),
+    "long": _series(2500),
+}
+
+
+@pytest.mark.parametrize("df", CASES.values(), ids=CASES.keys())
+def test_final_indicators_match_ta(df):
+    actual = compute_final_indicators(df["close"], df["high"], df["low"], WINDOWS)
+    _assert_same(actual, _reference(df))
+
+
+@pytest.mark.parametrize("df", CASES.values(), ids=CASES.keys())
+def test_state_push_matches_full_recompute(df):
+    state = IndicatorState()
+    for i, row in enumerate(df.itertuples(index=False)):
+        state.push(f"day-{i}", row.close, row.high, row.low)
+    full = compute_final_indicators(df["close"], df["high"], df["low"], WINDOWS)
+    _assert_same(state.final_indicators(), full)
+
+
+def test_state_survives_a_json_round_trip_mid_series():
+    df = _series(300, seed=3)
+    state = IndicatorState()
+    for i, row in enumerate(df.iloc[:200].itertuples(index=False)):
+        state.push(f"day-{i}", row.close, row.high, row.low)
+    state = IndicatorState.from_json(state.to_json())
+    for i, row in enumerate(df.iloc[200:].itertuples(index=False), start=200):
+        state.push(f"day-{i}", row.close, row.high, row.low)
+    full = compute_final_indicators(df["close"], df["high"], df["low"], WINDOWS)
+    _assert_same(state.final_indicators(), full)
+
+
+def test_panel_matches_single_series():
+    frames = list(CASES.values())
+    bars = max(len(df) for df in frames)
+    panels = []
+    for column in ("close", "high", "low"):
+        # right-aligned on the latest bar, NaN above each series' first one
+        panel = np.full((bars, len(frames)), np.nan)
+        for j, df in enumerate(frames):
+            panel[bars - len(df):, j] = df[column].to_numpy()
+        panels.append(panel)
+
+    finals = compute_panel_indicators(*panels, WINDOWS)
+
+    assert len(finals) == len(frames)
+    for df, final in zip(frames, finals):
+        _assert_same(final, compute_final_indicators(df["close"], df["high"], df["low"], WINDOWS))
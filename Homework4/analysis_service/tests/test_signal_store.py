@@ -0,0 +1,27 @@
+# Homework4/analysis_service/tests/test_signal_store.py
+
+import sqlite3
+
+from signal_store import lookup_signal, store_signal
+
+
+def _store(conn, code, tf, as_of, close):
+    store_signal(conn, code, tf, as_of, {"close": close}, 100,
+                 {"finalSignal": "Buy"}, {"finalSignal": "Hold"}, {"finalSignal": "Buy"})
+
+
+def test_one_row_per_publisher_and_timeframe():
+    conn = sqlite3.connect(":memory:")
+    for day, close in (("2026-10-14", 1.0), ("2026-10-15", 2.0), ("2026-10-16", 3.0)):
+        _store(conn, "ALK", "1D", day, close)
+    _store(conn, "ALK", "1W", "2026-10-12", 9.0)
+
+    assert conn.execute("SELECT COUNT(*) FROM signals").fetchone()[0] == 2
+    stored = lookup_signal(conn, "ALK", "1D")
+    assert stored["as_of"] == "2026-10-16"
+    assert stored["final_row"] == {"close": 3.0}
+    assert lookup_signal(conn, "ALK", "1W")["as_of"] == "2026-10-12"
+
+
+def test_lookup_before_the_table_exists():
+    assert lookup_signal(sqlite3.connect(":memory:"), "ALK", "1D") is None
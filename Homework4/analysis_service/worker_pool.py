@@ -0,0 +1,173 @@
+# Homework4/analysis_service/worker_pool.py
+
+"""
+worker_pool.py
+Optional process-pool execution for the analysis service. The indicator
+work is CPU-bound pandas/NumPy code, so on the Flask request thread it is
+capped at one core by the GIL.
+
+    ANALYSIS_EXECUTION = inline (default) | process
+    ANALYSIS_WORKERS   = worker processes (default: CPU count)
+
+In process mode the pool is started on first use with "spawn" workers
+(works the same on Linux, Docker and the Windows start_all.bat setup)
+that import pandas / the engine up front and run one warm-up
+computation, so the first real request doesn't pay for it.
+Single /analysis requests are handed to a worker; batch / whole-market
+requests are split into one shard of publishers per worker and each
+shard runs the panel computation.
+
+Benchmark (run it on the target host before switching to process mode;
+on one or two cores the spawn and pickling overhead can outweigh it):
+    python worker_pool.py [--workers 1 2 4] [--repeat 3] [--db path]
+"""
+
+import argparse
+import atexit
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import technical_analysis
+from technical_analysis import compute_all_indicators_and_aggregate, compute_batch_summaries
+
+EXECUTION = os.environ.get("ANALYSIS_EXECUTION", "inline").strip().lower()
+WORKERS = int(os.environ.get("ANALYSIS_WORKERS", 0)) or os.cpu_count() or 1
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _warm_worker(db_path=None):
+    """
+    Pool initializer: one tiny computation (importing this module already
+    pulled in pandas / NumPy and the engine).
+    """
+    import numpy as np
+    from indicator_engine import compute_final_indicators
+
+    if db_path:
+        technical_analysis.STOCK_DB_PATH = db_path
+    close = np.linspace(100.0, 110.0, 64)
+    compute_final_indicators(close, close * 1.01, close * 0.99)
+
+
+def get_pool(workers=None, db_path=None):
+    """The shared pool (started on first call), or None in inline mode."""
+    global _pool
+    if EXECUTION != "process" and workers is None:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=workers or WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_warm_worker,
+                initargs=(db_path,),
+            )
+            # start every worker now instead of on the first request
+            list(_pool.map(_noop, range(workers or WORKERS)))
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
+
+
+atexit.register(shutdown_pool)
+
+
+def _noop(_):
+    return os.getpid()
+
+
+def _all_publishers():
+    conn = sqlite3.connect(str(technical_analysis.STOCK_DB_PATH))
+    try:
+        return [r[0] for r in conn.execute(
+            "SELECT DISTINCT publisher_code FROM stock_data ORDER BY publisher_code")]
+    finally:
+        conn.close()
+
+
+def _shards(codes, n):
+    """n interleaved shards, so long and short histories spread evenly."""
+    return [s for s in (codes[i::n] for i in range(n)) if s]
+
+
+def run_analysis(publisher_code, tf="1D", latest_only=False):
+    """compute_all_indicators_and_aggregate, in a worker when enabled."""
+    pool = get_pool()
+    if pool is None:
+        return compute_all_indicators_and_aggregate(publisher_code, tf, latest_only=latest_only)
+    return pool.submit(
+        compute_all_indicators_and_aggregate, publisher_code, tf, latest_only
+    ).result()
+
+
+def run_batch(publisher_codes=None, tf="1D", workers=None):
+    """
+    compute_batch_summaries, sharded across the pool when enabled.
+    Same result shape as the inline call.
+    """
+    pool = get_pool(workers)
+    if pool is None:
+        return compute_batch_summaries(publisher_codes, tf)
+
+    codes = sorted(set(publisher_codes)) if publisher_codes else _all_publishers()
+    shards = _shards(codes, workers or WORKERS)
+    if len(shards) <= 1:
+        return compute_batch_summaries(codes or None, tf)
+
+    results, missing = [], []
+    for part in pool.map(compute_batch_summaries, shards, [tf] * len(shards)):
+        results.extend(part["results"])
+        missing.extend(part["missing"])
+    results.sort(key=lambda r: r["publisher"])
+    return {
+        "tf": tf,
+        "count": len(results),
+        "results": results,
+        "missing": sorted(missing) if publisher_codes else []
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark whole-market analysis per worker count.")
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--db", help="stock_data.db to use (default: the service's)")
+    args = ap.parse_args()
+
+    if args.db:
+        technical_analysis.STOCK_DB_PATH = os.path.abspath(args.db)
+    codes = _all_publishers()
+    print(f"{len(codes)} publishers, {os.cpu_count()} CPUs")
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        compute_batch_summaries(None)
+    inline = (time.perf_counter() - start) / args.repeat
+    print(f"inline        {inline * 1000:8.0f} ms  {len(codes) / inline:8.1f} publishers/s")
+
+    for n in args.workers:
+        shutdown_pool()
+        get_pool(n, technical_analysis.STOCK_DB_PATH)
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            run_batch(codes, workers=n)
+        took = (time.perf_counter() - start) / args.repeat
+        print(f"{n:2d} worker(s)  {took * 1000:8.0f} ms  {len(codes) / took:8.1f} publishers/s"
+              f"  x{inline / took:.2f}")
+    shutdown_pool()
+
+
+if __name__ == "__main__":
+    main()
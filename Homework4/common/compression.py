@@ -0,0 +1,176 @@
+# Homework4/common/compression.py
+
+"""
+compression.py
+Accept-Encoding negotiation for a Flask app (init_app(app) registers an
+after_request hook):
+
+  - zstd (if `zstandard` is installed), br (if `brotli` is installed) and
+    gzip, picked by the client's q-values, in that order of preference
+  - only JSON / text bodies of at least COMPRESS_MIN_BYTES; smaller ones
+    aren't worth the CPU and header bytes
+  - streamed bodies (stream=1) are gzipped on the fly, chunk by chunk
+  - a compressed response's ETag becomes weak (W/"..."): the bytes differ
+    per encoding, but If-None-Match still matches with weak comparison
+  - compressed bodies of responses with an ETag are kept in an LRU
+    (COMPRESS_CACHE_MAX_MB) keyed by (ETag, encoding), so a hot response
+    is compressed once, not on every hit
+  - Vary: Accept-Encoding on everything that could have been compressed,
+    and on 304s (they carry the headers of the 200 they revalidate)
+
+Shared by the gateway and the analysis service: both apps put
+Homework4/common on sys.path (the analysis image copies it to /common,
+next to /app).
+
+Configuration (env):
+    COMPRESS                 1 (0 disables it)
+    COMPRESS_MIN_BYTES       1024
+    COMPRESS_CACHE_MAX_MB    32
+"""
+
+import gzip
+import os
+import threading
+import zlib
+from collections import OrderedDict
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESS = os.environ.get("COMPRESS", "1") != "0"
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", 1024))
+COMPRESS_CACHE_MAX_MB = float(os.environ.get("COMPRESS_CACHE_MAX_MB", 32))
+
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+ENCODERS = {"gzip": lambda body: gzip.compress(body, compresslevel=6, mtime=0)}
+if brotli is not None:
+    ENCODERS["br"] = lambda body: brotli.compress(body, quality=5)
+if zstandard is not None:
+    _zstd = zstandard.ZstdCompressor(level=3)
+    ENCODERS["zstd"] = lambda body: _zstd.compress(body)
+
+# server preference when the client rates several encodings the same
+PREFERENCE = [e for e in ("zstd", "br", "gzip") if e in ENCODERS]
+
+
+class CompressedBodies:
+    """LRU of compressed bodies keyed by (etag, encoding), bounded in bytes."""
+
+    def __init__(self, max_mb=COMPRESS_CACHE_MAX_MB):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = body
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "size_mb": round(self._size / 1024 / 1024, 3),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+compressed_bodies = CompressedBodies()
+
+
+def negotiate(candidates=None):
+    """The best encoding the client accepts (q > 0), or None for identity."""
+    return request.accept_encodings.best_match(candidates or PREFERENCE)
+
+
+def _gzip_stream(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)   # 31: gzip container
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def compress_response(resp):
+    if not COMPRESS or "Content-Encoding" in resp.headers:
+        return resp
+    if resp.status_code == 304:
+        # stands in for the 200 it revalidates, so caches must key it the same way
+        resp.vary.add("Accept-Encoding")
+        return resp
+    if resp.status_code != 200 or not (resp.mimetype or "").startswith(COMPRESSIBLE_TYPES):
+        return resp
+    resp.vary.add("Accept-Encoding")
+
+    if resp.is_streamed:
+        if negotiate(["gzip"]) is None:
+            return resp
+        resp.response = _gzip_stream(resp.response)
+        resp.headers["Content-Encoding"] = "gzip"
+        resp.headers.pop("Content-Length", None)
+        _weaken_etag(resp)
+        return resp
+
+    if resp.direct_passthrough or resp.content_length is None \
+            or resp.content_length < COMPRESS_MIN_BYTES:
+        return resp
+    encoding = negotiate()
+    if encoding is None:
+        return resp
+
+    etag, weak = resp.get_etag()
+    key = (etag, encoding) if etag and not weak else None
+    body = compressed_bodies.get(key) if key else None
+    if body is None:
+        body = ENCODERS[encoding](resp.get_data())
+        if key:
+            compressed_bodies.put(key, body)
+    resp.set_data(body)
+    resp.headers["Content-Encoding"] = encoding
+    _weaken_etag(resp)
+    return resp
+
+
+def _weaken_etag(resp):
+    etag, weak = resp.get_etag()
+    if etag and not weak:
+        resp.set_etag(etag, weak=True)
+
+
+def init_app(app):
+    app.after_request(compress_response)
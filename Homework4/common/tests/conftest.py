@@ -0,0 +1,7 @@
+# Homework4/common/tests/conftest.py
+# the services import the shared modules by bare name (common/ is put on
+# sys.path), so do the same here
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,108 @@
+# Homework4/common/tests/test_compression.py
+
+import gzip
+import json
+
+import pytest
+from flask import Flask, Response, jsonify, stream_with_context
+
+import compression
+from compression import CompressedBodies
+
+BODY = {"rows": [[f"2026-10-{d:02d}", 1000.5 + d] for d in range(1, 31)] * 5}
+
+
+def _fake_br(body):
+    return b"BR" + body
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # a stand-in "br" encoder, so the negotiation does not depend on which
+    # optional codecs are installed
+    monkeypatch.setattr(compression, "ENCODERS", {"gzip": compression.ENCODERS["gzip"], "br": _fake_br})
+    monkeypatch.setattr(compression, "PREFERENCE", ["br", "gzip"])
+    monkeypatch.setattr(compression, "compressed_bodies", CompressedBodies(max_mb=1))
+
+    app = Flask(__name__)
+    compression.init_app(app)
+
+    @app.route("/data")
+    def data():
+        resp = jsonify(BODY)
+        resp.set_etag("v1")
+        return resp.make_conditional(compression.request)
+
+    @app.route("/small")
+    def small():
+        return jsonify({"ok": True})
+
+    @app.route("/stream")
+    def stream():
+        return Response(stream_with_context(iter(["[1,", "2,", "3]"])), mimetype="application/json")
+
+    return app.test_client()
+
+
+@pytest.mark.parametrize("accept, encoding", [
+    ("gzip, br", "br"),                   # same q: server preference
+    ("br;q=0.5, gzip", "gzip"),           # client q-values first
+    ("gzip;q=0, br;q=0", None),
+    ("identity", None),
+    ("*", "br"),
+])
+def test_negotiation(client, accept, encoding):
+    resp = client.get("/data", headers={"Accept-Encoding": accept})
+    assert resp.headers.get("Content-Encoding") == encoding
+    assert "Accept-Encoding" in resp.headers["Vary"]
+    raw = resp.get_data()
+    if encoding == "gzip":
+        raw = gzip.decompress(raw)
+    elif encoding == "br":
+        raw = raw[2:]
+    assert json.loads(raw) == BODY
+
+
+def test_compressed_etag_is_weak_and_still_revalidates(client):
+    plain = client.get("/data")
+    assert plain.headers["ETag"] == '"v1"'
+
+    zipped = client.get("/data", headers={"Accept-Encoding": "gzip"})
+    assert zipped.headers["ETag"] == 'W/"v1"'
+
+    again = client.get("/data", headers={"Accept-Encoding": "gzip", "If-None-Match": 'W/"v1"'})
+    assert again.status_code == 304
+    assert "Content-Encoding" not in again.headers
+    assert "Accept-Encoding" in again.headers["Vary"]
+
+
+def test_compressed_body_is_reused(client):
+    for _ in range(3):
+        client.get("/data", headers={"Accept-Encoding": "gzip"})
+    client.get("/data", headers={"Accept-Encoding": "br"})
+    stats = compression.compressed_bodies.stats()
+    assert (stats["entries"], stats["misses"], stats["hits"]) == (2, 2, 2)
+
+
+def test_small_bodies_are_sent_as_is(client):
+    resp = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in resp.headers
+    assert resp.get_json() == {"ok": True}
+
+
+def test_streamed_bodies_are_gzipped_on_the_fly(client):
+    resp = client.get("/stream", headers={"Accept-Encoding": "br, gzip"})
+    assert resp.headers["Content-Encoding"] == "gzip"
+    assert "Content-Length" not in resp.headers
+    assert gzip.decompress(resp.get_data()) == b"[1,2,3]"
+
+
+def test_lru_is_bounded_in_bytes():
+    bodies = CompressedBodies(max_mb=1000 / 1024 / 1024)
+    bodies.put(("a", "gzip"), b"x" * 400)
+    bodies.put(("b", "gzip"), b"x" * 400)
+    assert bodies.get(("a", "gzip"))
+    bodies.put(("c", "gzip"), b"x" * 400)
+    assert bodies.get(("b", "gzip")) is None
+    bodies.put(("huge", "gzip"), b"x" * 2000)
+    assert bodies.stats()["entries"] == 2
@@ -6,18 +6,111 @@ base_filter.py
 Defines the BaseFilter class using the Template Method pattern.
 Each concrete filter (Filter1, Filter2, Filter3) inherits from this class
 and overrides the needed methods.
+
+Filters that also implement the streaming hooks (scrape_stream /
+parse_chunk / save_chunk / finish_stream) run as a pipeline instead:
+scrape -> parse -> save are connected by bounded queues, so chunks are
+parsed and written while other fetches are still in flight and memory
+stays flat. FILTER_STREAMING=0 switches back to the staged run.
 """
 
 import abc
+import os
+import queue
+import threading
+
+from jobs import report_stage
+
+STREAMING = os.environ.get("FILTER_STREAMING", "1") != "0"
+QUEUE_SIZE = int(os.environ.get("FILTER_QUEUE_SIZE", 16))
+
+_DONE = object()
+
+
+class _StageError:
+    def __init__(self, exc):
+        self.exc = exc
+
 
 class BaseFilter(metaclass=abc.ABCMeta):
+    supports_streaming = False
+
     def run(self):
+        report_stage(type(self).__name__)
+        if self.supports_streaming and STREAMING:
+            self.run_streaming()
+            return
         self.setup()
         raw_data = self.scrape_data()
         parsed_data = self.parse_data(raw_data)
         self.save_data(parsed_data)
         self.call_next_filter()
 
+    def run_streaming(self):
+        self.setup()
+        stop = threading.Event()
+        raw_q = queue.Queue(maxsize=QUEUE_SIZE)
+        parsed_q = queue.Queue(maxsize=QUEUE_SIZE)
+
+        def put(q, item):
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def drain(q):
+            # polls, so a stage whose consumer failed (stop set, nothing
+            # more coming) ends instead of blocking on get() forever
+            while True:
+                try:
+                    item = q.get(timeout=0.5)
+                except queue.Empty:
+                    if stop.is_set():
+                        return
+                    continue
+                if item is _DONE:
+                    return
+                if isinstance(item, _StageError):
+                    raise item.exc
+                yield item
+
+        def stage(source, fn, out):
+            try:
+                for item in source:
+                    if not put(out, fn(item)):
+                        return
+                put(out, _DONE)
+            except Exception as e:
+                put(out, _StageError(e))
+            finally:
+                # stops the fetches / upstream stage still running behind it
+                close = getattr(source, "close", None)
+                if close is not None:
+                    close()
+
+        threads = [
+            threading.Thread(target=stage, args=(self.scrape_stream(), lambda raw: raw, raw_q),
+                             name=f"{type(self).__name__}-scrape", daemon=True),
+            threading.Thread(target=stage, args=(drain(raw_q), self.parse_chunk, parsed_q),
+                             name=f"{type(self).__name__}-parse", daemon=True),
+        ]
+        for t in threads:
+            t.start()
+        try:
+            for parsed in drain(parsed_q):
+                self.save_chunk(parsed)
+        finally:
+            # on a save error the stages see `stop` and wind down; the
+            # error is re-raised once they have been joined
+            stop.set()
+            for t in threads:
+                t.join()
+        self.finish_stream()
+        self.call_next_filter()
+
     def setup(self):
         pass
 
@@ -33,5 +126,20 @@ class BaseFilter(metaclass=abc.ABCMeta):
     def save_data(self, parsed_data):
         raise NotImplementedError
 
+    # streaming hooks (only used when supports_streaming = True)
+
+    def scrape_stream(self):
+        """Yields raw chunks as they are fetched."""
+        raise NotImplementedError
+
+    def parse_chunk(self, raw_chunk):
+        raise NotImplementedError
+
+    def save_chunk(self, parsed_chunk):
+        raise NotImplementedError
+
+    def finish_stream(self):
+        pass
+
     def call_next_filter(self):
         pass
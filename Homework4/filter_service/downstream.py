@@ -0,0 +1,47 @@
+# Homework4/filter_service/downstream.py
+
+"""
+downstream.py
+Calls into the analysis service after the filters wrote data:
+  - notify_rows_saved: advance the indicator state of the publishers
+    that just got new rows,
+  - refresh_signals: recompute the precomputed `signals` table (Filter4).
+Best effort: if the service is down, both are brought up to date on the
+next /analysis request.
+"""
+
+import os
+import requests
+
+ANALYSIS_URL = os.environ.get("ANALYSIS_SERVICE_URL", "http://localhost:5002")
+
+
+def notify_rows_saved(publisher_codes):
+    codes = sorted(set(publisher_codes))
+    if not codes:
+        return
+    try:
+        requests.post(
+            f"{ANALYSIS_URL}/state/refresh",
+            json={"publishers": codes},
+            timeout=60
+        )
+    except requests.RequestException as e:
+        print(f"downstream: analysis service not notified ({e})")
+
+
+def refresh_signals(publisher_codes):
+    """Returns {code: as_of} from the analysis service, or {} on failure."""
+    codes = sorted(set(publisher_codes))
+    if not codes:
+        return {}
+    try:
+        resp = requests.post(
+            f"{ANALYSIS_URL}/signals/refresh",
+            json={"publishers": codes},
+            timeout=600
+        )
+        return resp.json().get("refreshed", {}) if resp.status_code == 200 else {}
+    except requests.RequestException as e:
+        print(f"downstream: signals not refreshed ({e})")
+        return {}
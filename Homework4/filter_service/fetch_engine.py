@@ -0,0 +1,162 @@
+# Homework4/filter_service/fetch_engine.py
+
+"""
+fetch_engine.py
+Shared HTTP fetching for the filters (MSE symbol history pages).
+
+  - keep-alive: every worker thread keeps its own requests.Session, so the
+    TCP/TLS connection to mse.mk is reused across one-year chunks
+  - limits: FETCH_CONCURRENCY worker threads, and a per-host cap on
+    requests in flight (shared by every fetch running in the process)
+  - timeouts + retries with exponential backoff (connect errors, read
+    errors, 429 / 5xx, honouring Retry-After)
+  - one job per planned (publisher, <=365-day) request, so a 10-year
+    backfill of one publisher is spread over the workers too
+  - closed windows are served from the on-disk response cache
+    (response_cache.py) and stored there after their first fetch
+
+Configuration (env):
+    MSE_BASE_URL         symbol history base URL (point it at a local
+                         stub, e.g. mse_stub_server.py, for testing)
+    FETCH_CONCURRENCY    worker threads (8)
+    FETCH_PER_HOST       in-flight limit per host (4)
+    FETCH_TIMEOUT        read timeout in seconds (30; connect is 5)
+    FETCH_RETRIES        retries per request (4)
+    FETCH_BACKOFF        backoff factor in seconds (0.5 -> 0.5, 1, 2, ...)
+"""
+
+import os
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from response_cache import open_cache
+
+MSE_BASE_URL = os.environ.get("MSE_BASE_URL", "https://www.mse.mk/mk/stats/symbolhistory/")
+if not MSE_BASE_URL.endswith("/"):
+    MSE_BASE_URL += "/"
+
+CHUNK_DAYS = 365
+MSE_PARAM_DATE_FMT = '%d.%m.%Y'
+
+
+class FetchEngine:
+    def __init__(self, concurrency=None, per_host=None, timeout=None,
+                 retries=None, backoff=None, cache=None):
+        self.concurrency = int(concurrency or os.environ.get("FETCH_CONCURRENCY", 8))
+        self.per_host = int(per_host or os.environ.get("FETCH_PER_HOST", 4))
+        self.timeout = (5, float(timeout or os.environ.get("FETCH_TIMEOUT", 30)))
+        self.retry = Retry(
+            total=int(os.environ.get("FETCH_RETRIES", 4) if retries is None else retries),
+            backoff_factor=float(os.environ.get("FETCH_BACKOFF", 0.5) if backoff is None else backoff),
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=("GET",),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        self._local = threading.local()
+        self._host_slots = defaultdict(lambda: threading.BoundedSemaphore(self.per_host))
+        self._host_lock = threading.Lock()
+        self.cache = open_cache() if cache is None else cache
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(max_retries=self.retry)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._local.session = session
+        return session
+
+    def _host_slot(self, url):
+        with self._host_lock:
+            return self._host_slots[urlsplit(url).netloc]
+
+    def get(self, url, params=None):
+        """GET within the per-host limit; the Response, or None on failure."""
+        with self._host_slot(url):
+            try:
+                return self._session().get(url, params=params, timeout=self.timeout)
+            except requests.RequestException as e:
+                print(f"fetch_engine: {url} failed after retries ({e})")
+                return None
+
+    def iter_requests(self, requests):
+        """
+        requests: iterable of (publisher_code, start, end), each at most
+        CHUNK_DAYS long (e.g. a fetch_planner plan). Yields (publisher_code,
+        start, end, html) as requests complete; failed ones are logged and
+        left out. At most 2 x concurrency requests are queued or in flight,
+        and no new ones are started while the consumer isn't pulling, so
+        memory stays bounded however many publishers / years are requested.
+        """
+        jobs = iter(requests)
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            in_flight = {}
+
+            def submit_next():
+                job = next(jobs, None)
+                if job is not None:
+                    code, start, end = job
+                    in_flight[executor.submit(self._fetch_chunk, code, start, end)] = job
+
+            for _ in range(2 * self.concurrency):
+                submit_next()
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    code, start, end = in_flight.pop(fut)
+                    submit_next()
+                    html = fut.result()
+                    if html is not None:
+                        yield code, start, end, html
+
+    def _fetch_chunk(self, code, start, end):
+        """The page's html (from the cache if the window is stored), or None."""
+        if self.cache:
+            html = self.cache.get(code, start, end)
+            if html is not None:
+                return html
+        params = {
+            'FromDate': start.strftime(MSE_PARAM_DATE_FMT),
+            'ToDate': end.strftime(MSE_PARAM_DATE_FMT),
+            'Code': code
+        }
+        resp = self.get(MSE_BASE_URL + code, params=params)
+        if resp is None or resp.status_code != 200:
+            status = resp.status_code if resp is not None else "no response"
+            print(f"fetch_engine: {code} {status} from {start:%Y-%m-%d} to {end:%Y-%m-%d}")
+            return None
+        if self.cache:
+            self.cache.put(code, start, end, resp.text)
+        return resp.text
+
+
+def date_chunks(from_dt, to_dt, days=CHUNK_DAYS):
+    """[(start, end), ...] covering from_dt..to_dt (inclusive), at most `days` apart."""
+    chunks = []
+    while from_dt <= to_dt:
+        end = min(from_dt + timedelta(days=days), to_dt)
+        chunks.append((from_dt, end))
+        from_dt = end + timedelta(days=1)
+    return chunks
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """The process-wide engine shared by Filter2 and Filter3."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = FetchEngine()
+        return _engine
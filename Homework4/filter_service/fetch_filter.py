@@ -0,0 +1,129 @@
+# Homework4/filter_service/fetch_filter.py
+
+"""
+fetch_filter.py
+The planner-driven fetcher shared by Filter2 and Filter3: plans the
+missing date ranges of a set of publishers (fetch_planner: gaps in the
+stored data / fetch coverage, merged into the fewest MSE requests),
+fetches them through the shared fetch_engine, parses and normalizes each
+page and merges it into stock_data.db (BulkWriter, no deletion), then
+tells the analysis service which publishers changed.
+
+Runs as a streaming pipeline (see BaseFilter): each page is parsed and
+written as soon as it arrives. With several filter instances each one
+only does the publishers of its shard (sharding.py), most liquid first,
+and checks it still holds the shard before every write.
+
+Subclasses only choose which publishers to plan for (_publisher_codes)
+and what runs next (call_next_filter).
+"""
+
+import abc
+import sqlite3
+from pathlib import Path
+
+from base_filter import BaseFilter
+from fetch_engine import get_engine
+from fetch_planner import covered_range, plan, plan_requests
+from mse_table_parser import parse_records
+from stock_schema import ensure_schema
+from normalization import normalize_records
+from downstream import notify_rows_saved
+from bulk_writer import BulkWriter, STREAM_FLUSH_SECONDS
+from jobs import report_plan, report_chunk
+from sharding import shard_lease
+
+
+class FetchFilter(BaseFilter):
+    supports_streaming = True
+
+    def __init__(self):
+        super().__init__()
+        self.THIS_FOLDER = Path(__file__).parent.resolve()
+        self.STOCK_DB = self.THIS_FOLDER.parent / "stock_data.db"
+        self._sink = None
+        self._shard = None
+
+    @property
+    def name(self):
+        return type(self).__name__
+
+    @abc.abstractmethod
+    def _publisher_codes(self, conn):
+        """The publishers to plan for; conn is a stock_data connection."""
+        raise NotImplementedError
+
+    def setup(self):
+        engine = get_engine()
+        print(f"{self.name} setup: Concurrency={engine.concurrency} "
+              f"({engine.per_host} per host), won't wipe anything.")
+
+    def _planned_requests(self):
+        conn = sqlite3.connect(self.STOCK_DB)
+        try:
+            ensure_schema(conn)
+            publisher_codes = self._publisher_codes(conn)
+            if not publisher_codes:
+                print(f"{self.name}: No publishers to plan for.")
+                return []
+            # this instance's shard, most liquid publishers first
+            self._shard, publisher_codes = shard_lease.assigned(conn, publisher_codes)
+            plans = plan(conn, publisher_codes)
+        finally:
+            conn.close()
+        report_plan(plans)
+        requests = plan_requests(plans)
+        behind = sum(1 for reqs in plans.values() if reqs)
+        print(f"{self.name}: {behind}/{len(plans)} publishers behind (shard {self._shard}), "
+              f"{len(requests)} requests planned.")
+        return requests
+
+    def _write(self, writer, code, start, end, rows):
+        shard_lease.check(self._shard)
+        writer.write(code, rows)
+        covered = covered_range(start, end, rows)
+        if covered:
+            writer.mark_covered(code, *covered)
+        report_chunk(code, len(rows))
+
+    def _close(self, writer):
+        saved = writer.close()
+        print(f"{self.name}: {writer.summary()} rows (no deletion).")
+        notify_rows_saved(saved)
+
+    def scrape_data(self):
+        # all planned requests (<=365 days each) fetched together
+        return list(self.scrape_stream())
+
+    def parse_data(self, scraped_results):
+        return [self.parse_chunk(raw) for raw in scraped_results]
+
+    def save_data(self, parsed_pages):
+        if not parsed_pages:
+            print(f"{self.name}: No new data to save.")
+            return
+        writer = BulkWriter(self.STOCK_DB)
+        for parsed in parsed_pages:
+            self._write(writer, *parsed)
+        self._close(writer)
+
+    # ── streaming pipeline ──
+
+    def scrape_stream(self):
+        yield from get_engine().iter_requests(self._planned_requests())
+
+    def parse_chunk(self, raw_chunk):
+        code, start, end, html = raw_chunk
+        return code, start, end, normalize_records(code, parse_records(html))
+
+    def save_chunk(self, parsed_chunk):
+        if self._sink is None:
+            self._sink = BulkWriter(self.STOCK_DB, max_delay=STREAM_FLUSH_SECONDS)
+        self._write(self._sink, *parsed_chunk)
+
+    def finish_stream(self):
+        writer, self._sink = self._sink, None
+        if writer is None:
+            print(f"{self.name}: No new data to save.")
+            return
+        self._close(writer)
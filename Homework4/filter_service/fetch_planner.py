@@ -0,0 +1,258 @@
+# Homework4/filter_service/fetch_planner.py
+
+"""
+fetch_planner.py
+Works out, per publisher, exactly which MSE symbol history requests are
+still needed, from what is stored:
+
+  wanted    from January 1st of the year HISTORY_DAYS back up to the last
+            complete trading day (today once the MSE session has closed,
+            else yesterday); starting on a year boundary keeps the oldest
+            window a whole calendar year, the same request every day
+  covered   the fetch_coverage ranges (the bulk writer records every
+            fetched chunk there, together with its rows) plus the stored
+            days themselves; a hole between two stored days with no
+            trading day in it (weekend, fixed public holiday) is covered
+            too
+  gaps      wanted - covered, trimmed to trading days; gaps without a
+            trading day are dropped
+  requests  neighbouring gaps merged as long as the merged span still
+            fits one CHUNK_DAYS request (refetching a few stored days is
+            cheaper than another round trip), longer gaps split at
+            calendar years (closed years then hit the response cache)
+
+Filter2 fetches the plan; Filter3 plans again afterwards as a
+reconciliation pass, which issues no requests when nothing is missing.
+
+Configuration (env):
+    HISTORY_DAYS         how far back to keep data (3650)
+    MSE_TIMEZONE         exchange time zone (Europe/Skopje)
+    MSE_SESSION_CLOSE    HH:MM local time after which today's session
+                         counts as published (14:00)
+
+Dry run (prints the plan and the request count, fetches nothing):
+    python fetch_planner.py [--db path/to/stock_data.db] [--verbose] [CODE ...]
+"""
+
+import argparse
+import os
+import sqlite3
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from fetch_engine import CHUNK_DAYS, date_chunks
+from stock_schema import ensure_schema, load_coverage, ISO_DATE_FMT
+
+HISTORY_DAYS = int(os.environ.get("HISTORY_DAYS", 3650))
+MSE_TIMEZONE = os.environ.get("MSE_TIMEZONE", "Europe/Skopje")
+MSE_SESSION_CLOSE = time.fromisoformat(os.environ.get("MSE_SESSION_CLOSE", "14:00"))
+
+# fixed-date non-working days in North Macedonia (movable feasts are left
+# to the stored data: a one-day hole there costs at most one request, once)
+MSE_HOLIDAYS = {(1, 1), (1, 2), (1, 7), (5, 1), (5, 24), (8, 2), (9, 8),
+                (10, 11), (10, 23), (12, 8)}
+
+DEFAULT_DB = Path(__file__).parent.resolve().parent / "stock_data.db"
+ONE_DAY = timedelta(days=1)
+
+
+def is_trading_day(day):
+    return day.weekday() < 5 and (day.month, day.day) not in MSE_HOLIDAYS
+
+
+def mse_now():
+    try:
+        return datetime.now(ZoneInfo(MSE_TIMEZONE)).replace(tzinfo=None)
+    except ZoneInfoNotFoundError:
+        return datetime.now()
+
+
+def last_complete_day(now=None):
+    """The newest day whose session can be expected on the MSE site."""
+    now = now or mse_now()
+    return now.date() if now.time() >= MSE_SESSION_CLOSE else now.date() - ONE_DAY
+
+
+def _trading_day_between(start, end):
+    """True if start..end (inclusive) holds a trading day."""
+    day = start
+    while day <= end:
+        if is_trading_day(day):
+            return True
+        day += ONE_DAY
+    return False
+
+
+def covered_ranges(stored_days, coverage):
+    """
+    stored_days: sorted dates with rows; coverage: [(from, to)] dates.
+    Returns the union as sorted, non-overlapping (from, to) ranges.
+    """
+    ranges = list(coverage)
+    run_start = prev = None
+    for day in stored_days:
+        if prev is not None and day - prev > ONE_DAY and _trading_day_between(prev + ONE_DAY, day - ONE_DAY):
+            ranges.append((run_start, prev))
+            run_start = None
+        if run_start is None:
+            run_start = day
+        prev = day
+    if run_start is not None:
+        ranges.append((run_start, prev))
+
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + ONE_DAY:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def find_gaps(wanted_start, wanted_end, covered):
+    """Uncovered parts of wanted_start..wanted_end, trimmed to trading days."""
+    gaps = []
+    cursor = wanted_start
+    for start, end in covered + [(wanted_end + ONE_DAY, wanted_end + ONE_DAY)]:
+        if start > cursor:
+            gap_start, gap_end = cursor, min(start - ONE_DAY, wanted_end)
+            while gap_start <= gap_end and not is_trading_day(gap_start):
+                gap_start += ONE_DAY
+            while gap_end >= gap_start and not is_trading_day(gap_end):
+                gap_end -= ONE_DAY
+            if gap_start <= gap_end:
+                gaps.append((gap_start, gap_end))
+        cursor = max(cursor, end + ONE_DAY)
+        if cursor > wanted_end:
+            break
+    return gaps
+
+
+def year_chunks(start, end, days=CHUNK_DAYS):
+    """
+    start..end split at calendar years (then at `days`), so the closed
+    years of a long gap are always the same requests (response_cache keys).
+    """
+    chunks = []
+    while start <= end:
+        year_end = min(date(start.year, 12, 31), end)
+        chunks.extend(date_chunks(start, year_end, days))
+        start = year_end + ONE_DAY
+    return chunks
+
+
+def merge_requests(gaps, days=CHUNK_DAYS):
+    """Fewest requests of at most `days` covering every gap."""
+    requests = []
+    for start, end in gaps:
+        if requests and end - requests[-1][0] <= timedelta(days=days):
+            requests[-1] = (requests[-1][0], end)
+        elif end - start <= timedelta(days=days):
+            requests.append((start, end))
+        else:
+            requests.extend(year_chunks(start, end, days))
+    return requests
+
+
+def wanted_start(wanted_end):
+    """January 1st of the year HISTORY_DAYS before wanted_end."""
+    return date((wanted_end - timedelta(days=HISTORY_DAYS)).year, 1, 1)
+
+
+def plan(conn, publisher_codes, now=None):
+    """
+    {publisher_code: [(start, end), ...]} of MSE requests (dates) still
+    needed; publishers with nothing missing map to [].
+    """
+    wanted_end = last_complete_day(now)
+    start = wanted_start(wanted_end)
+    start_iso = start.strftime(ISO_DATE_FMT)
+
+    coverage = load_coverage(conn)
+    stored = {}
+    rows = conn.execute(
+        "SELECT publisher_code, date FROM stock_data WHERE date >= ? ORDER BY publisher_code, date",
+        (start_iso,)
+    )
+    for code, day in rows:
+        stored.setdefault(code, []).append(day)
+
+    plans = {}
+    for code in publisher_codes:
+        covered = covered_ranges(
+            [date.fromisoformat(d) for d in stored.get(code, ())],
+            [(date.fromisoformat(a), date.fromisoformat(b)) for a, b in coverage.get(code, ())],
+        )
+        plans[code] = merge_requests(find_gaps(start, wanted_end, covered))
+    return plans
+
+
+def covered_range(start, end, rows, now=None):
+    """
+    The ISO (from, to) a fetched start..end request may be recorded as
+    covered, or None. If `end` is the last complete day and no row came
+    back for it, that session may simply not be on the site yet: it is
+    left uncovered (so the next plan asks for it again) instead of being
+    skipped for good. rows: normalized row tuples, ISO date at [1].
+    """
+    newest = max((r[1] for r in rows), default=None)
+    if end >= last_complete_day(now) and (newest is None or newest < end.strftime(ISO_DATE_FMT)):
+        end -= ONE_DAY
+    if end < start:
+        return None
+    return start.strftime(ISO_DATE_FMT), end.strftime(ISO_DATE_FMT)
+
+
+def plan_requests(plans):
+    """
+    Flattens a plan into fetch_engine.iter_requests jobs, round-robin over
+    the publishers in plan order (their priority) and newest request first:
+    every publisher's latest days are fetched before anyone's old history.
+    """
+    ordered = [
+        (depth, pos, code, start, end)
+        for pos, (code, reqs) in enumerate(plans.items())
+        for depth, (start, end) in enumerate(reversed(reqs))
+    ]
+    ordered.sort(key=lambda job: job[:2])
+    return [(code, start, end) for _, _, code, start, end in ordered]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Dry run: print the MSE fetch plan, fetch nothing.")
+    ap.add_argument("codes", nargs="*", help="publishers (default: everything in publishers.db)")
+    ap.add_argument("--db", default=str(DEFAULT_DB))
+    ap.add_argument("--verbose", action="store_true", help="list every request")
+    args = ap.parse_args()
+
+    codes = args.codes
+    if not codes:
+        pub_conn = sqlite3.connect(Path(args.db).parent / "publishers.db")
+        codes = [row[0] for row in pub_conn.execute("SELECT publisher_code FROM publishers")]
+        pub_conn.close()
+
+    conn = sqlite3.connect(args.db)
+    ensure_schema(conn)
+    plans = plan(conn, codes)
+    coverage = load_coverage(conn)
+    conn.close()
+
+    end = last_complete_day()
+    print(f"Plan for {len(codes)} publishers, {wanted_start(end)} .. {end}:")
+    for code in sorted(plans):
+        reqs = plans[code]
+        if not reqs:
+            continue
+        days = sum((b - a).days + 1 for a, b in reqs)
+        print(f"  {code:8s} {len(reqs):3d} requests, {days:5d} days  (covered through {coverage[code][-1][1] if code in coverage else None})")
+        if args.verbose:
+            for a, b in reqs:
+                print(f"           {a} .. {b}")
+    total = sum(len(r) for r in plans.values())
+    complete = sum(1 for r in plans.values() if not r)
+    print(f"{total} requests in total; {complete}/{len(plans)} publishers complete.")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,12 +8,12 @@ Then calls Filter2.
 We've COMMENTED OUT the line that deletes the publishers table.
 """
 
-import requests
 from bs4 import BeautifulSoup
 import sqlite3
 from pathlib import Path
 
 from base_filter import BaseFilter
+from fetch_engine import get_engine, MSE_BASE_URL
 
 class Filter1(BaseFilter):
     def __init__(self):
@@ -26,9 +26,9 @@ class Filter1(BaseFilter):
         print("Filter1 setup: Ensuring DB path is configured...")
 
     def scrape_data(self):
-        url = 'https://www.mse.mk/mk/stats/symbolhistory/avk'
-        resp = requests.get(url)
-        if resp.status_code != 200:
+        url = MSE_BASE_URL + 'avk'
+        resp = get_engine().get(url)
+        if resp is None or resp.status_code != 200:
             print("Filter1: Failed to fetch MSE dropdown.")
             return ""
         print("Filter1: Successfully fetched issuer dropdown HTML.")
@@ -0,0 +1,50 @@
+# Homework4/filter_service/filter4.py
+
+"""
+filter4.py
+Post-ingest stage, called by Filter3: has the analysis service refresh the
+precomputed `signals` table (summaries + final-row indicators) for every
+publisher, so /analysis answers with a single indexed lookup.
+"""
+
+import sqlite3
+from pathlib import Path
+
+from base_filter import BaseFilter
+from downstream import refresh_signals
+from sharding import shard_lease
+
+class Filter4(BaseFilter):
+    def __init__(self):
+        super().__init__()
+        self.THIS_FOLDER = Path(__file__).parent.resolve()
+        self.PUBLISHERS_DB = self.THIS_FOLDER.parent / "publishers.db"
+
+    def scrape_data(self):
+        conn = sqlite3.connect(self.PUBLISHERS_DB)
+        c = conn.cursor()
+        c.execute("SELECT publisher_code FROM publishers")
+        publisher_codes = [row[0] for row in c.fetchall()]
+        conn.close()
+        return publisher_codes
+
+    def parse_data(self, publisher_codes):
+        # nothing to parse: the analysis service reads stock_data itself;
+        # with several filter instances each refreshes its own shard
+        _, publisher_codes = shard_lease.owned(publisher_codes)
+        return sorted(set(publisher_codes))
+
+    def save_data(self, publisher_codes):
+        if not publisher_codes:
+            print("Filter4: No publishers to refresh signals for.")
+            return
+        refreshed = refresh_signals(publisher_codes)
+        fresh = sum(1 for as_of in refreshed.values() if as_of)
+        print(f"Filter4: Signals up to date for {fresh}/{len(publisher_codes)} publishers.")
+
+def main():
+    f4 = Filter4()
+    f4.run()
+
+if __name__ == "__main__":
+    main()
@@ -2,38 +2,131 @@
 """
 filter_service_app.py
 Flask microservice to run Filter1, Filter2, Filter3 on demand.
+
+Runs are jobs (see jobs.py): a trigger answers 202 with a job id right
+away, the scrape happens on a background worker, and triggers for a run
+that is already queued / running coalesce into it.
+    POST /jobs {"kind": "filter1"|"filter2"|"filter3"|"all"}
+    GET  /jobs, /jobs/<id>, /jobs/<id>/progress (per publisher)
+The built-in scheduler (scheduler.py) submits the regular refreshes
+itself; GET /scheduler shows its state.
+
+Several instances can share the scrape (FILTER_SHARDS, see sharding.py):
+each one holds a shard of the publishers, a run submitted to any instance
+is started on every shard, and GET /shards reports all of them.
 """
 
-from flask import Flask, request, jsonify
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+from flask import Flask, request, jsonify, url_for
 from flask_cors import CORS
 
-from filter1 import Filter1
-from filter2 import Filter2
-from filter3 import Filter3
+from jobs import job_queue
+from scheduler import scheduler, SCHEDULER_ENABLED
+from sharding import shard_lease
+
+PUBLISHERS_DB = Path(__file__).parent.resolve().parent / "publishers.db"
 
 app = Flask(__name__)
 CORS(app)
 
+_background_lock = threading.Lock()
+_background_pid = None
+
+
+def start_background():
+    """
+    Starts the shard lease heartbeat and the scheduler, once per process
+    (a forked server worker gets its own: threads don't survive a fork).
+    """
+    global _background_pid
+    with _background_lock:
+        if _background_pid == os.getpid():
+            return
+        _background_pid = os.getpid()
+    shard_lease.start()
+    if SCHEDULER_ENABLED:
+        scheduler.start()
+
+
+@app.before_request
+def _ensure_background():
+    start_background()
+
+
+def _submit(kind):
+    try:
+        job, created = job_queue.submit(kind)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    body = job.summary()
+    body["deduplicated"] = not created
+    # the publisher list is shared, so the other shards only need filter2
+    body["other_shards"] = shard_lease.request_run("filter2" if job.kind == "filter1" else job.kind)
+    body["status_url"] = url_for("get_job", job_id=job.id)
+    return jsonify(body), 202, {"Location": body["status_url"]}
+
+
+@app.route("/jobs", methods=["POST"])
+def submit_job():
+    payload = request.get_json(silent=True) or {}
+    return _submit(payload.get("kind") or request.args.get("kind", "all"))
+
 
+@app.route("/jobs", methods=["GET"])
+def list_jobs():
+    return jsonify([job.summary() for job in job_queue.recent()]), 200
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": f"unknown job {job_id}"}), 404
+    return jsonify(job.summary()), 200
+
+
+@app.route("/jobs/<job_id>/progress", methods=["GET"])
+def get_job_progress(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": f"unknown job {job_id}"}), 404
+    return jsonify(job.progress()), 200
+
+
+# the old trigger routes, now asynchronous too
 @app.route("/filter1", methods=["POST"])
 def run_filter1():
-    f1 = Filter1()
-    f1.run()
-    return jsonify({"status": "Filter1 completed"}), 200
+    return _submit("filter1")
 
 
 @app.route("/filter2", methods=["POST"])
 def run_filter2():
-    f2 = Filter2()
-    f2.run()
-    return jsonify({"status": "Filter2 completed"}), 200
+    return _submit("filter2")
 
 
 @app.route("/filter3", methods=["POST"])
 def run_filter3():
-    f3 = Filter3()
-    f3.run()
-    return jsonify({"status": "Filter3 completed"}), 200
+    return _submit("filter3")
+
+
+@app.route("/shards", methods=["GET"])
+def shard_status():
+    try:
+        conn = sqlite3.connect(PUBLISHERS_DB)
+        codes = [row[0] for row in conn.execute("SELECT publisher_code FROM publishers")]
+        conn.close()
+    except sqlite3.Error:
+        codes = []
+    return jsonify(shard_lease.status(codes)), 200
+
+
+@app.route("/scheduler", methods=["GET"])
+def scheduler_status():
+    return jsonify(scheduler.status()), 200
 
 
 # ── new: simple health endpoint ──
@@ -42,6 +135,14 @@ def health():
     return jsonify({"status": "ok"}), 200
 
 
+# started with the app, whichever server imports it; the one exception is
+# the reloader parent of `python filter_service_app.py` (debug=True), which
+# only watches files and re-runs this module in a child with
+# WERKZEUG_RUN_MAIN set
+if not (__name__ == "__main__" and "WERKZEUG_RUN_MAIN" not in os.environ):
+    start_background()
+
+
 if __name__ == "__main__":
     # bind on all interfaces so the port is reachable from outside the container
     app.run(host="0.0.0.0", port=5001, debug=True)
@@ -0,0 +1,204 @@
+# Homework4/filter_service/jobs.py
+
+"""
+jobs.py
+Background job queue for filter runs, so no HTTP handler (here or in the
+gateway) waits on a multi-minute scrape:
+
+  - submit(kind) returns at once with a job id; one worker thread runs the
+    jobs in order (one pipeline at a time, so there is a single writer)
+  - a trigger for a kind that is already queued or running coalesces into
+    that job instead of starting another run
+  - progress: the filters call report_stage / report_plan / report_chunk,
+    which update the running job (they are no-ops outside a job, e.g. when
+    a filter is run from the command line)
+
+Kinds: filter1 (Filter1 -> 2 -> 3 -> 4; also "all"), filter2 (2 -> 3 -> 4),
+filter3 (3 -> 4).
+"""
+
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict, deque
+
+KEEP_FINISHED = 50
+
+JOB_KINDS = ("filter1", "filter2", "filter3")
+KIND_ALIASES = {"all": "filter1"}
+
+
+def _filter_class(kind):
+    if kind == "filter1":
+        from filter1 import Filter1
+        return Filter1
+    if kind == "filter2":
+        from filter2 import Filter2
+        return Filter2
+    if kind == "filter3":
+        from filter3 import Filter3
+        return Filter3
+    raise ValueError(f"unknown job kind {kind!r}")
+
+
+class Job:
+    def __init__(self, kind):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued"   # -> running -> succeeded / failed
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.triggers = 1
+        self._lock = threading.Lock()
+        self._stages = []
+        self._publishers = {}    # code -> [requests done, requests planned]
+        self._rows = 0
+
+    # progress hooks (called from the filter threads)
+
+    def stage(self, name):
+        with self._lock:
+            self._stages.append(name)
+
+    def plan(self, requests_per_publisher):
+        # accumulates over the stages (Filter2's plan, then Filter3's)
+        with self._lock:
+            for code, planned in requests_per_publisher.items():
+                self._publishers.setdefault(code, [0, 0])[1] += planned
+
+    def chunk(self, code, rows):
+        with self._lock:
+            self._publishers.setdefault(code, [0, 0])[0] += 1
+            self._rows += rows
+
+    # views
+
+    def summary(self):
+        with self._lock:
+            done = sum(d for d, _ in self._publishers.values())
+            planned = sum(p for _, p in self._publishers.values())
+            complete = sum(1 for d, p in self._publishers.values() if d >= p)
+            return {
+                "job_id": self.id,
+                "kind": self.kind,
+                "status": self.status,
+                "error": self.error,
+                "triggers": self.triggers,
+                "submitted_at": _iso(self.submitted_at),
+                "started_at": _iso(self.started_at),
+                "finished_at": _iso(self.finished_at),
+                "stage": self._stages[-1] if self._stages else None,
+                "stages": list(self._stages),
+                "requests": {"done": done, "planned": planned},
+                "publishers": {"complete": complete, "total": len(self._publishers)},
+                "rows": self._rows,
+            }
+
+    def progress(self):
+        out = self.summary()
+        with self._lock:
+            out["per_publisher"] = {
+                code: {"requests_done": d, "requests_planned": p}
+                for code, (d, p) in sorted(self._publishers.items())
+            }
+        return out
+
+
+def _iso(ts):
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(ts)) if ts else None
+
+
+class JobQueue:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()   # id -> Job, oldest first
+        self._pending = deque()
+        self._wakeup = threading.Condition(self._lock)
+        self._worker = None
+        self.current = None
+
+    def submit(self, kind):
+        """(job, created): an already queued / running job of the same kind is reused."""
+        kind = KIND_ALIASES.get(kind, kind)
+        if kind not in JOB_KINDS:
+            raise ValueError(f"unknown job kind {kind!r}")
+        with self._lock:
+            for job in self._jobs.values():
+                if job.kind == kind and job.status in ("queued", "running"):
+                    job.triggers += 1
+                    return job, False
+            job = Job(kind)
+            self._jobs[job.id] = job
+            self._pending.append(job)
+            self._prune()
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="filter-jobs", daemon=True)
+                self._worker.start()
+            self._wakeup.notify()
+            return job, True
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def active(self):
+        """True while any job is queued or running."""
+        with self._lock:
+            return any(j.status in ("queued", "running") for j in self._jobs.values())
+
+    def recent(self):
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def _prune(self):
+        finished = [j for j in self._jobs.values() if j.status in ("succeeded", "failed")]
+        for job in finished[:max(0, len(finished) - KEEP_FINISHED)]:
+            del self._jobs[job.id]
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._pending:
+                    self._wakeup.wait()
+                job = self._pending.popleft()
+                job.status = "running"
+                job.started_at = time.time()
+                self.current = job
+            try:
+                _filter_class(job.kind)().run()
+                job.status = "succeeded"
+            except Exception as e:
+                traceback.print_exc()
+                job.error = f"{type(e).__name__}: {e}"
+                job.status = "failed"
+            finally:
+                job.finished_at = time.time()
+                with self._lock:
+                    self.current = None
+
+
+job_queue = JobQueue()
+
+
+# hooks for the filters
+
+def report_stage(name):
+    job = job_queue.current
+    if job is not None:
+        job.stage(name)
+
+
+def report_plan(plans):
+    """plans: {publisher_code: [planned requests]} (fetch_planner.plan output)."""
+    job = job_queue.current
+    if job is not None:
+        job.plan({code: len(reqs) for code, reqs in plans.items()})
+
+
+def report_chunk(publisher_code, rows):
+    job = job_queue.current
+    if job is not None:
+        job.chunk(publisher_code, rows)
@@ -0,0 +1,89 @@
+# Homework4/filter_service/migrate_stock_db.py
+
+"""
+migrate_stock_db.py
+Offline, one-shot migration of an existing stock_data.db from the old
+all-TEXT layout (dd.mm.yyyy dates, '2.140,00' numbers) to the typed
+schema in stock_schema.py.
+
+Run it with the services stopped:
+    python migrate_stock_db.py [path/to/stock_data.db] [--no-backup] [--vacuum]
+
+The whole copy happens in one transaction, so an interrupted run leaves
+the old table untouched.
+"""
+
+import argparse
+import shutil
+import sqlite3
+from pathlib import Path
+
+import pandas as pd
+
+from stock_schema import STOCK_DATA_DDL, STOCK_DATA_INDEX_DDL, INSERT_SQL, is_legacy_schema
+from normalization import ROW_COLUMNS, normalize_frame, frame_to_rows
+
+DEFAULT_DB = Path(__file__).parent.resolve().parent / "stock_data.db"
+BATCH_SIZE = 50000
+
+
+def migrate(db_path, backup=True, vacuum=False):
+    db_path = Path(db_path)
+    if not db_path.exists():
+        print(f"migrate: {db_path} does not exist, nothing to do.")
+        return
+
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    if not is_legacy_schema(conn):
+        conn.close()
+        print("migrate: stock_data already uses the typed schema.")
+        return
+
+    if backup:
+        backup_path = db_path.with_suffix(db_path.suffix + ".bak")
+        shutil.copy2(db_path, backup_path)
+        print(f"migrate: backup written to {backup_path}")
+
+    copied = skipped = 0
+    try:
+        conn.execute("BEGIN")
+        conn.execute("ALTER TABLE stock_data RENAME TO stock_data_legacy")
+        conn.execute(STOCK_DATA_DDL)
+
+        # vectorized backfill: normalize whole chunks instead of row by row
+        chunks = pd.read_sql_query(
+            f"SELECT {', '.join(ROW_COLUMNS)} FROM stock_data_legacy ORDER BY id",
+            conn, chunksize=BATCH_SIZE, dtype=str,
+        )
+        for chunk in chunks:
+            normalized = normalize_frame(chunk)
+            skipped += len(chunk) - len(normalized)
+            conn.executemany(INSERT_SQL, frame_to_rows(normalized))
+            copied += len(normalized)
+
+        conn.execute("DROP TABLE stock_data_legacy")
+        conn.execute(STOCK_DATA_INDEX_DDL)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        conn.close()
+        raise
+
+    if vacuum:
+        conn.execute("VACUUM")
+    conn.execute("ANALYZE")
+    conn.close()
+    print(f"migrate: copied {copied} rows, skipped {skipped} with unparseable dates.")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Migrate stock_data.db to the typed schema.")
+    ap.add_argument("db", nargs="?", default=str(DEFAULT_DB))
+    ap.add_argument("--no-backup", action="store_true", help="don't copy the DB to *.bak first")
+    ap.add_argument("--vacuum", action="store_true", help="VACUUM after migrating")
+    args = ap.parse_args()
+    migrate(args.db, backup=not args.no_backup, vacuum=args.vacuum)
+
+
+if __name__ == "__main__":
+    main()
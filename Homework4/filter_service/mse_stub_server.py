@@ -0,0 +1,136 @@
+# Homework4/filter_service/mse_stub_server.py
+
+"""
+mse_stub_server.py
+A local stand-in for www.mse.mk, for exercising the filters without
+hitting the real site:
+
+    python mse_stub_server.py [--port 8808] [--publishers 200]
+                              [--latency 0.2] [--fail-rate 0.05]
+    MSE_BASE_URL=http://127.0.0.1:8808/mk/stats/symbolhistory/ python filter2.py
+
+Serves
+  /mk/stats/symbolhistory/avk         - the issuer <select id="Code"> dropdown
+  /mk/stats/symbolhistory/<CODE>      - a resultsTable for ?FromDate=&ToDate=
+with deterministic synthetic weekday rows in MSE's number format. Every
+response waits `latency` seconds; `fail-rate` of them answer 503 so the
+retry path gets exercised.
+"""
+
+import argparse
+import random
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+PREFIX = "/mk/stats/symbolhistory/"
+
+
+def _mse_number(val, decimals=2):
+    """2140.5 -> '2.140,50' (MSE formatting)."""
+    text = f"{val:,.{decimals}f}"
+    return text.replace(",", "\x00").replace(".", ",").replace("\x00", ".")
+
+
+def _rows(code, from_dt, to_dt):
+    seed = zlib.crc32(code.encode())
+    day = from_dt
+    while day <= to_dt:
+        if day.weekday() < 5:
+            rnd = random.Random(seed + day.toordinal())
+            price = 1000 + (seed % 500) + 200 * rnd.random()
+            qty = rnd.randint(0, 500)
+            yield (
+                day.strftime("%d.%m.%Y"),
+                _mse_number(price), _mse_number(price * 1.01), _mse_number(price * 0.99),
+                _mse_number(price), _mse_number(rnd.uniform(-2, 2)),
+                str(qty), _mse_number(price * qty), _mse_number(price * qty),
+            )
+        day += timedelta(days=1)
+
+
+def render_history(code, from_dt, to_dt):
+    body = "".join(
+        "<tr>" + "".join(f"<td>{col}</td>" for col in row) + "</tr>\n"
+        for row in reversed(list(_rows(code, from_dt, to_dt)))  # newest first, like MSE
+    )
+    return (
+        "<html><body><table id=\"resultsTable\">\n"
+        "<tr><th>Датум</th><th>Цена на последна трансакција</th><th>Мак.</th><th>Мин.</th>"
+        "<th>Просечна цена</th><th>%пром.</th><th>Количина</th>"
+        "<th>Промет во БЕСТ во денари</th><th>Вкупен промет во денари</th></tr>\n"
+        f"{body}</table></body></html>"
+    )
+
+
+def render_dropdown(codes):
+    options = "".join(f'<option value="{c}">{c}</option>' for c in codes)
+    return f'<html><body><select id="Code">{options}</select></body></html>'
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    codes = []
+    latency = 0.0
+    fail_rate = 0.0
+    hits = 0
+    hits_lock = threading.Lock()
+
+    def do_GET(self):
+        with StubHandler.hits_lock:
+            StubHandler.hits += 1
+        time.sleep(self.latency)
+        url = urlsplit(self.path)
+        if not url.path.startswith(PREFIX):
+            return self._send(404, "not found")
+        if random.random() < self.fail_rate:
+            return self._send(503, "busy")
+
+        code = url.path[len(PREFIX):].strip("/")
+        if code.lower() == "avk":
+            return self._send(200, render_dropdown(self.codes))
+
+        query = parse_qs(url.query)
+        try:
+            from_dt = datetime.strptime(query["FromDate"][0], "%d.%m.%Y")
+            to_dt = datetime.strptime(query["ToDate"][0], "%d.%m.%Y")
+        except (KeyError, ValueError):
+            return self._send(200, render_history(code, datetime.now(), datetime.now()))
+        self._send(200, render_history(code, from_dt, to_dt))
+
+    def _send(self, status, text):
+        body = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+def make_server(port=8808, publishers=200, latency=0.0, fail_rate=0.0):
+    StubHandler.codes = [f"P{chr(65 + i // 26 % 26)}{chr(65 + i % 26)}" for i in range(publishers)]
+    StubHandler.latency = latency
+    StubHandler.fail_rate = fail_rate
+    return ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Local stub of the MSE symbol history pages.")
+    ap.add_argument("--port", type=int, default=8808)
+    ap.add_argument("--publishers", type=int, default=200)
+    ap.add_argument("--latency", type=float, default=0.2, help="seconds per response")
+    ap.add_argument("--fail-rate", type=float, default=0.0, help="fraction of 503 answers")
+    args = ap.parse_args()
+    server = make_server(args.port, args.publishers, args.latency, args.fail_rate)
+    print(f"MSE stub on http://127.0.0.1:{args.port}{PREFIX} ({args.publishers} publishers)")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+# Homework4/filter_service/mse_table_parser.py
+
+"""
+mse_table_parser.py
+Streaming parser for the MSE symbol history `resultsTable`, replacing
+BeautifulSoup(..., 'html.parser') + find_all('tr') / find_all('td').
+
+An html.parser state machine that keeps no DOM: it waits for the first
+<table id="resultsTable">, collects the text of each <td> and yields one
+tuple of 9 stripped cell strings per row, then stops reading the page
+once the table is closed.
+
+Output is the same as the old BS4 code:
+  - the first <tr> of the table (the header) is skipped,
+  - rows with fewer than 9 <td> are skipped, extra cells are ignored,
+  - a cell's text is all text below it (nested tags, entities decoded),
+  - unclosed tags nest like BS4's html.parser tree does (an end tag
+    closes everything opened after the matching start tag), so even
+    sloppy markup gives the same cells.
+
+Parity with BeautifulSoup is tested on the pages in tests/fixtures
+(tests/test_mse_table_parser.py; drop a saved page there to add it).
+Benchmark + parity check:
+    python mse_table_parser.py [saved_page.html ...]
+"""
+
+import sys
+import time
+from html.parser import HTMLParser
+
+# scraped record keys, in table column order
+MSE_COLUMNS = ["Date", "Price", "Max", "Min", "Avg", "Percent Change",
+               "Quantity", "Best Turnover", "Total Turnover"]
+
+TABLE_ID = "resultsTable"
+FEED_SIZE = 1 << 16
+
+
+class _Row:
+    __slots__ = ("cells", "closed", "header")
+
+    def __init__(self, header):
+        self.cells = []
+        self.closed = False
+        self.header = header
+
+
+class ResultsTableParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.state = "search"   # -> "table" -> "done"
+        self.stack = []         # open (tag, obj) inside the table
+        self.pending = []       # rows in document order, not yet emitted
+        self.rows_seen = 0
+        self.ready = []         # finished row tuples
+
+    def handle_starttag(self, tag, attrs):
+        if self.state == "search":
+            if tag == "table" and ("id", TABLE_ID) in attrs:
+                self.state = "table"
+                self.stack.append(("table", None))
+            return
+        if self.state != "table":
+            return
+
+        if tag == "tr":
+            row = _Row(header=self.rows_seen == 0)
+            self.rows_seen += 1
+            self.pending.append(row)
+            self.stack.append(("tr", row))
+        elif tag == "td":
+            cell = []
+            # a <td> belongs to every open <tr> (find_all is recursive)
+            for kind, obj in self.stack:
+                if kind == "tr":
+                    obj.cells.append(cell)
+            self.stack.append(("td", cell))
+        elif tag == "table":
+            self.stack.append(("table", None))
+
+    def handle_endtag(self, tag):
+        if self.state != "table" or tag not in ("table", "tr", "td"):
+            return
+        for i in range(len(self.stack) - 1, -1, -1):
+            if self.stack[i][0] == tag:
+                break
+        else:
+            return  # stray end tag, ignored like BS4 does
+        for kind, obj in self.stack[i:]:
+            if kind == "tr":
+                obj.closed = True
+        del self.stack[i:]
+        if not self.stack:
+            self.state = "done"
+        self._flush()
+
+    def handle_data(self, data):
+        if self.state == "table":
+            for kind, obj in self.stack:
+                if kind == "td":
+                    obj.append(data)
+
+    def close(self):
+        super().close()
+        for row in self.pending:
+            row.closed = True
+        self._flush()
+
+    def _flush(self):
+        while self.pending and self.pending[0].closed:
+            row = self.pending.pop(0)
+            if not row.header and len(row.cells) >= 9:
+                self.ready.append(tuple("".join(c).strip() for c in row.cells[:9]))
+
+
+def iter_rows(html):
+    """Yields (date, price, max, min, avg, %chg, qty, best, total) string tuples."""
+    # nothing before the table can produce rows: start at the nearest
+    # <table preceding the first mention of the id
+    at = html.find(TABLE_ID)
+    if at < 0:
+        return
+    begin = max(html.rfind("<table", 0, at), 0)
+    if _inside_comment_or_script(html, begin):
+        # that mention is commented out / script text: jumping in there
+        # would lose the context, so parse from the top like BS4
+        begin = 0
+
+    parser = ResultsTableParser()
+    for start in range(begin, len(html), FEED_SIZE):
+        parser.feed(html[start:start + FEED_SIZE])
+        if parser.ready:
+            yield from parser.ready
+            parser.ready.clear()
+        if parser.state == "done":
+            break
+    parser.close()
+    yield from parser.ready
+
+
+def _inside_comment_or_script(html, pos):
+    return (html.rfind("<!--", 0, pos) > html.rfind("-->", 0, pos)
+            or html.rfind("<script", 0, pos) > html.rfind("</script", 0, pos))
+
+
+def parse_records(html):
+    """The old _parse_stock_table output: [{'Date': ..., ..., 'Total Turnover': ...}]."""
+    return [dict(zip(MSE_COLUMNS, row)) for row in iter_rows(html)]
+
+
+def _bs4_records(html):
+    """The BeautifulSoup reference (Filter2's former _parse_stock_table)."""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    table = soup.find('table', {'id': TABLE_ID})
+    data = []
+    if table:
+        for row in table.find_all('tr')[1:]:
+            cols = row.find_all('td')
+            if len(cols) >= 9:
+                data.append({key: cols[i].text.strip() for i, key in enumerate(MSE_COLUMNS)})
+    return data
+
+
+_SLOPPY_PAGE = (
+    '<html><body><table id="other"><tr><td>x</td></tr></table>'
+    '<table id="resultsTable"><thead><tr><th>Датум</th></tr></thead><tbody>'
+    '<tr><td> 01.02.2024 </td><td>2.140,00&nbsp;</td><td><span>2.150</span>,00</td>'
+    '<td>2.100,00</td><td>2.120,00</td><td>0,50</td><td>10</td><td>21.400,00</td>'
+    '<td>21.400,00</td><td>extra</td></tr>'
+    '<tr><td>02.02.2024<td>1<td>2<td>3<td>4<td>5<td>6<td>7<td>8</tr>'
+    '<tr><td>short</td></tr>'
+    '<tr><td>05.02.2024</td><td>1</td><td>2</td><td>3</td><td>4</td><td>5</td>'
+    '<td>6</td><td>7</td><td><table><tr><td>8</td></tr></table></td></tr>'
+    '</td></tbody></table><table id="resultsTable"><tr><td>ignored</td></tr></table>'
+)
+
+
+def main():
+    from mse_stub_server import render_history
+    from datetime import datetime, timedelta
+
+    pages = []
+    for path in sys.argv[1:]:
+        with open(path, encoding="utf-8") as f:
+            pages.append(f.read())
+    end = datetime(2024, 12, 31)
+    for i in range(20):
+        code = f"PB{chr(65 + i)}"
+        pages.append(render_history(code, end - timedelta(days=365), end))
+    pages.append(_SLOPPY_PAGE)
+    pages.append("<html><body>no table</body></html>")
+
+    mismatches = sum(1 for page in pages if parse_records(page) != _bs4_records(page))
+    rows = sum(len(parse_records(page)) for page in pages)
+    print(f"parity: {len(pages)} pages, {rows} rows, {mismatches} mismatching pages")
+
+    for name, fn in (("BeautifulSoup", _bs4_records), ("mse_table_parser", parse_records)):
+        start = time.perf_counter()
+        for page in pages:
+            fn(page)
+        took = time.perf_counter() - start
+        print(f"{name:17s} {took * 1000:8.1f} ms  {rows / took:10.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+# Homework4/filter_service/normalization.py
+
+"""
+normalization.py
+Ingest-time normalization stage: turns scraped MSE records (dd.mm.yyyy
+dates, '2.140,00' numbers) into typed stock_data rows, once, at write time.
+
+parse_mse_number() is the scalar reference (same rules as the analysis
+service's old parse_euro_number, plus dropping '\\xa0'); normalize_frame()
+is the vectorized pandas version used for save_data and bulk backfills.
+normalize_records() takes the scalar path for small batches (the one-year
+chunks of the streaming filters), where pandas' fixed per-call cost of
+~30 ms would dominate; both paths give identical rows.
+"""
+
+from datetime import datetime
+
+import pandas as pd
+
+from stock_schema import MSE_DATE_FMT, ISO_DATE_FMT
+
+# scraped record key -> stock_data column
+RECORD_COLUMNS = {
+    "Date": "date",
+    "Price": "price",
+    "Max": "max",
+    "Min": "min",
+    "Avg": "avg",
+    "Percent Change": "percent_change",
+    "Quantity": "quantity",
+    "Best Turnover": "best_turnover",
+    "Total Turnover": "total_turnover",
+}
+
+# column order of stock_schema.INSERT_SQL
+ROW_COLUMNS = ["publisher_code"] + list(RECORD_COLUMNS.values())
+
+NUMERIC_COLUMNS = [c for c in RECORD_COLUMNS.values() if c != "date"]
+
+EMPTY_TOKENS = ["", "None", "nan"]
+
+# below this many records normalize_records skips pandas
+SCALAR_MAX_RECORDS = 2000
+
+
+def parse_mse_number(val_str):
+    """
+    Convert a Euro-style string like '2.140,00' -> 2140.0:
+      1) drop '\\xa0' and surrounding whitespace
+      2) remove '.' (thousands), replace ',' with '.'
+    Returns None for '', 'None', 'nan' or anything float() rejects.
+    """
+    if val_str is None:
+        return None
+    s = str(val_str).replace('\xa0', '').strip()
+    if s in EMPTY_TOKENS:
+        return None
+    try:
+        return float(s.replace(".", "").replace(",", "."))
+    except ValueError:
+        return None
+
+
+def parse_mse_date(val_str):
+    """'17.01.2025' -> '2025-01-17' (None if unparseable)."""
+    if val_str is None:
+        return None
+    try:
+        return datetime.strptime(str(val_str).strip(), MSE_DATE_FMT).strftime(ISO_DATE_FMT)
+    except ValueError:
+        return None
+
+
+def parse_mse_number_series(values):
+    """
+    Vectorized parse_mse_number over a Series of strings -> float Series
+    (NaN where the scalar version returns None).
+    """
+    s = values.astype("string")
+    s = s.str.replace('\xa0', '', regex=False).str.strip()
+    s = s.mask(s.isin(EMPTY_TOKENS))
+    s = s.str.replace(".", "", regex=False).str.replace(",", ".", regex=False)
+    return pd.to_numeric(s, errors="coerce").astype("float64")
+
+
+def parse_mse_date_series(values):
+    """'17.01.2025' -> '2025-01-17' for a whole Series (NaN if unparseable)."""
+    s = values.astype("string").str.strip()
+    dt = pd.to_datetime(s, format=MSE_DATE_FMT, errors="coerce")
+    return dt.dt.strftime(ISO_DATE_FMT)
+
+
+def normalize_frame(df):
+    """
+    df has a publisher_code column plus stock_data columns holding the raw
+    scraped strings. Returns a new frame in ROW_COLUMNS order with ISO dates,
+    float prices and nullable-int quantity; rows with bad dates are dropped.
+    """
+    out = pd.DataFrame({"publisher_code": df["publisher_code"].astype("string")})
+    out["date"] = parse_mse_date_series(df["date"])
+    for col in NUMERIC_COLUMNS:
+        out[col] = parse_mse_number_series(df[col])
+    out["quantity"] = out["quantity"].round().astype("Int64")
+    return out.dropna(subset=["date"])[ROW_COLUMNS]
+
+
+def frame_to_rows(df):
+    """Normalized frame -> list of tuples for executemany (NaN/NA -> None)."""
+    obj = df.astype(object)
+    obj = obj.where(df.notna(), None)
+    return list(obj.itertuples(index=False, name=None))
+
+
+def normalize_records(publisher_code, records):
+    """
+    The save_data stage: scraped dicts ({'Date': ..., 'Price': ...}) for one
+    publisher -> typed row tuples ready for stock_schema.INSERT_SQL.
+    """
+    if not records:
+        return []
+    if len(records) <= SCALAR_MAX_RECORDS:
+        return _normalize_records_scalar(publisher_code, records)
+    df = pd.DataFrame.from_records(records, columns=list(RECORD_COLUMNS))
+    df.rename(columns=RECORD_COLUMNS, inplace=True)
+    df.insert(0, "publisher_code", publisher_code)
+    return frame_to_rows(normalize_frame(df))
+
+
+_NUMERIC_KEYS = [key for key in RECORD_COLUMNS if key != "Date"]
+_QTY = NUMERIC_COLUMNS.index("quantity")
+
+
+def _normalize_records_scalar(publisher_code, records):
+    rows = []
+    for rec in records:
+        date = parse_mse_date(rec.get("Date"))
+        if date is None:
+            continue
+        values = []
+        for key in _NUMERIC_KEYS:
+            val = parse_mse_number(rec.get(key))
+            values.append(None if val is None or val != val else val)  # NaN -> None
+        if values[_QTY] is not None:
+            values[_QTY] = int(round(values[_QTY]))
+        rows.append((publisher_code, date, *values))
+    return rows
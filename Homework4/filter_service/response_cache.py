@@ -0,0 +1,195 @@
+# Homework4/filter_service/response_cache.py
+
+"""
+response_cache.py
+On-disk cache of MSE symbol history pages for the fetch engine, keyed by
+(publisher_code, FromDate, ToDate).
+
+  - only closed windows are stored: ToDate at least FETCH_CACHE_SETTLE_DAYS
+    before the last complete trading day (a late correction on the MSE
+    site still gets picked up), and only pages that hold the results table
+  - a stored window is served from disk for good; the open window (this
+    year / the last few days) always goes to the network
+  - pages are zlib-compressed in a SQLite file (FETCH_CACHE_PATH), which
+    several filter instances can share
+  - the file is kept under FETCH_CACHE_MAX_MB by evicting the least
+    recently used pages
+
+fetch_planner starts the history on January 1st and splits long gaps at
+calendar years, so the closed years of a publisher are always the same
+requests: rebuilding stock_data.db from scratch fetches only the current
+year of every publisher from the MSE (plus the previous one during the
+first FETCH_CACHE_SETTLE_DAYS of January).
+
+Configuration (env):
+    FETCH_CACHE                1 (0 disables it)
+    FETCH_CACHE_PATH           Homework4/mse_cache.db
+    FETCH_CACHE_MAX_MB         256
+    FETCH_CACHE_SETTLE_DAYS    7
+
+Stats / maintenance:
+    python response_cache.py [--clear]
+"""
+
+import argparse
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import timedelta
+from pathlib import Path
+
+from mse_table_parser import TABLE_ID
+
+FETCH_CACHE = os.environ.get("FETCH_CACHE", "1") != "0"
+FETCH_CACHE_PATH = Path(os.environ.get(
+    "FETCH_CACHE_PATH", Path(__file__).parent.resolve().parent / "mse_cache.db"))
+FETCH_CACHE_MAX_MB = float(os.environ.get("FETCH_CACHE_MAX_MB", 256))
+FETCH_CACHE_SETTLE_DAYS = int(os.environ.get("FETCH_CACHE_SETTLE_DAYS", 7))
+
+ISO_DATE_FMT = '%Y-%m-%d'
+
+RESPONSES_DDL = """
+    CREATE TABLE IF NOT EXISTS responses (
+        publisher_code TEXT NOT NULL,
+        from_date TEXT NOT NULL,
+        to_date TEXT NOT NULL,
+        body BLOB NOT NULL,
+        size INTEGER NOT NULL,
+        stored_at TEXT NOT NULL,
+        used_at REAL NOT NULL,
+        PRIMARY KEY (publisher_code, from_date, to_date)
+    )
+"""
+
+RESPONSES_LRU_INDEX_DDL = "CREATE INDEX IF NOT EXISTS idx_responses_used_at ON responses (used_at)"
+
+EVICT_BATCH = 64
+
+
+class ResponseCache:
+    def __init__(self, path=FETCH_CACHE_PATH, max_mb=FETCH_CACHE_MAX_MB,
+                 settle_days=FETCH_CACHE_SETTLE_DAYS):
+        self.path = Path(path)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.settle = timedelta(days=settle_days)
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.evicted = 0
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), timeout=30,
+                                    isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(RESPONSES_DDL)
+        self.conn.execute(RESPONSES_LRU_INDEX_DDL)
+
+    def is_closed(self, end):
+        """True once nothing in a window ending on `end` can still change."""
+        from fetch_planner import last_complete_day
+        return end <= last_complete_day() - self.settle
+
+    def get(self, code, start, end):
+        """The cached page, or None."""
+        key = (code, start.strftime(ISO_DATE_FMT), end.strftime(ISO_DATE_FMT))
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT body FROM responses WHERE publisher_code = ? AND from_date = ? AND to_date = ?",
+                key
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.conn.execute(
+                "UPDATE responses SET used_at = ? "
+                "WHERE publisher_code = ? AND from_date = ? AND to_date = ?",
+                (time.time(), *key)
+            )
+            self.hits += 1
+        return zlib.decompress(row[0]).decode("utf-8")
+
+    def put(self, code, start, end, html):
+        """Stores the page if its window is closed; True if stored."""
+        if not self.is_closed(end) or TABLE_ID not in html:
+            return False
+        body = zlib.compress(html.encode("utf-8"), 6)
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(publisher_code, from_date, to_date, body, size, stored_at, used_at) "
+                "VALUES (?, ?, ?, ?, ?, datetime('now'), ?)",
+                (code, start.strftime(ISO_DATE_FMT), end.strftime(ISO_DATE_FMT),
+                 body, len(body), time.time())
+            )
+            self.stored += 1
+            self._evict()
+        return True
+
+    def _evict(self):
+        """Drops least recently used pages until the cache fits max_bytes."""
+        size = self.size_bytes()
+        while size > self.max_bytes:
+            victims = self.conn.execute(
+                "SELECT rowid, size FROM responses ORDER BY used_at LIMIT ?", (EVICT_BATCH,)
+            ).fetchall()
+            if not victims:
+                break
+            for rowid, victim_size in victims:
+                if size <= self.max_bytes:
+                    break
+                self.conn.execute("DELETE FROM responses WHERE rowid = ?", (rowid,))
+                size -= victim_size
+                self.evicted += 1
+
+    def size_bytes(self):
+        return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self.conn.execute("DELETE FROM responses")
+            self.conn.execute("VACUUM")
+
+    def stats(self):
+        with self._lock:
+            pages, size = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {
+            "path": str(self.path),
+            "pages": pages,
+            "size_mb": round(size / 1024 / 1024, 2),
+            "max_mb": round(self.max_bytes / 1024 / 1024, 2),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stored": self.stored,
+            "evicted": self.evicted,
+        }
+
+
+def open_cache():
+    """The configured cache, or None when FETCH_CACHE=0 or the file can't be opened."""
+    if not FETCH_CACHE:
+        return None
+    try:
+        return ResponseCache()
+    except (sqlite3.Error, OSError) as e:
+        print(f"response_cache: disabled ({e})")
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clear", action="store_true", help="drop every cached page")
+    args = parser.parse_args()
+    cache = ResponseCache()
+    if args.clear:
+        cache.clear()
+    for key, value in cache.stats().items():
+        print(f"{key:>8}: {value}")
+
+
+if __name__ == "__main__":
+    main()
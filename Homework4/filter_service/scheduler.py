@@ -0,0 +1,214 @@
+# Homework4/filter_service/scheduler.py
+
+"""
+scheduler.py
+In-process refresh scheduler for the filter service, so data stays fresh
+without anyone POSTing /api/run_all_filters and without a request path
+ever waiting on a scrape:
+
+  - filter1 (publisher list, which barely changes; chains the rest) every
+    FILTER1_EVERY_DAYS days
+  - filter2 (incremental: fetch_planner only asks for missing days, then
+    Filter3 reconciles and Filter4 refreshes signals) once per trading day,
+    REFRESH_AFTER_CLOSE_MINUTES after the MSE session closes; a slot missed
+    while the service was down is caught up at startup
+  - every slot gets a random delay of up to SCHEDULE_JITTER_SECONDS
+  - runs are jobs on jobs.job_queue: a tick never submits while any job is
+    queued or running, and a task is only recorded as done when its job
+    succeeded (a failed run is retried after SCHEDULE_RETRY_MINUTES)
+  - last successful runs live in stock_data.db (scheduler_runs), so a
+    restart does not reset the cadence
+  - with several filter instances (sharding.py) every instance schedules
+    filter2 for its own shard; only the holder of shard 0 runs filter1
+
+Configuration (env):
+    SCHEDULER_ENABLED              1 (0 disables it)
+    FILTER1_EVERY_DAYS             7
+    REFRESH_AFTER_CLOSE_MINUTES    60 (after fetch_planner.MSE_SESSION_CLOSE)
+    SCHEDULE_JITTER_SECONDS        600
+    SCHEDULE_RETRY_MINUTES         30
+    SCHEDULER_TICK_SECONDS         30
+"""
+
+import os
+import random
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from fetch_planner import MSE_SESSION_CLOSE, is_trading_day, mse_now
+from jobs import job_queue
+from sharding import shard_lease
+
+SCHEDULER_ENABLED = os.environ.get("SCHEDULER_ENABLED", "1") != "0"
+FILTER1_EVERY_DAYS = float(os.environ.get("FILTER1_EVERY_DAYS", 7))
+REFRESH_AFTER_CLOSE_MINUTES = int(os.environ.get("REFRESH_AFTER_CLOSE_MINUTES", 60))
+SCHEDULE_JITTER_SECONDS = int(os.environ.get("SCHEDULE_JITTER_SECONDS", 600))
+SCHEDULE_RETRY_MINUTES = int(os.environ.get("SCHEDULE_RETRY_MINUTES", 30))
+SCHEDULER_TICK_SECONDS = int(os.environ.get("SCHEDULER_TICK_SECONDS", 30))
+
+STOCK_DB = Path(__file__).parent.resolve().parent / "stock_data.db"
+
+SCHEDULER_RUNS_DDL = """
+    CREATE TABLE IF NOT EXISTS scheduler_runs (
+        task TEXT PRIMARY KEY,
+        last_run TEXT NOT NULL
+    )
+"""
+
+TASKS = ("filter1", "filter2")
+
+
+class Scheduler:
+    def __init__(self, db_path=STOCK_DB):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._jitter = {}     # task -> (slot, delay)
+        self._jobs = {}       # task -> (job, submitted at), not yet settled
+        self._retry_at = {}   # task -> earliest resubmission after a failure
+        self._born = mse_now()
+
+    # persistence
+
+    def _connect(self):
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        conn.execute(SCHEDULER_RUNS_DDL)
+        return conn
+
+    def last_runs(self):
+        conn = self._connect()
+        try:
+            return {task: datetime.fromisoformat(last)
+                    for task, last in conn.execute("SELECT task, last_run FROM scheduler_runs")}
+        finally:
+            conn.close()
+
+    def _record(self, task, when):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO scheduler_runs (task, last_run) VALUES (?, ?) "
+                    "ON CONFLICT(task) DO UPDATE SET last_run = excluded.last_run",
+                    (task, when.isoformat(timespec="seconds"))
+                )
+        finally:
+            conn.close()
+
+    # slots
+
+    def _tasks(self):
+        if shard_lease.index is None:
+            return ()   # standby instance: no shard, nothing to refresh
+        return TASKS if shard_lease.runs_filter1() else ("filter2",)
+
+    def _key(self, task):
+        """scheduler_runs key: per shard when the publishers are sharded."""
+        return f"{task}@shard{shard_lease.index}" if shard_lease.sharded else task
+
+    def _slot(self, task, now, last_runs):
+        """The time `task` became due (its current slot), or None if it isn't due."""
+        last = last_runs.get(self._key(task))
+        if task == "filter1":
+            slot = last + timedelta(days=FILTER1_EVERY_DAYS) if last else self._born
+        else:
+            close = datetime.combine(now.date(), MSE_SESSION_CLOSE)
+            slot = close + timedelta(minutes=REFRESH_AFTER_CLOSE_MINUTES)
+            # the latest trading-day slot that has already started
+            while slot > now or not is_trading_day(slot.date()):
+                slot -= timedelta(days=1)
+            if last and last >= slot:
+                return None
+        return slot if slot <= now else None
+
+    def _due_at(self, task, slot):
+        prev_slot, delay = self._jitter.get(task, (None, 0))
+        if prev_slot != slot:
+            delay = random.uniform(0, SCHEDULE_JITTER_SECONDS)
+            self._jitter[task] = (slot, delay)
+        return slot + timedelta(seconds=delay)
+
+    # loop
+
+    def tick(self, now=None):
+        """One scheduling pass; returns the task submitted, if any."""
+        now = now or mse_now()
+        with self._lock:
+            self._settle(now)
+            if self._jobs or job_queue.active():
+                return None   # never overlap runs
+            last_runs = self.last_runs()
+            for task in self._tasks():   # filter1 first: its chain covers filter2
+                slot = self._slot(task, now, last_runs)
+                if slot is None or now < self._due_at(task, slot):
+                    continue
+                if now < self._retry_at.get(task, now):
+                    continue
+                job, _ = job_queue.submit(task)
+                self._jobs[task] = (job, now)
+                print(f"scheduler: submitted {task} (slot {slot:%Y-%m-%d %H:%M}), job {job.id}")
+                return task
+        return None
+
+    def _settle(self, now):
+        for task, (job, started) in list(self._jobs.items()):
+            if job.status == "succeeded":
+                self._record(self._key(task), started)
+                if task == "filter1":
+                    self._record(self._key("filter2"), started)   # Filter1 chains Filter2..4
+                self._retry_at.pop(task, None)
+            elif job.status == "failed":
+                self._retry_at[task] = now + timedelta(minutes=SCHEDULE_RETRY_MINUTES)
+            else:
+                continue
+            del self._jobs[task]
+
+    def _run(self):
+        while not self._stop.wait(SCHEDULER_TICK_SECONDS):
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"scheduler: tick failed ({e})")
+
+    def start(self):
+        """Starts the tick thread (idempotent)."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="filter-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self):
+        now = mse_now()
+        last_runs = self.last_runs()
+        tasks = {}
+        for task in self._tasks():
+            slot = self._slot(task, now, last_runs)
+            pending = self._jobs.get(task)
+            last = last_runs.get(self._key(task))
+            tasks[task] = {
+                "last_run": last.isoformat(timespec="seconds") if last else None,
+                "due_since": slot.isoformat(timespec="seconds") if slot else None,
+                "retry_at": self._retry_at[task].isoformat(timespec="seconds") if task in self._retry_at else None,
+                "job_id": pending[0].id if pending else None,
+            }
+        return {
+            "enabled": SCHEDULER_ENABLED,
+            "running": self._thread is not None and self._thread.is_alive(),
+            "shard": shard_lease.index,
+            "now": now.isoformat(timespec="seconds"),
+            "filter1_every_days": FILTER1_EVERY_DAYS,
+            "refresh_after_close_minutes": REFRESH_AFTER_CLOSE_MINUTES,
+            "jitter_seconds": SCHEDULE_JITTER_SECONDS,
+            "tasks": tasks,
+        }
+
+
+scheduler = Scheduler()
@@ -0,0 +1,307 @@
+# Homework4/filter_service/sharding.py
+
+"""
+sharding.py
+Splits the publishers over several filter-service instances and orders
+each instance's share so the liquid tickers are refreshed first.
+
+  - FILTER_SHARDS shards; a publisher belongs to the shard with the
+    highest hash(shard, publisher_code) (rendezvous hashing), so changing
+    the shard count only moves the publishers of the added / removed shard
+  - an instance works on one shard, held as a lease in stock_data.db
+    (shard_leases): it claims the lowest free or expired shard at start
+    and renews it every SHARD_HEARTBEAT_SECONDS. Replicas therefore need
+    no per-instance config (docker compose --scale works), an instance
+    that dies hands its shard to a spare one after SHARD_LEASE_SECONDS,
+    and an instance without a shard owns no publishers
+  - fencing: the filters take the shard they planned with and check it
+    before every write; a run whose lease was lost or moved stops instead
+    of writing publishers another instance now owns
+  - the heartbeat also publishes the instance's job progress into its
+    lease row, so any instance can report every shard (GET /shards), and
+    picks up runs requested for the shard by another instance (POST /jobs
+    on one instance starts the run on all shards)
+  - priority: publishers are ordered by traded value (price x quantity)
+    over their last LIQUIDITY_DAYS stored days, most liquid first
+
+With FILTER_SHARDS=1 (the default) there is no lease: the instance owns
+every publisher.
+
+Configuration (env):
+    FILTER_SHARDS              1
+    SHARD_LEASE_SECONDS        60
+    SHARD_HEARTBEAT_SECONDS    15
+    LIQUIDITY_DAYS             30
+"""
+
+import atexit
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from jobs import job_queue
+
+FILTER_SHARDS = max(1, int(os.environ.get("FILTER_SHARDS", 1)))
+SHARD_LEASE_SECONDS = int(os.environ.get("SHARD_LEASE_SECONDS", 60))
+SHARD_HEARTBEAT_SECONDS = int(os.environ.get("SHARD_HEARTBEAT_SECONDS", 15))
+LIQUIDITY_DAYS = int(os.environ.get("LIQUIDITY_DAYS", 30))
+
+STOCK_DB = Path(__file__).parent.resolve().parent / "stock_data.db"
+
+SHARD_LEASES_DDL = """
+    CREATE TABLE IF NOT EXISTS shard_leases (
+        shard INTEGER PRIMARY KEY,
+        owner TEXT,
+        expires_at REAL,
+        heartbeat_at REAL,
+        progress TEXT,
+        requested TEXT
+    )
+"""
+
+LIQUIDITY_SQL = """
+    SELECT COALESCE(SUM(price * quantity), 0) FROM (
+        SELECT price, quantity FROM stock_data
+        WHERE publisher_code = ?
+        ORDER BY date DESC LIMIT ?
+    )
+"""
+
+
+class ShardLeaseLost(RuntimeError):
+    pass
+
+
+def shard_of(publisher_code, shards=FILTER_SHARDS):
+    """Rendezvous hash: stable across processes and machines (not hash())."""
+    def weight(shard):
+        digest = hashlib.blake2b(f"{shard}:{publisher_code}".encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "big")
+    return max(range(shards), key=weight)
+
+
+def by_liquidity(conn, publisher_codes):
+    """publisher_codes, most traded value over the last LIQUIDITY_DAYS first."""
+    value = {
+        code: conn.execute(LIQUIDITY_SQL, (code, LIQUIDITY_DAYS)).fetchone()[0]
+        for code in publisher_codes
+    }
+    return sorted(publisher_codes, key=lambda code: (-value[code], code))
+
+
+class ShardLease:
+    def __init__(self, db_path=STOCK_DB, shards=FILTER_SHARDS):
+        self.db_path = db_path
+        self.shards = shards
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.index = 0 if shards == 1 else None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def sharded(self):
+        return self.shards > 1
+
+    def _connect(self):
+        conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+        conn.execute(SHARD_LEASES_DDL)
+        return conn
+
+    # lease
+
+    def claim(self):
+        """Keeps / takes a shard; returns its index, or None if all are held."""
+        if not self.sharded:
+            return self.index
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany("INSERT OR IGNORE INTO shard_leases (shard) VALUES (?)",
+                             [(i,) for i in range(self.shards)])
+            rows = conn.execute(
+                "SELECT shard, owner, expires_at FROM shard_leases WHERE shard < ? ORDER BY shard",
+                (self.shards,)
+            ).fetchall()
+            mine = [s for s, owner, _ in rows if owner == self.owner]
+            free = [s for s, owner, expires in rows if owner is None or (expires or 0) < now]
+            index = (mine or free or [None])[0]
+            if index is not None:
+                conn.execute(
+                    "UPDATE shard_leases SET owner = ?, expires_at = ?, heartbeat_at = ? WHERE shard = ?",
+                    (self.owner, now + SHARD_LEASE_SECONDS, now, index)
+                )
+                # a lease this process held on another shard is given back
+                conn.execute(
+                    "UPDATE shard_leases SET owner = NULL, expires_at = NULL "
+                    "WHERE owner = ? AND shard != ?", (self.owner, index)
+                )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        with self._lock:
+            if index != self.index:
+                print(f"sharding: {self.owner} now holds shard {index} of {self.shards}")
+            self.index = index
+        return index
+
+    def heartbeat(self):
+        """Renews the lease (or claims one), publishes progress, starts requested runs."""
+        if not self.sharded:
+            return
+        now = time.time()
+        conn = self._connect()
+        try:
+            renewed = conn.execute(
+                "UPDATE shard_leases SET expires_at = ?, heartbeat_at = ?, progress = ? "
+                "WHERE shard = ? AND owner = ?",
+                (now + SHARD_LEASE_SECONDS, now, json.dumps(_local_progress()), self.index, self.owner)
+            ).rowcount if self.index is not None else 0
+            requested = None
+            if renewed:
+                row = conn.execute("SELECT requested FROM shard_leases WHERE shard = ?",
+                                   (self.index,)).fetchone()
+                requested = row[0] if row else None
+                if requested:
+                    conn.execute("UPDATE shard_leases SET requested = NULL WHERE shard = ?",
+                                 (self.index,))
+        finally:
+            conn.close()
+        if not renewed:
+            with self._lock:
+                self.index = None
+            self.claim()
+        if requested:
+            job_queue.submit(requested)
+
+    def release(self):
+        if not self.sharded or self.index is None:
+            return
+        conn = self._connect()
+        try:
+            conn.execute("UPDATE shard_leases SET owner = NULL, expires_at = NULL "
+                         "WHERE shard = ? AND owner = ?", (self.index, self.owner))
+        finally:
+            conn.close()
+        with self._lock:
+            self.index = None
+
+    def start(self):
+        """Claims a shard and keeps it renewed in the background (idempotent)."""
+        if not self.sharded:
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="shard-lease", daemon=True)
+            self._thread.start()
+        atexit.register(self.stop)
+        self.claim()
+
+    def stop(self):
+        self._stop.set()
+        self.release()
+
+    def _run(self):
+        while not self._stop.wait(SHARD_HEARTBEAT_SECONDS):
+            try:
+                self.heartbeat()
+            except sqlite3.Error as e:
+                print(f"sharding: heartbeat failed ({e})")
+
+    # ownership
+
+    def owned(self, publisher_codes):
+        """(shard, codes): the shard this instance holds and its share of publisher_codes."""
+        self.start()
+        shard = self.index
+        if shard is None:
+            return None, []
+        return shard, [c for c in publisher_codes
+                       if not self.sharded or shard_of(c, self.shards) == shard]
+
+    def assigned(self, conn, publisher_codes):
+        """owned(), most liquid first; conn is a stock_data connection."""
+        shard, codes = self.owned(publisher_codes)
+        return shard, by_liquidity(conn, codes)
+
+    def check(self, shard):
+        """Fencing: raises ShardLeaseLost unless this instance still holds `shard`."""
+        if self.sharded and self.index != shard:
+            raise ShardLeaseLost(f"{self.owner} no longer holds shard {shard}")
+
+    def runs_filter1(self):
+        """Only one instance refreshes the (shared) publisher list on schedule."""
+        return self.index == 0
+
+    # coordination
+
+    def request_run(self, kind):
+        """Asks the other shards' instances to start a `kind` run on their next heartbeat."""
+        if not self.sharded:
+            return 0
+        conn = self._connect()
+        try:
+            return conn.execute(
+                "UPDATE shard_leases SET requested = ? WHERE shard < ? AND shard IS NOT ? "
+                "AND owner IS NOT NULL",
+                (kind, self.shards, self.index)
+            ).rowcount
+        finally:
+            conn.close()
+
+    def status(self, publisher_codes=()):
+        now = time.time()
+        counts = {}
+        for code in publisher_codes:
+            shard = shard_of(code, self.shards)
+            counts[shard] = counts.get(shard, 0) + 1
+        if self.sharded:
+            conn = self._connect()
+            try:
+                rows = conn.execute(
+                    "SELECT shard, owner, expires_at, heartbeat_at, progress FROM shard_leases "
+                    "WHERE shard < ? ORDER BY shard", (self.shards,)
+                ).fetchall()
+            finally:
+                conn.close()
+        else:
+            rows = [(0, self.owner, None, now, json.dumps(_local_progress()))]
+        known = {row[0]: row for row in rows}
+        shards = []
+        for shard in range(self.shards):
+            _, owner, expires, beat, progress = known.get(shard, (shard, None, None, None, None))
+            held = owner is not None and (expires is None or expires >= now)
+            shards.append({
+                "shard": shard,
+                "owner": owner if held else None,
+                "alive": held,
+                "heartbeat_age_seconds": round(now - beat, 1) if beat else None,
+                "publishers": counts.get(shard, 0),
+                "job": json.loads(progress) if progress else None,
+            })
+        return {
+            "shards": self.shards,
+            "this_instance": {"owner": self.owner, "shard": self.index},
+            "unowned": [s["shard"] for s in shards if not s["alive"]],
+            "per_shard": shards,
+        }
+
+
+def _local_progress():
+    """Summary of the running job, else of the latest one."""
+    job = job_queue.current
+    if job is None:
+        recent = job_queue.recent()
+        job = recent[0] if recent else None
+    return job.summary() if job is not None else None
+
+
+shard_lease = ShardLease()
@@ -0,0 +1,202 @@
+# Homework4/filter_service/stock_schema.py
+
+"""
+stock_schema.py
+Single definition of the stock_data table shared by the filters and the
+migration tool.
+
+Dates are stored as ISO 'YYYY-MM-DD' text (so ORDER BY / MAX work), prices
+and turnovers as REAL, quantity as INTEGER. The (publisher_code, date, ...)
+index covers the analysis query, so readers get an index-range scan.
+
+fetch_coverage holds the date ranges each publisher has been fetched for
+(merged on insert, written by the bulk writer in the same transaction as
+the rows); fetch_planner.py plans the missing requests from it, reading
+every publisher's resume points with one query.
+
+data_versions holds a per-publisher counter the bulk writer bumps in the
+same transaction whenever a publisher's rows actually change; readers
+(the gateway's response cache) use it as a cheap "has anything changed"
+token. A publisher without a row is at version 0.
+"""
+
+import sqlite3
+
+STOCK_DATA_DDL = """
+    CREATE TABLE IF NOT EXISTS stock_data (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        publisher_code TEXT NOT NULL,
+        date TEXT NOT NULL,
+        price REAL,
+        max REAL,
+        min REAL,
+        avg REAL,
+        percent_change REAL,
+        quantity INTEGER,
+        best_turnover REAL,
+        total_turnover REAL,
+        UNIQUE(publisher_code, date) ON CONFLICT REPLACE
+    )
+"""
+
+STOCK_DATA_INDEX_DDL = """
+    CREATE INDEX IF NOT EXISTS idx_stock_data_publisher_date
+    ON stock_data (publisher_code, date, price, max, min, quantity)
+"""
+
+INSERT_SQL = """
+    INSERT OR REPLACE INTO stock_data (
+        publisher_code, date, price, max, min, avg,
+        percent_change, quantity, best_turnover, total_turnover
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+FETCH_COVERAGE_DDL = """
+    CREATE TABLE IF NOT EXISTS fetch_coverage (
+        publisher_code TEXT NOT NULL,
+        from_date TEXT NOT NULL,
+        to_date TEXT NOT NULL,
+        PRIMARY KEY (publisher_code, from_date)
+    )
+"""
+
+DATA_VERSIONS_DDL = """
+    CREATE TABLE IF NOT EXISTS data_versions (
+        publisher_code TEXT PRIMARY KEY,
+        version INTEGER NOT NULL,
+        updated_at TEXT
+    )
+"""
+
+BUMP_VERSION_SQL = """
+    INSERT INTO data_versions (publisher_code, version, updated_at)
+    VALUES (?, 1, datetime('now'))
+    ON CONFLICT(publisher_code) DO UPDATE SET
+        version = version + 1,
+        updated_at = excluded.updated_at
+"""
+
+VALUE_COLUMNS = ["price", "max", "min", "avg", "percent_change", "quantity",
+                 "best_turnover", "total_turnover"]
+
+# Same parameters as INSERT_SQL. The upsert clause takes precedence over the
+# table's ON CONFLICT REPLACE, so an existing day is updated in place (same
+# id) and only when a value differs; identical rows are not written at all.
+UPSERT_SQL = """
+    INSERT INTO stock_data (
+        publisher_code, date, price, max, min, avg,
+        percent_change, quantity, best_turnover, total_turnover
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(publisher_code, date) DO UPDATE SET
+        %s
+    WHERE %s
+""" % (
+    ",\n        ".join(f"{c} = excluded.{c}" for c in VALUE_COLUMNS),
+    "\n       OR ".join(f"stock_data.{c} IS NOT excluded.{c}" for c in VALUE_COLUMNS),
+)
+
+MSE_DATE_FMT = '%d.%m.%Y'
+ISO_DATE_FMT = '%Y-%m-%d'
+
+
+def is_legacy_schema(conn):
+    """
+    True if stock_data exists with the old all-TEXT columns
+    (dd.mm.yyyy dates, euro-formatted numbers).
+    """
+    cols = {row[1]: (row[2] or "").upper()
+            for row in conn.execute("PRAGMA table_info(stock_data)")}
+    return cols.get("price") == "TEXT"
+
+
+def ensure_schema(conn):
+    """
+    Creates stock_data + its covering index if missing.
+    Refuses to write into a legacy TEXT table (run migrate_stock_db.py first).
+    """
+    if is_legacy_schema(conn):
+        raise RuntimeError(
+            "stock_data uses the legacy TEXT schema; "
+            "run filter_service/migrate_stock_db.py first."
+        )
+    conn.execute(STOCK_DATA_DDL)
+    conn.execute(STOCK_DATA_INDEX_DDL)
+    conn.execute(DATA_VERSIONS_DDL)
+    # rows stored before coverage was tracked: the old filters backfilled
+    # 10 years on a publisher's first run, so everything before its first
+    # stored day counts as fetched; later holes are still planned
+    _create_seeded(conn, "fetch_coverage", FETCH_COVERAGE_DDL, """
+        INSERT INTO fetch_coverage (publisher_code, from_date, to_date)
+        SELECT publisher_code, date(MIN(date), '-3650 days'), MIN(date) FROM stock_data
+        GROUP BY publisher_code
+    """)
+
+
+def _create_seeded(conn, table, ddl, seed_sql):
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone()
+    if not exists:
+        conn.execute(ddl)
+        conn.execute(seed_sql)
+        conn.commit()
+
+
+def bump_data_version(conn, publisher_code):
+    conn.execute(BUMP_VERSION_SQL, (publisher_code,))
+
+
+def load_coverage(conn):
+    """{publisher_code: [(from_date, to_date), ...]} (ISO, sorted, non-overlapping)."""
+    coverage = {}
+    for code, start, end in conn.execute(
+            "SELECT publisher_code, from_date, to_date FROM fetch_coverage "
+            "ORDER BY publisher_code, from_date"):
+        coverage.setdefault(code, []).append((start, end))
+    return coverage
+
+
+def record_coverage(conn, publisher_code, from_date, to_date):
+    """Adds from_date..to_date (ISO) as fetched, merged with overlapping / adjacent ranges."""
+    touching = conn.execute(
+        "SELECT from_date, to_date FROM fetch_coverage WHERE publisher_code = ? "
+        "AND from_date <= date(?, '+1 day') AND to_date >= date(?, '-1 day')",
+        (publisher_code, to_date, from_date)
+    ).fetchall()
+    if touching:
+        from_date = min([from_date] + [r[0] for r in touching])
+        to_date = max([to_date] + [r[1] for r in touching])
+        conn.executemany(
+            "DELETE FROM fetch_coverage WHERE publisher_code = ? AND from_date = ?",
+            [(publisher_code, r[0]) for r in touching]
+        )
+    conn.execute(
+        "INSERT INTO fetch_coverage (publisher_code, from_date, to_date) VALUES (?, ?, ?)",
+        (publisher_code, from_date, to_date)
+    )
+
+
+# analysis-service tables derived from stock_data -> their "covers up to" date column
+DERIVED_TABLES = (
+    ("indicator_state", "as_of_date"),
+    ("signals", "as_of_date"),
+    ("ohlcv_bars", "date"),
+)
+
+
+def invalidate_derived_state(conn, publisher_code, first_date):
+    """
+    Drops what the analysis service derived from a publisher's history
+    (indicator_state, precomputed signals, resampled bars) if rows dated
+    on/before its as_of date are being (re)written, so it gets rebuilt
+    instead of advanced. Appending newer rows keeps it.
+    """
+    for table, column in DERIVED_TABLES:
+        try:
+            conn.execute(
+                f"DELETE FROM {table} WHERE publisher_code = ? AND {column} >= ?",
+                (publisher_code, first_date)
+            )
+        except sqlite3.OperationalError:
+            # analysis service hasn't created the table yet
+            pass
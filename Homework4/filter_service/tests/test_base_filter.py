@@ -0,0 +1,87 @@
+# Homework4/filter_service/tests/test_base_filter.py
+
+import threading
+import time
+
+from base_filter import BaseFilter
+
+
+class StreamFilter(BaseFilter):
+    supports_streaming = True
+
+    def __init__(self, fail_save_at=None, fail_parse_at=None):
+        self.fail_save_at = fail_save_at
+        self.fail_parse_at = fail_parse_at
+        self.saved = []
+        self.finished = False
+
+    def scrape_data(self):
+        pass
+
+    def parse_data(self, raw_data):
+        pass
+
+    def save_data(self, parsed_data):
+        pass
+
+    def scrape_stream(self):
+        for i in range(500):
+            time.sleep(0.001)
+            yield i
+
+    def parse_chunk(self, raw_chunk):
+        if raw_chunk == self.fail_parse_at:
+            raise ValueError("bad page")
+        return raw_chunk
+
+    def save_chunk(self, parsed_chunk):
+        if parsed_chunk == self.fail_save_at:
+            raise RuntimeError("database is locked")
+        self.saved.append(parsed_chunk)
+
+    def finish_stream(self):
+        self.finished = True
+
+
+def _stage_threads():
+    return [t for t in threading.enumerate() if t.name.startswith("StreamFilter-")]
+
+
+def _run_bounded(f, seconds=10):
+    """Runs f.run() in a thread; fails instead of hanging the suite."""
+    outcome = {}
+
+    def target():
+        try:
+            f.run()
+        except Exception as e:
+            outcome["error"] = e
+
+    t = threading.Thread(target=target, daemon=True)
+    t.start()
+    t.join(seconds)
+    assert not t.is_alive(), "run() did not return"
+    return outcome.get("error")
+
+
+def test_streaming_saves_every_chunk_in_order():
+    f = StreamFilter()
+    assert _run_bounded(f) is None
+    assert f.saved == list(range(500))
+    assert f.finished
+
+
+def test_save_error_stops_the_stages_and_is_reraised():
+    f = StreamFilter(fail_save_at=3)
+    error = _run_bounded(f)
+    assert isinstance(error, RuntimeError)
+    assert not f.finished
+    time.sleep(0.1)
+    assert _stage_threads() == []
+
+
+def test_parse_error_is_reraised():
+    f = StreamFilter(fail_parse_at=5)
+    error = _run_bounded(f)
+    assert isinstance(error, ValueError)
+    assert f.saved == [0, 1, 2, 3, 4]
@@ -0,0 +1,89 @@
+# Homework4/filter_service/tests/test_bulk_writer.py
+
+import sqlite3
+
+from bulk_writer import BulkWriter
+
+
+def _row(code, day, price=1.0):
+    return (code, day, price, price, price, price, 0.0, 1, price, price)
+
+
+def _versions(db):
+    conn = sqlite3.connect(db)
+    try:
+        return dict(conn.execute("SELECT publisher_code, version FROM data_versions"))
+    finally:
+        conn.close()
+
+
+def _write(db, code, rows):
+    writer = BulkWriter(db)
+    writer.write(code, rows)
+    changed = writer.close()
+    return writer, changed
+
+
+def test_inserted_updated_unchanged(tmp_path):
+    db = tmp_path / "stock_data.db"
+    days = ["2026-10-13", "2026-10-14", "2026-10-15"]
+
+    writer, changed = _write(db, "ALK", [_row("ALK", d) for d in days])
+    assert (writer.inserted, writer.updated, writer.unchanged) == (3, 0, 0)
+    assert changed == ["ALK"]
+
+    # refetched: two days as stored, one revised, one new
+    rows = [_row("ALK", days[0]), _row("ALK", days[1]), _row("ALK", days[2], 2.0),
+            _row("ALK", "2026-10-16")]
+    writer, changed = _write(db, "ALK", rows)
+    assert writer.summary() == "1 inserted, 1 updated, 2 unchanged"
+    assert writer.total == 2
+
+    conn = sqlite3.connect(db)
+    assert conn.execute("SELECT COUNT(*) FROM stock_data").fetchone()[0] == 4
+    assert conn.execute("SELECT price FROM stock_data WHERE date = ?", (days[2],)).fetchone()[0] == 2.0
+    conn.close()
+
+
+def test_version_bumped_only_on_change(tmp_path):
+    db = tmp_path / "stock_data.db"
+    _write(db, "ALK", [_row("ALK", "2026-10-15")])
+    _write(db, "KMB", [_row("KMB", "2026-10-15")])
+    assert _versions(db) == {"ALK": 1, "KMB": 1}
+
+    writer, changed = _write(db, "ALK", [_row("ALK", "2026-10-15")])
+    assert changed == []
+    assert writer.unchanged == 1
+    assert _versions(db) == {"ALK": 1, "KMB": 1}
+
+    _write(db, "ALK", [_row("ALK", "2026-10-15", 3.0)])
+    assert _versions(db) == {"ALK": 2, "KMB": 1}
+
+
+def test_changed_rows_invalidate_derived_state(tmp_path):
+    db = tmp_path / "stock_data.db"
+    _write(db, "ALK", [_row("ALK", d) for d in ("2026-10-14", "2026-10-15")])
+    conn = sqlite3.connect(db)
+    conn.execute("CREATE TABLE indicator_state (publisher_code TEXT, as_of_date TEXT)")
+    conn.execute("INSERT INTO indicator_state VALUES ('ALK', '2026-10-15')")
+    conn.commit()
+
+    _write(db, "ALK", [_row("ALK", "2026-10-15")])    # unchanged: kept
+    assert conn.execute("SELECT COUNT(*) FROM indicator_state").fetchone()[0] == 1
+    _write(db, "ALK", [_row("ALK", "2026-10-14", 5.0)])    # revised: dropped
+    assert conn.execute("SELECT COUNT(*) FROM indicator_state").fetchone()[0] == 0
+    conn.close()
+
+
+def test_coverage_is_recorded_with_the_rows(tmp_path):
+    db = tmp_path / "stock_data.db"
+    writer = BulkWriter(db)
+    writer.write("ALK", [_row("ALK", "2026-10-15")])
+    writer.mark_covered("ALK", "2026-10-01", "2026-10-10")
+    writer.mark_covered("ALK", "2026-10-11", "2026-10-15")
+    writer.close()
+
+    conn = sqlite3.connect(db)
+    assert conn.execute("SELECT publisher_code, from_date, to_date FROM fetch_coverage").fetchall() == [
+        ("ALK", "2026-10-01", "2026-10-15")]
+    conn.close()
@@ -0,0 +1,63 @@
+# Homework4/filter_service/tests/test_fetch_planner.py
+
+import sqlite3
+from datetime import date, datetime
+
+from bulk_writer import BulkWriter
+from fetch_planner import covered_range, plan
+
+# a Friday, after the 14:00 close: the 16th is the last complete day
+AFTER_CLOSE = datetime(2026, 10, 16, 15, 0)
+FRIDAY = date(2026, 10, 16)
+
+
+def _row(day):
+    return ("ALK", day, 1.0, 1.0, 1.0, 1.0, 0.0, 1, 1.0, 1.0)
+
+
+def test_unpublished_last_day_is_not_covered():
+    assert covered_range(date(2026, 10, 1), FRIDAY, [], AFTER_CLOSE) == ("2026-10-01", "2026-10-15")
+    rows = [_row("2026-10-15")]
+    assert covered_range(date(2026, 10, 1), FRIDAY, rows, AFTER_CLOSE) == ("2026-10-01", "2026-10-15")
+
+
+def test_published_last_day_is_covered():
+    rows = [_row("2026-10-16")]
+    assert covered_range(date(2026, 10, 1), FRIDAY, rows, AFTER_CLOSE) == ("2026-10-01", "2026-10-16")
+
+
+def test_older_window_is_covered_without_rows():
+    assert covered_range(date(2025, 1, 1), date(2025, 12, 31), [], AFTER_CLOSE) == ("2025-01-01", "2025-12-31")
+
+
+def test_single_unpublished_day_records_nothing():
+    assert covered_range(FRIDAY, FRIDAY, [], AFTER_CLOSE) is None
+
+
+def test_unpublished_day_is_planned_again(tmp_path):
+    db = tmp_path / "stock_data.db"
+    writer = BulkWriter(db)
+    rows = [_row("2026-10-15")]
+    writer.write("ALK", rows)
+    writer.mark_covered("ALK", *covered_range(date(2016, 1, 1), FRIDAY, rows, AFTER_CLOSE))
+    writer.close()
+
+    conn = sqlite3.connect(db)
+    assert plan(conn, ["ALK"], AFTER_CLOSE) == {"ALK": [(FRIDAY, FRIDAY)]}
+    conn.close()
+
+
+def test_closed_windows_are_stable_from_day_to_day(tmp_path):
+    # rebuilding from scratch: only the current year's window may change
+    # from one day to the next, so every older one keeps its cache key
+    conn = sqlite3.connect(tmp_path / "stock_data.db")
+    BulkWriter(tmp_path / "stock_data.db").close()
+    today = plan(conn, ["ALK"], AFTER_CLOSE)["ALK"]
+    next_week = plan(conn, ["ALK"], datetime(2026, 10, 23, 15, 0))["ALK"]
+    conn.close()
+
+    assert today[:-1] == next_week[:-1]
+    assert today[0][0] == date(2016, 1, 4)    # first trading day of 2016
+    for start, end in today:
+        assert start.year == end.year
+    assert today[-1] == (date(2026, 1, 1), FRIDAY)
@@ -0,0 +1,96 @@
+# Homework4/filter_service/tests/test_jobs.py
+
+import threading
+import time
+
+import pytest
+
+import jobs
+from jobs import JobQueue
+
+
+class _Gate:
+    """Stands in for the filter classes: run() blocks until released."""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.runs = []
+        self.fail = False
+
+    def __call__(self, kind):
+        gate = self
+
+        class FakeFilter:
+            def run(self):
+                gate.runs.append(kind)
+                gate.started.set()
+                gate.release.wait(5)
+                jobs.report_plan({"ALK": [1, 2], "KMB": [3]})
+                jobs.report_chunk("ALK", 10)
+                if gate.fail:
+                    raise RuntimeError("MSE unreachable")
+        return FakeFilter
+
+
+@pytest.fixture
+def gate(monkeypatch):
+    gate = _Gate()
+    monkeypatch.setattr(jobs, "_filter_class", gate)
+    monkeypatch.setattr(jobs, "job_queue", JobQueue())
+    yield gate
+    gate.release.set()
+
+
+def _wait_finished(job):
+    deadline = time.monotonic() + 5
+    while job.status in ("queued", "running") and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_triggers_coalesce_while_queued_or_running(gate):
+    queue = jobs.job_queue
+    first, created = queue.submit("filter2")
+    assert created
+    gate.started.wait(5)
+    assert first.status == "running"
+
+    again, created = queue.submit("filter2")
+    assert again is first and not created
+    queued, created = queue.submit("filter3")
+    assert created and queued.status == "queued"
+    assert queue.submit("filter3") == (queued, False)
+    assert (first.triggers, queued.triggers) == (2, 2)
+
+    gate.release.set()
+    _wait_finished(queued)
+    assert gate.runs == ["filter2", "filter3"]
+    assert first.status == queued.status == "succeeded"
+
+    # finished jobs are not reused
+    later, created = queue.submit("filter2")
+    assert created and later is not first
+    _wait_finished(later)
+
+
+def test_alias_and_unknown_kind(gate):
+    gate.release.set()
+    job, _ = jobs.job_queue.submit("all")
+    assert job.kind == "filter1"
+    _wait_finished(job)
+    with pytest.raises(ValueError):
+        jobs.job_queue.submit("filter9")
+
+
+def test_progress_and_failure_are_recorded(gate):
+    gate.fail = True
+    gate.release.set()
+    job, _ = jobs.job_queue.submit("filter3")
+    _wait_finished(job)
+
+    summary = job.summary()
+    assert summary["status"] == "failed"
+    assert summary["error"] == "RuntimeError: MSE unreachable"
+    assert summary["requests"] == {"done": 1, "planned": 3}
+    assert summary["rows"] == 10
+    assert not jobs.job_queue.active()
@@ -0,0 +1,62 @@
+# Homework4/filter_service/tests/test_mse_table_parser.py
+# the streaming resultsTable parser against the BeautifulSoup code it
+# replaced, on the pages in tests/fixtures
+
+from pathlib import Path
+
+import pytest
+
+from mse_table_parser import FEED_SIZE, MSE_COLUMNS, _bs4_records, iter_rows, parse_records
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+PAGES = sorted(FIXTURES.glob("*.html"))
+
+
+def _page(name):
+    return (FIXTURES / name).read_text(encoding="utf-8")
+
+
+@pytest.mark.parametrize("path", PAGES, ids=[p.name for p in PAGES])
+def test_matches_beautifulsoup(path):
+    html = path.read_text(encoding="utf-8")
+    expected = _bs4_records(html)
+    assert parse_records(html) == expected
+    assert list(iter_rows(html)) == [tuple(r[k] for k in MSE_COLUMNS) for r in expected]
+
+
+def test_site_layout_page():
+    records = parse_records(_page("mse_symbolhistory_alk.html"))
+    # header, the script's row template and the 9-cell footer table are not rows
+    assert [r["Date"] for r in records][:3] == ["3.10.2024", "2.10.2024", "1.10.2024"]
+    assert len(records) == 9
+    assert records[1]["Max"] == "" and records[1]["Quantity"] == "0"
+    assert records[2]["Price"] == "23.300,00"   # &nbsp; decoded, then stripped
+    assert records[2]["Total Turnover"] == "31.444.420,72"
+
+
+def test_commented_out_table_is_skipped():
+    records = parse_records(_page("commented_out_table.html"))
+    assert [r["Date"] for r in records] == ["04.10.2024", "03.10.2024"]
+
+
+def test_rows_across_feed_boundaries():
+    html = _page("stub_kmb_2023_2024.html")
+    assert len(html.encode("utf-8")) > FEED_SIZE
+    records = parse_records(html)
+    assert records[0]["Date"] == "31.12.2024"
+    assert records[-1]["Date"] == "02.01.2023"
+
+
+def test_sloppy_markup():
+    records = parse_records(_page("sloppy_markup.html"))
+    assert len(records) == 3                       # the short row is skipped
+    assert records[0]["Max"] == "2.150,00"         # nested <span>
+    assert records[0]["Total Turnover"] == "21.400,00"   # extra cell ignored
+    # unclosed <td>s nest, as in BS4's tree: each holds the rest of the row
+    assert records[1]["Date"] == "02.02.202412345678"
+    assert records[1]["Total Turnover"] == "8"
+    assert records[2]["Total Turnover"] == "8"     # nested table in a cell
+
+
+def test_page_without_table():
+    assert parse_records("<html><body>no table</body></html>") == []
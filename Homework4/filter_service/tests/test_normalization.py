@@ -0,0 +1,128 @@
+# Homework4/filter_service/tests/test_normalization.py
+# parse_mse_number / its vectorized form / normalize_frame against the
+# analysis service's old parse_euro_number, and the scalar vs pandas
+# paths of normalize_records on either side of SCALAR_MAX_RECORDS
+
+import math
+
+import pandas as pd
+import pytest
+
+from normalization import (
+    ROW_COLUMNS, SCALAR_MAX_RECORDS, _normalize_records_scalar, normalize_frame,
+    normalize_records, parse_mse_number, parse_mse_number_series,
+)
+
+
+def parse_euro_number(val_str):
+    """technical_analysis.parse_euro_number as it was before ingest-time normalization."""
+    if val_str in ("", "None", "nan"):
+        return None
+    step1 = val_str.replace(".", "")
+    step2 = step1.replace(",", ".")
+    try:
+        return float(step2)
+    except ValueError:
+        return None
+
+
+# strings the old rules and the new ones read the same way
+SAME_AS_OLD = [
+    "", "None", "nan", "\xa0", " ", "-", "abc", "1,2,3",
+    "0", "0,00", "2.140,00", "1.234.567,89", "-1,5", "+3,25", "12", "12,", ",5",
+    " 2.140,00 ", "2.140,00\xa0", "\xa02.140,00", "NaN", "inf",
+]
+
+# the new rules also drop a '\xa0' used as thousands separator, and treat
+# a padded 'nan' as missing (the old float() turned it into NaN)
+NEW_RULES = {
+    "1\xa0234,00": 1234.0,
+    "12\xa0345\xa0678,9": 12345678.9,
+    " nan ": None,
+}
+
+
+def _same(a, b):
+    if a is None or b is None or math.isnan(a) or math.isnan(b):
+        # None and NaN both end up as NULL in stock_data
+        return (a is None or math.isnan(a)) and (b is None or math.isnan(b))
+    return a == b
+
+
+@pytest.mark.parametrize("raw", SAME_AS_OLD)
+def test_scalar_matches_old_rules(raw):
+    assert _same(parse_mse_number(raw), parse_euro_number(raw))
+
+
+@pytest.mark.parametrize("raw, expected", NEW_RULES.items())
+def test_scalar_new_rules(raw, expected):
+    assert _same(parse_mse_number(raw), expected)
+
+
+def test_scalar_takes_none():
+    assert parse_mse_number(None) is None
+
+
+def test_series_matches_scalar():
+    raw = SAME_AS_OLD + list(NEW_RULES)
+    parsed = parse_mse_number_series(pd.Series(raw + [None], dtype=object))
+    assert parsed.dtype == "float64"
+    for value, got in zip(raw + [None], parsed):
+        assert _same(got, parse_mse_number(value)), repr(value)
+
+
+def _record(i, price="2.140,00", qty="1.250"):
+    return {
+        "Date": f"{1 + i % 28:02d}.{1 + i // 28 % 12:02d}.{2000 + i // 336}",
+        "Price": price,
+        "Max": "2.150,50",
+        "Min": "\xa0",
+        "Avg": "nan",
+        "Percent Change": "-0,47",
+        "Quantity": qty,
+        "Best Turnover": "None",
+        "Total Turnover": "1\xa0234.567,00",
+    }
+
+
+def test_normalize_frame():
+    records = [_record(0), _record(1, price="", qty=""), {**_record(2), "Date": "31.02.2024"}]
+    df = pd.DataFrame.from_records(records).rename(columns={
+        "Date": "date", "Price": "price", "Max": "max", "Min": "min", "Avg": "avg",
+        "Percent Change": "percent_change", "Quantity": "quantity",
+        "Best Turnover": "best_turnover", "Total Turnover": "total_turnover",
+    })
+    df.insert(0, "publisher_code", "KMB")
+
+    out = normalize_frame(df)
+
+    assert list(out.columns) == ROW_COLUMNS
+    assert list(out["date"]) == ["2000-01-01", "2000-01-02"]   # the bad date is dropped
+    first = out.iloc[0]
+    assert first["price"] == 2140.0
+    assert first["max"] == 2150.5
+    assert pd.isna(first["min"]) and pd.isna(first["avg"]) and pd.isna(first["best_turnover"])
+    assert first["percent_change"] == -0.47
+    assert first["quantity"] == 1250
+    assert first["total_turnover"] == 1234567.0
+    assert out["quantity"].dtype == "Int64"
+    assert pd.isna(out.iloc[1]["price"]) and pd.isna(out.iloc[1]["quantity"])
+
+
+@pytest.mark.parametrize("n", [SCALAR_MAX_RECORDS, SCALAR_MAX_RECORDS + 1])
+def test_scalar_and_vectorized_paths_agree(n):
+    records = [
+        _record(i, price=["2.140,00", "", "\xa0", "1.000,5"][i % 4], qty=["1.250", "nan", "3"][i % 3])
+        for i in range(n - 1)
+    ]
+    records.append({**_record(n), "Date": "not a date"})
+    assert len(records) == n   # n == SCALAR_MAX_RECORDS stays scalar, one more goes to pandas
+
+    rows = normalize_records("KMB", records)
+    expected = _normalize_records_scalar("KMB", records)
+
+    assert len(rows) == n - 1
+    assert rows == expected
+    qty = ROW_COLUMNS.index("quantity")
+    # sqlite3 only binds plain Python values
+    assert {type(row[qty]) for row in rows} <= {int, type(None)}
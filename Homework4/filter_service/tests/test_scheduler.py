@@ -0,0 +1,86 @@
+# Homework4/filter_service/tests/test_scheduler.py
+
+from datetime import datetime, timedelta
+
+import pytest
+
+import scheduler as scheduler_module
+from scheduler import Scheduler
+
+# default MSE_SESSION_CLOSE 14:00 + REFRESH_AFTER_CLOSE_MINUTES 60
+THU_SLOT = datetime(2026, 10, 15, 15, 0)
+FRI_SLOT = datetime(2026, 10, 16, 15, 0)
+
+
+class _FakeJob:
+    def __init__(self, status="running"):
+        self.id = "job"
+        self.status = status
+
+
+class _FakeQueue:
+    def __init__(self):
+        self.submitted = []
+
+    def active(self):
+        return False
+
+    def submit(self, kind):
+        job = _FakeJob()
+        self.submitted.append((kind, job))
+        return job, True
+
+
+@pytest.fixture
+def sched(tmp_path, monkeypatch):
+    queue = _FakeQueue()
+    monkeypatch.setattr(scheduler_module, "job_queue", queue)
+    monkeypatch.setattr(scheduler_module, "SCHEDULE_JITTER_SECONDS", 0)
+    s = Scheduler(tmp_path / "stock_data.db")
+    s.queue = queue
+    return s
+
+
+@pytest.mark.parametrize("now, slot", [
+    (datetime(2026, 10, 16, 16, 0), FRI_SLOT),      # after today's slot
+    (datetime(2026, 10, 16, 14, 30), THU_SLOT),     # before it: yesterday's
+    (datetime(2026, 10, 17, 10, 0), FRI_SLOT),      # Saturday
+    (datetime(2026, 10, 19, 9, 0), FRI_SLOT),       # Monday morning
+    (datetime(2026, 10, 23, 16, 0), datetime(2026, 10, 22, 15, 0)),   # holiday
+])
+def test_filter2_slot_is_the_latest_trading_day_slot(sched, now, slot):
+    assert sched._slot("filter2", now, {}) == slot
+
+
+def test_filter2_not_due_once_its_slot_ran(sched):
+    now = datetime(2026, 10, 17, 10, 0)
+    assert sched._slot("filter2", now, {"filter2": FRI_SLOT + timedelta(minutes=5)}) is None
+    assert sched._slot("filter2", now, {"filter2": THU_SLOT + timedelta(minutes=5)}) == FRI_SLOT
+
+
+def test_filter1_every_few_days(sched):
+    sched._born = datetime(2026, 10, 16, 9, 0)
+    assert sched._slot("filter1", datetime(2026, 10, 16, 9, 1), {}) == sched._born
+    last = datetime(2026, 10, 10, 8, 0)
+    assert sched._slot("filter1", datetime(2026, 10, 16, 9, 0), {"filter1": last}) is None
+    assert sched._slot("filter1", datetime(2026, 10, 17, 9, 0), {"filter1": last}) == \
+        last + timedelta(days=7)
+
+
+def test_success_is_recorded_failure_is_retried(sched):
+    sched._born = datetime(2026, 10, 16, 9, 0)
+    sched._record("filter2", FRI_SLOT)    # only filter1 is due
+    now = datetime(2026, 10, 17, 10, 0)
+    assert sched.tick(now) == "filter1"
+    assert sched.tick(now) is None    # still running: nothing overlaps
+
+    sched.queue.submitted[-1][1].status = "failed"
+    assert sched.tick(now) is None    # settled, retry not due yet
+    assert sched.last_runs() == {"filter2": FRI_SLOT}
+    retry = now + timedelta(minutes=scheduler_module.SCHEDULE_RETRY_MINUTES)
+    assert sched.tick(retry) == "filter1"
+
+    sched.queue.submitted[-1][1].status = "succeeded"
+    assert sched.tick(retry + timedelta(minutes=1)) is None
+    # Filter1 chains Filter2, so both count as run at the submission time
+    assert sched.last_runs() == {"filter1": retry, "filter2": retry}
@@ -0,0 +1,61 @@
+# Homework4/filter_service/tests/test_sharding.py
+
+import sqlite3
+
+import pytest
+
+from bulk_writer import BulkWriter
+from sharding import ShardLease, ShardLeaseLost, by_liquidity, shard_of
+
+CODES = [f"P{i:03d}" for i in range(300)]
+
+
+def test_shard_of_is_stable():
+    # pinned: a different assignment on another process / machine / Python
+    # would have two instances write the same publishers
+    assert {c: shard_of(c, 4) for c in ("ALK", "KMB", "TEL", "STB", "GRNT", "MPT")} == {
+        "ALK": 0, "KMB": 1, "TEL": 0, "STB": 0, "GRNT": 3, "MPT": 1}
+    assert all(shard_of(c, 1) == 0 for c in CODES)
+
+
+def test_shards_are_balanced():
+    counts = [0] * 4
+    for code in CODES:
+        counts[shard_of(code, 4)] += 1
+    assert min(counts) > 50
+
+
+def test_adding_a_shard_only_moves_publishers_to_it():
+    moved = [c for c in CODES if shard_of(c, 4) != shard_of(c, 5)]
+    assert moved
+    assert all(shard_of(c, 5) == 4 for c in moved)
+
+
+def test_by_liquidity(tmp_path):
+    db = tmp_path / "stock_data.db"
+    writer = BulkWriter(db)
+    for code, price, qty in (("ALK", 100.0, 5), ("KMB", 10.0, 100), ("TEL", 1.0, 1)):
+        writer.write(code, [(code, "2026-10-16", price, price, price, price, 0.0, qty, 0.0, 0.0)])
+    writer.close()
+
+    conn = sqlite3.connect(db)
+    assert by_liquidity(conn, ["TEL", "ALK", "KMB", "NEW"]) == ["KMB", "ALK", "TEL", "NEW"]
+    conn.close()
+
+
+def test_each_instance_owns_its_own_shard(tmp_path):
+    db = tmp_path / "stock_data.db"
+    first, second, spare = (ShardLease(db, shards=2) for _ in range(3))
+    for i, lease in enumerate((first, second, spare)):
+        lease.owner = f"instance-{i}"
+
+    assert (first.claim(), second.claim(), spare.claim()) == (0, 1, None)
+    assert first.claim() == 0    # kept on renewal
+
+    assert spare.index is None
+    first.check(0)
+    with pytest.raises(ShardLeaseLost):
+        first.check(1)
+
+    first.release()
+    assert spare.claim() == 0
@@ -0,0 +1,142 @@
+# Homework4/gateway/analysis_cache.py
+
+"""
+analysis_cache.py
+In-memory cache of analysis service responses for the gateway.
+
+  - keyed by (publisher, tf, mode); each entry remembers the publisher's
+    data version (stock_data.db data_versions, bumped by the filter
+    pipeline's bulk writer whenever the publisher's rows change), and is
+    only served while that version is still current
+  - bounded: at most GATEWAY_CACHE_MAX_MB of response bodies, least
+    recently used entries are evicted first
+  - coalescing: while one request computes a key, identical requests wait
+    for its result instead of calling the analysis service as well
+  - only 200 responses are stored
+  - hits / misses / coalesced waits / evictions are counted (stats())
+
+Configuration (env):
+    GATEWAY_CACHE                 1 (0 disables it)
+    GATEWAY_CACHE_MAX_MB          64
+"""
+
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+GATEWAY_CACHE = os.environ.get("GATEWAY_CACHE", "1") != "0"
+GATEWAY_CACHE_MAX_MB = float(os.environ.get("GATEWAY_CACHE_MAX_MB", 64))
+
+
+def data_version(stock_db, publisher):
+    """The publisher's data version, 0 if never bumped, None if unknown (old DB)."""
+    try:
+        conn = sqlite3.connect(f"file:{stock_db}?mode=ro", uri=True, timeout=5)
+        try:
+            row = conn.execute(
+                "SELECT version FROM data_versions WHERE publisher_code = ?", (publisher,)
+            ).fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+    return row[0] if row else 0
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+class AnalysisCache:
+    def __init__(self, max_mb=GATEWAY_CACHE_MAX_MB):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # key -> (version, body, status), LRU first
+        self._size = 0
+        self._flights = {}              # (key, version) -> _Flight
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.uncacheable = 0
+
+    def get_or_compute(self, key, version, compute):
+        """
+        (body, status) for key at `version`. compute() -> (body bytes, status)
+        runs at most once per (key, version) at a time; with version None
+        the cache is bypassed.
+        """
+        if version is None:
+            with self._lock:
+                self.uncacheable += 1
+            return compute()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1], entry[2]
+            flight = self._flights.get((key, version))
+            leader = flight is None
+            if leader:
+                flight = self._flights[key, version] = _Flight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.result is not None:
+                return flight.result
+            return compute()   # the leader failed; try on our own
+
+        try:
+            flight.result = compute()
+        finally:
+            with self._lock:
+                del self._flights[key, version]
+                if flight.result is not None and flight.result[1] == 200:
+                    self._store(key, version, *flight.result)
+            flight.done.set()
+        return flight.result
+
+    def _store(self, key, version, body, status):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= len(old[1])
+        if len(body) > self.max_bytes:
+            return
+        self._entries[key] = (version, body, status)
+        self._size += len(body)
+        while self._size > self.max_bytes:
+            _, (_, evicted, _) = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "entries": len(self._entries),
+                "size_mb": round(self._size / 1024 / 1024, 3),
+                "max_mb": round(self.max_bytes / 1024 / 1024, 3),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "uncacheable": self.uncacheable,
+                "evictions": self.evictions,
+                "hit_ratio": round((self.hits + self.coalesced) / lookups, 3) if lookups else None,
+                "in_flight": len(self._flights),
+            }
+
+
+analysis_cache = AnalysisCache()
@@ -3,22 +3,63 @@
 """
 app.py - Gateway on port 5000.
 Now we do NOT automatically call Filter2 and Filter3 on each technical analysis request.
+
+/api/stock_data, /api/technical_analysis and /api/publishers send an ETag
+(from the publisher's data version, or the list itself for publishers)
+and Cache-Control; a request whose If-None-Match still matches gets an
+empty 304 before any query or upstream call.
+
+Responses are compressed per Accept-Encoding (common/compression.py).
 """
 
+import hashlib
+import json
 import requests
 import sqlite3
-from flask import Flask, request, jsonify
+import sys
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 from pathlib import Path
 from datetime import datetime
 
+from analysis_cache import analysis_cache, data_version, GATEWAY_CACHE
+
+# compression.py is shared with the analysis service
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "common"))
+from compression import compressed_bodies, init_app as init_compression
+
 app = Flask(__name__)
 CORS(app)
+init_compression(app)
 
 THIS_FOLDER = Path(__file__).parent.parent
 PUBLISHERS_DB = THIS_FOLDER / "publishers.db"
 STOCK_DB = THIS_FOLDER / "stock_data.db"
 
+# data changes at most once a day: clients keep what they got but always
+# revalidate it, which costs a 304 when nothing changed
+CACHE_CONTROL_DATA = "no-cache"
+# the publisher list changes about once a week
+CACHE_CONTROL_PUBLISHERS = "public, max-age=300"
+
+def _etag(*parts):
+    return hashlib.sha1("|".join(map(str, parts)).encode()).hexdigest()[:20]
+
+def _not_modified(etag, cache_control):
+    """An empty 304 if the client's If-None-Match matches etag, else None."""
+    if etag is None or not request.if_none_match.contains_weak(etag):
+        return None
+    resp = Response(status=304)
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = cache_control
+    return resp
+
+def _with_validators(resp, etag, cache_control):
+    if etag is not None:
+        resp.set_etag(etag)
+    resp.headers["Cache-Control"] = cache_control
+    return resp
+
 @app.route("/api/publishers", methods=["GET"])
 def get_publishers():
     try:
@@ -28,12 +69,137 @@ def get_publishers():
         rows = c.fetchall()
         conn.close()
         pubs = [r[0] for r in rows]
-        return jsonify({"publishers": pubs}), 200
+        etag = _etag("publishers", *pubs)
+        return (_not_modified(etag, CACHE_CONTROL_PUBLISHERS)
+                or _with_validators(jsonify({"publishers": pubs}), etag, CACHE_CONTROL_PUBLISHERS))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# API field -> stock_data column (date is always returned)
+STOCK_DATA_FIELDS = {
+    "date": "date",
+    "price": "price",
+    "volume": "quantity",
+    "max": "max",
+    "min": "min",
+    "avg": "avg",
+    "percent_change": "percent_change",
+    "total_turnover": "total_turnover",
+}
+STOCK_DATA_MAX_LIMIT = 10000
+STOCK_DATA_FORMATS = ("objects", "rows", "columns")
+STREAM_FETCH_ROWS = 500
+
+def _iso_date_arg(name):
+    value = request.args.get(name, "").strip()
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d")
+    except ValueError:
+        raise ValueError(f"'{name}' must be a YYYY-MM-DD date")
+
+def _stock_data_query(publisher):
+    """
+    (sql, params, field names, limit) for /api/stock_data's
+    arguments; raises ValueError on a bad one. Every filter is on
+    (publisher_code, date), so SQLite walks just that index range.
+    """
+    fields = [f.strip() for f in request.args.get("fields", "").split(",") if f.strip()]
+    unknown = [f for f in fields if f not in STOCK_DATA_FIELDS]
+    if unknown:
+        raise ValueError(f"unknown fields {unknown}; known: {list(STOCK_DATA_FIELDS)}")
+    names = ["date"] + [f for f in (fields or STOCK_DATA_FIELDS) if f != "date"]
+
+    order = request.args.get("order", "asc").strip().lower()
+    if order not in ("asc", "desc"):
+        raise ValueError("'order' must be asc or desc")
+    descending = order == "desc"
+
+    limit = request.args.get("limit", "").strip()
+    if limit:
+        if not limit.isdigit() or int(limit) < 1:
+            raise ValueError("'limit' must be a positive integer")
+        limit = min(int(limit), STOCK_DATA_MAX_LIMIT)
+    else:
+        limit = None
+
+    where = ["publisher_code = ?"]
+    params = [publisher]
+    for name, op in (("from", ">="), ("to", "<=")):
+        day = _iso_date_arg(name)
+        if day:
+            where.append(f"date {op} ?")
+            params.append(day)
+    # keyset pagination: the cursor is the last date of the previous page
+    cursor = _iso_date_arg("cursor")
+    if cursor:
+        where.append("date < ?" if descending else "date > ?")
+        params.append(cursor)
+
+    sql = (f"SELECT {', '.join(STOCK_DATA_FIELDS[n] for n in names)} FROM stock_data "
+           f"WHERE {' AND '.join(where)} ORDER BY date {'DESC' if descending else 'ASC'}")
+    if limit:
+        sql += " LIMIT ?"
+        params.append(limit)
+    return sql, params, names, limit
+
+def _encode_row(fmt, names):
+    if fmt == "rows":
+        return lambda row: json.dumps(row, separators=(",", ":"))
+    return lambda row: json.dumps(dict(zip(names, row)), separators=(",", ":"))
+
+def _stream_stock_data(publisher, sql, params, names, limit, fmt):
+    """
+    The response body, written row by row from the cursor (STREAM_FETCH_ROWS
+    at a time), so memory stays flat however long the history is. A DB
+    error half way can only cut the body short.
+    """
+    key = "rows" if fmt == "rows" else "records"
+    head = {"publisher": publisher}
+    if fmt == "rows":
+        head["fields"] = names
+    yield json.dumps(head, separators=(",", ":"))[:-1] + f',"{key}":['
+    encode = _encode_row(fmt, names)
+    conn = sqlite3.connect(STOCK_DB)
+    try:
+        c = conn.execute(sql, params)
+        count, last = 0, None
+        while True:
+            batch = c.fetchmany(STREAM_FETCH_ROWS)
+            if not batch:
+                break
+            yield ("," if count else "") + ",".join(encode(row) for row in batch)
+            count += len(batch)
+            last = batch[-1][0]
+    finally:
+        conn.close()
+    tail = "]"
+    if limit:
+        tail += ',"next_cursor":' + json.dumps(last if count == limit else None)
+    yield tail + "}"
+
 @app.route("/api/stock_data", methods=["GET"])
 def get_stock_data():
+    """
+    A publisher's daily rows, oldest first. Optional:
+        from=YYYY-MM-DD, to=YYYY-MM-DD   date range (inclusive)
+        fields=price,volume,...          columns besides date
+        order=asc|desc                   desc + limit = the newest rows
+        limit=N                          page size (max STOCK_DATA_MAX_LIMIT);
+                                         a full page carries next_cursor,
+                                         pass it as cursor= for the next one
+        format=objects|rows|columns      objects: [{"date": .., "price": ..}]
+                                         (default); rows: "fields" + [[..]];
+                                         columns: "fields" + {"price": [..]}
+                                         (parallel arrays, for charts)
+        stream=1                         write objects / rows straight from
+                                         the cursor instead of building the
+                                         body in memory first (not with
+                                         format=columns: 400)
+    Both paths write the same bytes: keys in the order above, each
+    record's in fields= order.
+    """
     publisher = request.args.get("publisher", "").strip()
     if not publisher:
         return jsonify({"error": "Missing publisher"}), 400
@@ -42,44 +208,79 @@ def get_stock_data():
     # requests.post("http://localhost:5001/filter2")
     # requests.post("http://localhost:5001/filter3")
 
+    fmt = request.args.get("format", "objects").strip().lower()
+    if fmt not in STOCK_DATA_FORMATS:
+        return jsonify({"error": f"'format' must be one of {list(STOCK_DATA_FORMATS)}"}), 400
+    stream = request.args.get("stream") in ("1", "true")
+    if stream and fmt == "columns":
+        # parallel arrays need every row before the first column is complete
+        return jsonify({"error": "stream=1 is not supported with format=columns"}), 400
+    try:
+        sql, params, names, limit = _stock_data_query(publisher)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # only a valid request can be answered with 304
+    version = data_version(STOCK_DB, publisher)
+    etag = None if version is None else _etag(
+        "stock_data", publisher, version, sorted(request.args.items(multi=True)))
+    not_modified = _not_modified(etag, CACHE_CONTROL_DATA)
+    if not_modified is not None:
+        return not_modified
+
+    if stream:
+        resp = Response(_stream_stock_data(publisher, sql, params, names, limit, fmt),
+                        mimetype="application/json")
+        return _with_validators(resp, etag, CACHE_CONTROL_DATA)
+
     try:
         conn = sqlite3.connect(STOCK_DB)
         c = conn.cursor()
-        c.execute("""
-            SELECT date, price, quantity, max, min, avg, percent_change, total_turnover
-            FROM stock_data
-            WHERE publisher_code = ?
-            ORDER BY date ASC
-        """, (publisher,))
+        c.execute(sql, params)
         rows = c.fetchall()
         conn.close()
 
-        data_list = []
-        for row in rows:
-            data_list.append({
-                "date": row[0],
-                "price": row[1],
-                "volume": row[2],
-                "max": row[3],
-                "min": row[4],
-                "avg": row[5],
-                "percent_change": row[6],
-                "total_turnover": row[7]
-            })
-        return jsonify({"publisher": publisher, "records": data_list}), 200
+        body = {"publisher": publisher}
+        if fmt == "columns":
+            body["fields"] = names
+            body["columns"] = dict(zip(names, map(list, zip(*rows)))) if rows else {n: [] for n in names}
+        elif fmt == "rows":
+            body["fields"] = names
+            body["rows"] = rows
+        else:
+            body["records"] = [dict(zip(names, row)) for row in rows]
+        if limit:
+            body["next_cursor"] = rows[-1][0] if len(rows) == limit else None
+        # not jsonify: it sorts keys, the streamed body keeps fields= order
+        resp = Response(json.dumps(body, separators=(",", ":")), mimetype="application/json")
+        return _with_validators(resp, etag, CACHE_CONTROL_DATA)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+ANALYSIS_SERVICE_URL = "http://localhost:5002"
+# a cold full analysis or a whole-market batch takes seconds; past this the
+# analysis service is treated as hung and the client gets a 504
+ANALYSIS_TIMEOUT = 60
+# the body is re-sent (and compressed, if the client wants) by the gateway
+# itself, so compressing it on the loopback hop is only wasted CPU
+ANALYSIS_HEADERS = {"Accept-Encoding": "identity"}
+
+def _upstream_timeout():
+    return jsonify({"error": f"analysis service did not answer within {ANALYSIS_TIMEOUT}s"}), 504
+
 @app.route("/api/technical_analysis", methods=["GET"])
 def get_technical_analysis():
     """
     We comment out the lines that re-run filter2/3 automatically:
     # requests.post("http://localhost:5001/filter2")
     # requests.post("http://localhost:5001/filter3")
-    Then just call analysis microservice.
+    Then just call analysis microservice. Responses are cached per
+    (publisher, tf, mode) until the publisher's data version changes
+    (see analysis_cache.py).
     """
     publisher = request.args.get("publisher","").strip()
     tf = request.args.get("tf","1D").strip()
+    mode = request.args.get("mode","full").strip()
     if not publisher:
         return jsonify({"error": "Missing 'publisher'"}), 400
 
@@ -87,23 +288,107 @@ def get_technical_analysis():
     # requests.post("http://localhost:5001/filter2")
     # requests.post("http://localhost:5001/filter3")
 
-    try:
+    def compute():
         # only call analysis microservice
-        analysis_url = f"http://localhost:5002/analysis?publisher={publisher}&tf={tf}"
-        r = requests.get(analysis_url)
-        return jsonify(r.json()), r.status_code
+        analysis_url = f"{ANALYSIS_SERVICE_URL}/analysis"
+        r = requests.get(analysis_url, params={"publisher": publisher, "tf": tf, "mode": mode},
+                         headers=ANALYSIS_HEADERS, timeout=ANALYSIS_TIMEOUT)
+        return r.content, r.status_code
+
+    version = data_version(STOCK_DB, publisher)
+    etag = None if version is None else _etag("analysis", publisher, tf, mode, version)
+    not_modified = _not_modified(etag, CACHE_CONTROL_DATA)
+    if not_modified is not None:
+        return not_modified
+
+    try:
+        cache_version = version if GATEWAY_CACHE else None
+        body, status = analysis_cache.get_or_compute((publisher, tf, mode), cache_version, compute)
+        resp = Response(body, status=status, mimetype="application/json")
+        if status != 200:
+            return resp
+        return _with_validators(resp, etag, CACHE_CONTROL_DATA)
+    except requests.Timeout:
+        return _upstream_timeout()
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route("/api/cache/stats", methods=["GET"])
+def get_cache_stats():
+    stats = analysis_cache.stats()
+    stats["compressed_bodies"] = compressed_bodies.stats()
+    return jsonify(stats), 200
+
+@app.route("/api/technical_analysis/batch", methods=["GET", "POST"])
+def get_technical_analysis_batch():
+    """
+    Summaries for N publishers (or all of them) in one round trip:
+    GET ?publishers=ALK,KMB&tf=1D or POST {"publishers": [...], "tf": "1D"}.
+    """
+    try:
+        analysis_url = f"{ANALYSIS_SERVICE_URL}/analysis/batch"
+        if request.method == "POST":
+            r = requests.post(analysis_url, json=request.get_json(silent=True) or {},
+                              headers=ANALYSIS_HEADERS, timeout=ANALYSIS_TIMEOUT)
+        else:
+            r = requests.get(analysis_url, params={
+                "publishers": request.args.get("publishers", "").strip(),
+                "tf": request.args.get("tf", "1D").strip()
+            }, headers=ANALYSIS_HEADERS, timeout=ANALYSIS_TIMEOUT)
+        # passed through as-is: no parse / re-serialize of a market-sized body
+        return Response(r.content, status=r.status_code, mimetype="application/json")
+    except requests.Timeout:
+        return _upstream_timeout()
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+FILTER_SERVICE_URL = "http://localhost:5001"
+# the filter service only queues the run, so this never waits on a scrape
+FILTER_SERVICE_TIMEOUT = 10
+
 @app.route("/api/run_all_filters", methods=["POST"])
 def run_all_filters():
     """
-    Single endpoint to run Filter1->Filter2->Filter3 if you want.
+    Queues one Filter1->Filter2->Filter3->Filter4 run (coalesced with a
+    run that is already queued / running) and answers 202 with its job.
+    Poll /api/jobs/<job_id> for status and progress.
     """
-    requests.post("http://localhost:5001/filter1")
-    requests.post("http://localhost:5001/filter2")
-    requests.post("http://localhost:5001/filter3")
-    return jsonify({"status":"All filters completed"}), 200
+    try:
+        r = requests.post(f"{FILTER_SERVICE_URL}/jobs", json={"kind": "all"},
+                          timeout=FILTER_SERVICE_TIMEOUT)
+        body = r.json()
+        if r.status_code == 202:
+            body["status_url"] = f"/api/jobs/{body['job_id']}"
+        return jsonify(body), r.status_code
+    except Exception as e:
+        return jsonify({"error": str(e)}), 502
+
+@app.route("/api/jobs", methods=["GET"])
+def list_filter_jobs():
+    try:
+        r = requests.get(f"{FILTER_SERVICE_URL}/jobs", timeout=FILTER_SERVICE_TIMEOUT)
+        return jsonify(r.json()), r.status_code
+    except Exception as e:
+        return jsonify({"error": str(e)}), 502
+
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def get_filter_job(job_id):
+    """Job status; ?progress=1 adds per-publisher progress."""
+    path = f"/jobs/{job_id}/progress" if request.args.get("progress") else f"/jobs/{job_id}"
+    try:
+        r = requests.get(f"{FILTER_SERVICE_URL}{path}", timeout=FILTER_SERVICE_TIMEOUT)
+        return jsonify(r.json()), r.status_code
+    except Exception as e:
+        return jsonify({"error": str(e)}), 502
+
+@app.route("/api/shards", methods=["GET"])
+def get_filter_shards():
+    """Per-shard owner, liveness and job progress of the filter instances."""
+    try:
+        r = requests.get(f"{FILTER_SERVICE_URL}/shards", timeout=FILTER_SERVICE_TIMEOUT)
+        return jsonify(r.json()), r.status_code
+    except Exception as e:
+        return jsonify({"error": str(e)}), 502
 
 if __name__ == "__main__":
     app.run(debug=True, port=5000)
@@ -0,0 +1,92 @@
+# Homework4/gateway/tests/test_analysis_cache.py
+
+import threading
+import time
+
+from analysis_cache import AnalysisCache
+
+
+def _counting(body=b"{}", status=200):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return body, status
+    return compute, calls
+
+
+def test_identical_requests_share_one_computation():
+    cache = AnalysisCache(max_mb=1)
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return b'{"signal":"Buy"}', 200
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(
+        cache.get_or_compute(("ALK", "1D", "full"), 3, compute))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    # wait until the leader is computing and the others queue behind it
+    while cache.stats()["coalesced"] < 7:
+        time.sleep(0.01)
+    release.set()
+    for t in threads:
+        t.join(5)
+
+    assert len(calls) == 1
+    assert results == [(b'{"signal":"Buy"}', 200)] * 8
+    stats = cache.stats()
+    assert (stats["misses"], stats["coalesced"], stats["in_flight"]) == (1, 7, 0)
+
+
+def test_new_version_is_recomputed():
+    cache = AnalysisCache(max_mb=1)
+    compute, calls = _counting()
+    cache.get_or_compute("ALK", 1, compute)
+    cache.get_or_compute("ALK", 1, compute)
+    assert len(calls) == 1
+    cache.get_or_compute("ALK", 2, compute)
+    assert len(calls) == 2
+    assert cache.stats()["entries"] == 1
+
+
+def test_least_recently_used_is_evicted_first():
+    cache = AnalysisCache(max_mb=1000 / 1024 / 1024)    # 1000 bytes
+    body = b"x" * 400
+    for key in ("a", "b"):
+        cache.get_or_compute(key, 1, lambda: (body, 200))
+    cache.get_or_compute("a", 1, lambda: (b"miss", 200))    # hit: "b" is now the oldest
+    cache.get_or_compute("c", 1, lambda: (body, 200))
+
+    assert list(cache._entries) == ["a", "c"]
+    assert cache.evictions == 1
+    assert cache._size == 800
+
+
+def test_bodies_larger_than_the_cache_are_not_stored():
+    cache = AnalysisCache(max_mb=100 / 1024 / 1024)
+    cache.get_or_compute("a", 1, lambda: (b"x" * 50, 200))
+    cache.get_or_compute("b", 1, lambda: (b"x" * 200, 200))
+    assert list(cache._entries) == ["a"]
+
+
+def test_errors_are_not_stored():
+    cache = AnalysisCache(max_mb=1)
+    compute, calls = _counting(b'{"error":"busy"}', 503)
+    assert cache.get_or_compute("ALK", 1, compute) == (b'{"error":"busy"}', 503)
+    cache.get_or_compute("ALK", 1, compute)
+    assert len(calls) == 2
+    assert cache.stats()["entries"] == 0
+
+
+def test_unknown_version_bypasses_the_cache():
+    cache = AnalysisCache(max_mb=1)
+    compute, calls = _counting()
+    cache.get_or_compute("ALK", None, compute)
+    cache.get_or_compute("ALK", None, compute)
+    assert len(calls) == 2
+    assert cache.stats()["uncacheable"] == 2